@@ -0,0 +1,76 @@
+# ai_player.py
+import threading
+
+
+class AIPlayer:
+    """
+    Runs a policy for one player on a background thread.
+
+    think() copies the game state on the calling (UI) thread and lets a
+    worker pick an action on the copy, so the screen keeps drawing and
+    handling input meanwhile. The chosen action is collected with poll()
+    and applied to the real state by the caller, which also rolls the
+    dice. Map grids that read from disk (mapped or chunked) are never
+    loaded whole: the worker gets its own reader() of the map file, so it
+    never touches the grid the screen draws from.
+    """
+
+    def __init__(self, player, policy):
+        self.player = player
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.thread = None
+        self.action = None
+        self.error = None
+        self.closed = False
+        self._terrain = None     # (source grid, the worker's reader of it)
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.thread is not None
+
+    def think(self, state):
+        snapshot = state.copy()
+        if hasattr(state.terrain, "reader"):
+            if self._terrain is None or self._terrain[0] is not state.terrain:
+                self._terrain = (state.terrain, state.terrain.reader())
+            snapshot.terrain = self._terrain[1]
+        with self.lock:
+            if self.thread is not None or self.closed:
+                return
+            self.action = None
+            self.thread = threading.Thread(target=self._run, args=(snapshot,), name="ai-player", daemon=True)
+            self.thread.start()
+
+    def poll(self):
+        """The chosen action once the worker is done, else None."""
+        with self.lock:
+            if self.thread is not None:
+                return None
+            action, self.action = self.action, None
+            return action
+
+    def close(self):
+        """
+        Stop thinking without waiting for the worker: the policy is told to
+        stop (if it can) and whatever the worker still picks is dropped.
+        """
+        with self.lock:
+            self.closed = True
+        close = getattr(self.policy, "close", None)
+        if close is not None:
+            close()
+
+    # -----------------------
+    # Worker thread
+    # -----------------------
+    def _run(self, snapshot):
+        action = None
+        try:
+            action = self.policy.choose(snapshot)
+        except Exception as exc:   # reported to the UI instead of killing the worker
+            self.error = exc
+        with self.lock:
+            self.action = None if self.closed else action
+            self.thread = None
@@ -0,0 +1,70 @@
+# assets.py
+from collections import OrderedDict
+
+import pygame
+
+
+class AssetManager:
+    """
+    Loads each image from disk once and keeps scaled variants in a bounded
+    LRU cache keyed by (path, size). Missing files are cached too (as None),
+    so asking for them again every frame doesn't touch the disk.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()   # (path, size or None) -> Surface or None
+        self.hits = 0
+        self.misses = 0
+
+    def image(self, path, size=None):
+        """The image at `path`, scaled to `size` if given; None if it can't be loaded."""
+        key = (path, tuple(size) if size else None)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        if size is None:
+            surf = self._load(path)
+        else:
+            original = self.image(path)
+            surf = pygame.transform.scale(original, key[1]) if original is not None else None
+        self._store(key, surf)
+        return surf
+
+    def invalidate(self, path):
+        """Forget every variant of `path` (e.g. after the file was rewritten)."""
+        for key in [k for k in self.cache if k[0] == path]:
+            del self.cache[key]
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        return {"entries": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _load(self, path):
+        try:
+            img = pygame.image.load(path)
+        except (pygame.error, FileNotFoundError, OSError):
+            return None
+        # convert to the display format once a display exists (much faster blits)
+        if pygame.display.get_surface() is not None:
+            img = img.convert_alpha() if img.get_flags() & pygame.SRCALPHA else img.convert()
+        return img
+
+    def _store(self, key, surf):
+        self.cache[key] = surf
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+
+# shared by all screens
+ASSETS = AssetManager()
@@ -0,0 +1,907 @@
+# benchmarks.py
+"""
+Small performance benchmarks for the map and game systems.
+
+Usage:
+    python benchmarks.py              # run everything
+    python benchmarks.py terrain      # run selected benchmarks by name
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+from settings import TERRAIN_TYPES
+from terrain_grid import PROPS_TABLE, TerrainGrid
+
+
+def _timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def _measure_alloc(build):
+    tracemalloc.start()
+    obj = build()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, obj
+
+
+# -------------------------------------------------------
+# Terrain storage
+# -------------------------------------------------------
+def bench_terrain(width=200, height=200):
+    """Memory and lookup cost: dict-of-dicts terrain vs TerrainGrid."""
+
+    def build_dicts():
+        return {
+            (q, r): {"type": "plain", **TERRAIN_TYPES["plain"]}
+            for r in range(height) for q in range(width)
+        }
+
+    dict_bytes, dict_terrain = _measure_alloc(build_dicts)
+    grid_bytes, grid = _measure_alloc(lambda: TerrainGrid(width, height))
+
+    keys = list(dict_terrain.keys())
+
+    def lookup_dicts():
+        total = 0
+        for key in keys:
+            total += dict_terrain[key]["move_cost"]
+        return total
+
+    def lookup_grid(grid=grid):
+        props = grid.props
+        total = 0
+        for q, r in keys:
+            total += props(q, r)[2]
+        return total
+
+    def lookup_codes():
+        # what the pathfinding loops do: bounds check and read grid.codes inline
+        codes, table, w, h = grid.codes, PROPS_TABLE, grid.width, grid.height
+        total = 0
+        for q, r in keys:
+            if 0 <= q < w and 0 <= r < h:
+                total += table[codes[r * w + q]][2]
+        return total
+
+    t_dict, _ = _timed(lookup_dicts, 3)
+    t_grid, _ = _timed(lookup_grid, 3)
+    t_codes, _ = _timed(lookup_codes, 3)
+
+    # cost overrides are folded into `codes` on write, so reads don't pay for them
+    overridden = grid.copy()
+    for i in range(0, width * height, 100):
+        overridden.set_tile(i % width, i // width, "plain", move_cost=3)
+    t_overrides, _ = _timed(lambda: lookup_grid(overridden), 3)
+
+    print(f"terrain {width}x{height} ({width * height} tiles)")
+    print(f"  dict-of-dicts: {dict_bytes / 1e6:8.2f} MB   lookup pass {t_dict * 1e3:7.2f} ms")
+    print(f"  TerrainGrid:   {grid_bytes / 1e6:8.2f} MB   lookup pass {t_grid * 1e3:7.2f} ms (props)   "
+          f"{t_codes * 1e3:7.2f} ms (codes)")
+    print(f"  1% cost overrides:             lookup pass {t_overrides * 1e3:7.2f} ms (props)")
+    print(f"  (grid.memory_usage() reports {grid.memory_usage() / 1e6:.2f} MB)")
+
+
+def bench_mapfile(size=1000):
+    """Saving and loading a large map as JSON vs the binary .hexm format."""
+    import tempfile
+    from mapfile import load_map_file, save_map_file
+
+    grid = _BenchMap(size, size).terrain
+    print(f"map file {size}x{size} ({size * size} tiles)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for ext in (".json", ".hexm"):
+            path = os.path.join(tmp, "bench" + ext)
+            t_save, _ = _timed(lambda: save_map_file(path, grid))
+            t_load, loaded = _timed(lambda: load_map_file(path))
+            assert loaded.same_tiles(grid)
+            print(f"  {ext:<6} {os.path.getsize(path) / 1e6:8.2f} MB   "
+                  f"save {t_save * 1e3:9.1f} ms   load {t_load * 1e3:9.1f} ms")
+
+
+def _resident_bytes():
+    """Current RSS from /proc (Linux only; None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def bench_mapped(size=3000, view=(60, 40)):
+    """Opening a huge .hexm eagerly vs memory-mapped, then touching one screen's worth of tiles."""
+    import gc
+    import tempfile
+    from mapfile import MappedTerrainGrid, load_binary, save_binary
+
+    print(f"{size}x{size} map ({size * size / 1e6:.0f}M tiles), then reading a {view[0]}x{view[1]} view")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.hexm")
+        save_binary(path, TerrainGrid(size, size, fill="forest"))
+
+        for label, opener in (("eager load", load_binary), ("memory-mapped", MappedTerrainGrid)):
+            gc.collect()
+            before = _resident_bytes()
+            t_open, grid = _timed(lambda: opener(path))
+            q0 = r0 = size // 2
+
+            def touch():
+                props = grid.props
+                return sum(props(q, r)[2] for r in range(r0, r0 + view[1]) for q in range(q0, q0 + view[0]))
+
+            t_touch, _ = _timed(touch)
+            after = _resident_bytes()
+            rss = f"{(after - before) / 1e6:7.1f} MB" if before is not None else "    n/a"
+            print(f"  {label:<14} open {t_open * 1e3:8.2f} ms   view {t_touch * 1e3:6.2f} ms   "
+                  f"resident +{rss}")
+            if isinstance(grid, MappedTerrainGrid):
+                grid.close()
+            del grid
+
+
+def bench_chunked(size=3000, view=(60, 40), steps=200, budget=1024 * 1024):
+    """Panning across a huge map with ChunkedTerrainGrid: stream cost, chunk churn and resident size."""
+    import tempfile
+    from chunked_terrain import ChunkedTerrainGrid
+    from mapfile import save_binary
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.hexm")
+        save_binary(path, TerrainGrid(size, size))
+
+        t_open, grid = _timed(lambda: ChunkedTerrainGrid(path, max_bytes=budget))
+        search = _BenchMap(8, 8)
+        search.terrain = grid
+        search.width, search.height = grid.width, grid.height
+
+        def pan():
+            for step in range(steps):
+                q0 = r0 = 100 + step * 10
+                grid.stream([(q0, r0, q0 + view[0], r0 + view[1])])
+                for r in range(r0, r0 + view[1]):
+                    for q in range(q0, q0 + view[0]):
+                        grid.type_name(q, r)
+
+        t_pan, _ = _timed(pan)
+        t_path, path_found = _timed(lambda: search.find_path((10, 10), (400, 300), set()))
+
+        print(f"{size}x{size} map ({size * size / 1e6:.0f}M tiles), {grid.chunk_size}x{grid.chunk_size} chunks, "
+              f"{budget / 1e6:.1f} MB budget")
+        print(f"  open                  {t_open * 1e3:8.2f} ms")
+        print(f"  pan {steps} views of {view[0]}x{view[1]}  {t_pan / steps * 1e3:8.2f} ms/view   "
+              f"{grid.loads} loads, {grid.evictions} evictions")
+        print(f"  find_path ~500 tiles  {t_path * 1e3:8.2f} ms   ({len(path_found or [])} steps)")
+        print(f"  resident chunks       {grid.resident_bytes() / 1e6:8.2f} MB "
+              f"(whole map as a TerrainGrid: {size * size * grid.chunk_bytes / grid.chunk_size ** 2 / 1e6:.0f} MB)")
+        grid.close()
+
+
+def bench_catalog(count=500, size=64):
+    """Listing a maps directory: scan + read every header vs the catalog (cold, warm, one map changed)."""
+    import tempfile
+    from map_catalog import MapCatalog, terrain_histogram
+    from mapfile import is_map_file, save_binary
+
+    grid = TerrainGrid(size, size, fill="forest")
+    print(f"{count} maps of {size}x{size}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(count):
+            save_binary(os.path.join(tmp, f"map_{i:04d}.hexm"), grid)
+
+        def scan():
+            names = sorted(f for f in os.listdir(tmp) if is_map_file(f))
+            return [terrain_histogram(os.path.join(tmp, n)) for n in names]
+
+        t_scan, _ = _timed(scan)
+
+        def indexed(catalog):
+            # refresh() only wakes the indexer thread; wait() for it to finish
+            t_call, _ = _timed(lambda: catalog.refresh(force=True))
+            catalog.wait()
+            return t_call
+
+        catalog = MapCatalog(tmp)
+        t_cold, t_cold_call = _timed(lambda: indexed(catalog))
+        t_warm, _ = _timed(lambda: indexed(catalog), repeat=10)
+        t_cached, _ = _timed(catalog.maps, repeat=1000)
+        save_binary(os.path.join(tmp, "map_0000.hexm"), TerrainGrid(size, size))
+        reads = catalog.reads
+        t_one, _ = _timed(lambda: indexed(catalog))
+        restarted = MapCatalog(tmp)
+        t_restart, _ = _timed(lambda: indexed(restarted))
+
+        print(f"  scan + read headers   {t_scan * 1e3:8.2f} ms")
+        print(f"  catalog, cold         {t_cold * 1e3:8.2f} ms   "
+              f"(on the indexer thread; refresh() itself {t_cold_call * 1e3:.2f} ms)")
+        print(f"  catalog, restart      {t_restart * 1e3:8.2f} ms   (index loaded from disk)")
+        print(f"  catalog, rescan       {t_warm * 1e3:8.2f} ms   (nothing changed)")
+        print(f"  catalog, one changed  {t_one * 1e3:8.2f} ms   ({catalog.reads - reads} re-read)")
+        print(f"  catalog, between polls {t_cached * 1e6:7.2f} us")
+
+
+# -------------------------------------------------------
+# Pathfinding
+# -------------------------------------------------------
+class _BenchMap:
+    """Just enough of HexMap for the search methods, without a display."""
+
+    def __init__(self, width, height, seed=1, forest_ratio=0.3):
+        from hexmap import HexMap
+
+        self.width = width
+        self.height = height
+        self.terrain = TerrainGrid(width, height)
+        rng = random.Random(seed)
+        for r in range(height):
+            for q in range(width):
+                if rng.random() < forest_ratio:
+                    self.terrain.set_tile(q, r, "forest")
+
+        self.AXIAL_DIRECTIONS = HexMap.AXIAL_DIRECTIONS
+        self.path_from_tree = HexMap.path_from_tree
+        self._heuristic_goal = None
+        self._heuristic_cache = {}
+        for name in ("neighbors", "is_inside_grid", "reachable_with_paths",
+                     "find_path", "_heuristic_for"):
+            setattr(self, name, getattr(HexMap, name).__get__(self))
+
+
+def _legacy_bfs_reachable(hexmap, start, move_points, blocked, max_pops=None):
+    """
+    The pre-Dijkstra get_reachable_tiles, kept as the benchmark baseline.
+    Its frontier grows exponentially with move_points, so it gives up (and
+    returns None) after max_pops queue pops.
+    """
+    reachable = set()
+    frontier = deque([(start, move_points)])
+    came_from = {start: None}
+    props = hexmap.terrain.props
+    pops = 0
+    while frontier:
+        current, remaining = frontier.popleft()
+        pops += 1
+        if max_pops is not None and pops > max_pops:
+            return None, pops
+        if remaining < 0:
+            continue
+        reachable.add(current)
+        cur_height = props(*current)[1]
+        for n in hexmap.neighbors(*current):
+            if not hexmap.is_inside_grid(*n): continue
+            if n in blocked: continue
+            terrain = props(*n)
+            if not terrain[3]: continue
+            if abs(cur_height - terrain[1]) > 1: continue
+            new_remain = remaining - terrain[2]
+            if n not in came_from or new_remain > 0:
+                came_from[n] = current
+                frontier.append((n, new_remain))
+    return reachable, pops
+
+
+def bench_reachability(size=61, max_pops=300_000):
+    """Legacy re-enqueueing BFS vs Dijkstra reachability on a forest/plain map."""
+    hexmap = _BenchMap(size, size)
+    start = (size // 2, size // 2)
+    print(f"reachability on {size}x{size} forest/plain map "
+          f"(legacy BFS capped at {max_pops} pops)")
+    print(f"  {'range':>5} {'tiles':>6} {'bfs pops':>9} {'bfs ms':>9} {'dijkstra ms':>12}")
+    bfs_gave_up = False
+    for move_range in range(3, 21):
+        t_dij, (reach_dij, _tree) = _timed(
+            lambda: hexmap.reachable_with_paths(start, move_range, set()), 3)
+
+        if bfs_gave_up:
+            print(f"  {move_range:>5} {len(reach_dij):>6} {'-':>9} {'-':>9} {t_dij * 1e3:>12.2f}")
+            continue
+
+        t_bfs, (reach_bfs, pops) = _timed(
+            lambda: _legacy_bfs_reachable(hexmap, start, move_range, set(), max_pops))
+        if reach_bfs is None:
+            bfs_gave_up = True
+            print(f"  {move_range:>5} {len(reach_dij):>6} {'>' + str(max_pops):>9} "
+                  f"{'>' + format(t_bfs * 1e3, '.0f'):>9} {t_dij * 1e3:>12.2f}")
+            continue
+
+        # the legacy BFS never revisits a tile at exactly 0 remaining, so it
+        # can miss tiles; Dijkstra must find everything it finds
+        assert reach_bfs <= reach_dij
+        print(f"  {move_range:>5} {len(reach_dij):>6} {pops:>9} "
+              f"{t_bfs * 1e3:>9.2f} {t_dij * 1e3:>12.2f}"
+              f"   (bfs missed {len(reach_dij - reach_bfs)})")
+
+
+def _legacy_bfs_path(hexmap, start, goal, blocked):
+    """The pre-A* find_path (unweighted BFS). Returns (path, tiles visited)."""
+    frontier = deque([start])
+    came_from = {start: None}
+    props = hexmap.terrain.props
+    while frontier:
+        current = frontier.popleft()
+        for neighbor in hexmap.neighbors(*current):
+            if neighbor in blocked or neighbor in came_from:
+                continue
+            terrain = props(*neighbor)
+            if not terrain or not terrain[3]:
+                continue
+            if abs(props(*current)[1] - terrain[1]) > 1:
+                continue
+            came_from[neighbor] = current
+            if neighbor == goal:
+                return hexmap.path_from_tree(came_from, goal), len(came_from)
+            frontier.append(neighbor)
+    return None, len(came_from)
+
+
+def bench_find_path(size=200, queries=20):
+    """Legacy BFS find_path vs A* on a large map, including unreachable goals."""
+    import math
+    hexmap = _BenchMap(size, size)
+    # a walled-off goal: the BFS floods the whole map before giving up
+    walled = (size - 3, size - 3)
+    for n in hexmap.neighbors(*walled):
+        hexmap.terrain.set_tile(*n, "water")
+
+    rng = random.Random(7)
+    pairs = []
+    while len(pairs) < queries:
+        a = (rng.randrange(size), rng.randrange(size))
+        b = (min(size - 1, a[0] + rng.randint(-15, 15)), min(size - 1, a[1] + rng.randint(-15, 15)))
+        b = (max(0, b[0]), max(0, b[1]))
+        pairs.append((a, b))
+    unreachable = [((size // 2, size // 2), walled)]
+
+    print(f"find_path on {size}x{size} map")
+    for label, batch in ((f"{len(pairs)} nearby goals", pairs), ("walled-off goal", unreachable)):
+        t_bfs, _ = _timed(lambda: [_legacy_bfs_path(hexmap, a, b, set()) for a, b in batch])
+        t_astar, found = _timed(lambda: [hexmap.find_path(a, b, set(), math.inf) for a, b in batch])
+        t_budget, budgeted = _timed(lambda: [hexmap.find_path(a, b, set()) for a, b in batch])
+        lost = sum(path is not None for path in found) - sum(path is not None for path in budgeted)
+        print(f"  {label}:")
+        print(f"    legacy BFS:            {t_bfs * 1e3:8.2f} ms")
+        print(f"    A* (exhaustive):       {t_astar * 1e3:8.2f} ms")
+        print(f"    A* (default budget):   {t_budget * 1e3:8.2f} ms   ({lost} paths given up)")
+
+
+# -------------------------------------------------------
+# Rendering
+# -------------------------------------------------------
+def _headless_screen(size=(1024, 768)):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    pygame.init()
+    return pygame.display.set_mode(size)
+
+
+def bench_draw(sizes=(13, 100, 500), zooms=(1.0, 3.0), frames=60):
+    """Per-frame HexMap.draw cost for growing maps (first frame renders the layer)."""
+    screen = _headless_screen()
+    from camera import Camera
+    from hexmap import HexMap
+
+    print("HexMap.draw per frame, camera on the map center")
+    for size in sizes:
+        camera = Camera()
+        hexmap = HexMap(screen, camera)
+        hexmap.set_terrain(_BenchMap(size, size).terrain)
+        cx, cy = hexmap.hex_to_pixel(size // 2, size // 2)
+
+        for zoom in zooms:
+            camera.zoom = zoom
+            camera.x = screen.get_width() / 2 - cx * zoom
+            camera.y = screen.get_height() / 2 - cy * zoom
+            visible = len(hexmap.visible_tiles())
+
+            t_first, _ = _timed(hexmap.draw)
+            t_frame, _ = _timed(hexmap.draw, frames)
+            print(f"  {size:>4}x{size:<4} zoom {zoom:.1f}  {visible:>5} visible   "
+                  f"first frame {t_first * 1e3:8.2f} ms   steady {t_frame * 1e3:6.3f} ms")
+
+
+def bench_editor_brush(size=300, strokes=120):
+    """Map editor frames while painting with a size-4 brush on a large map."""
+    screen = _headless_screen()
+    from map_editor_screen import MapEditorScreen
+
+    class _App:
+        pass
+
+    app = _App()
+    app.screen = screen
+    editor = MapEditorScreen(app)
+    editor.hexmap.set_terrain(TerrainGrid(size, size))
+    editor.brush_size = 4
+    editor.draw(screen)
+
+    def paint():
+        for i in range(strokes):
+            editor.selected_terrain_idx = i % 4
+            editor.apply_brush(10 + i % 20, 10 + i // 20)
+            editor.draw(screen)
+
+    t, _ = _timed(paint)
+    print(f"editor painting on {size}x{size}, size-4 brush: {t / strokes * 1e3:.2f} ms/frame")
+
+
+# -------------------------------------------------------
+# Game screen queries
+# -------------------------------------------------------
+def bench_occupancy(size=100, per_side=500):
+    """Selection cost in a large battle: occupancy index vs the old linear scans."""
+    screen = _headless_screen()
+    from game_screen import GameScreen
+    from unit import Unit
+
+    class _App:
+        pass
+
+    app = _App()
+    app.screen = screen
+    game = GameScreen(app, "<benchmark>", {0: [], 1: []})
+    game.hexmap.set_terrain(TerrainGrid(size, size))
+    state = game.state
+    state.terrain = game.hexmap.terrain
+    state.turns.phase = "play"
+
+    rng = random.Random(3)
+    tiles = rng.sample([(q, r) for r in range(size) for q in range(size)], 2 * per_side)
+    for i, (q, r) in enumerate(tiles):
+        u = Unit(q, r, owner=i % 2, unit_class="marksman", table=state.table,
+                 ranged={"attack": 1, "hit": 3, "damage": 1, "range": 10})
+        state.units.append(u)
+        state.occupancy.place(u)
+    unit = state.units[0]
+
+    def legacy_select():
+        clicked = next((u for u in state.units if (u.q, u.r) == (unit.q, unit.r)), None)
+        blocked = {(u.q, u.r) for u in state.units if u is not clicked}
+        game.hexmap.reachable_with_paths((unit.q, unit.r), unit.move_range, blocked)
+        adjacent = lambda a: any(
+            o.owner != a.owner and (o.q, o.r) == (a.q + dq, a.r + dr)
+            for dq, dr in game.hexmap.AXIAL_DIRECTIONS for o in state.units)
+        return {(e.q, e.r) for e in state.units
+                if e.owner != unit.owner
+                and (unit.can_attack(e, "melee") or (unit.can_attack(e, "ranged") and not adjacent(unit)))}
+
+    def indexed_select():
+        state.unit_at((unit.q, unit.r))
+        game.selected_unit = unit
+        game.refresh_selection()
+        return set(game.attackable_enemies)
+
+    t_legacy, legacy = _timed(legacy_select, 5)
+    t_indexed, indexed = _timed(indexed_select, 5)
+    assert legacy == indexed
+    print(f"select a unit with {per_side} units per side on {size}x{size}")
+    print(f"  linear scans:     {t_legacy * 1e3:8.2f} ms")
+    print(f"  occupancy index:  {t_indexed * 1e3:8.2f} ms")
+
+
+# -------------------------------------------------------
+# Units
+# -------------------------------------------------------
+class _LegacyUnit:
+    """The pre-UnitTable Unit layout: a __dict__ per unit, dicts per weapon."""
+
+    def __init__(self, q, r, owner, **stats):
+        self.q, self.r, self.owner = q, r, owner
+        self.move_range = stats["move_range"]
+        self.hp = stats["hp"]
+        self.save = stats["save"]
+        self.morale = stats["morale"]
+        self.category = "henchman"
+        self.unit_class = "soldier"
+        self.max_action_points = self.action_points = stats["action_points"]
+        self.melee = dict(stats["melee"])
+        self.ranged = dict(stats.get("ranged") or {"attack": 0, "hit": 0, "damage": 0, "range": 0})
+        self.color = (0, 200, 0)
+        self.cost = 0
+        self.icon = None
+
+
+def bench_units(count=20_000):
+    """Memory per unit and a bulk AP reset: plain objects vs UnitTable views."""
+    from unit import Unit
+    from unit_catalog import UNIT_CATALOG
+    from unit_table import UnitTable
+
+    stats = UNIT_CATALOG["soldier"]["stats"]
+    legacy_bytes, legacy = _measure_alloc(
+        lambda: [_LegacyUnit(i % 100, i // 100, i % 2, **stats) for i in range(count)])
+
+    def build_views():
+        table = UnitTable(count)
+        return table, [Unit(i % 100, i // 100, owner=i % 2, table=table, **stats) for i in range(count)]
+
+    view_bytes, (table, _views) = _measure_alloc(build_views)
+
+    def legacy_reset():
+        for u in legacy:
+            if u.owner == 1:
+                u.action_points = u.max_action_points
+
+    t_legacy, _ = _timed(legacy_reset, 5)
+    t_table, _ = _timed(lambda: table.reset_actions(1), 5)
+
+    print(f"{count} units")
+    print(f"  plain objects:  {legacy_bytes / count:7.0f} B/unit   reset AP {t_legacy * 1e3:7.3f} ms")
+    print(f"  UnitTable:      {view_bytes / count:7.0f} B/unit   reset AP {t_table * 1e3:7.3f} ms")
+
+
+def _legacy_unit_draw(unit, surface, camera, hexmap):
+    """The pre-sprite Unit.draw: six primitive draws and a text blit per unit."""
+    import pygame
+    from fonts import render_text
+    from unit import Unit
+
+    x, y = hexmap.hex_to_pixel(unit.q, unit.r)
+    sx_f, sy_f = camera.apply((x, y))
+    sx, sy = int(sx_f), int(sy_f)
+    radius = max(4, int(hexmap.size * 0.4))
+    pygame.draw.circle(surface, unit.color, (sx, sy), radius)
+    outline_color = (255, 50, 50) if unit.owner == 1 else (50, 255, 50)
+    pygame.draw.circle(surface, outline_color, (sx, sy), radius, 2)
+    unit.draw_symbol(surface, sx, sy, radius)
+    bar_w = radius * 2
+    hp_ratio = max(0.0, min(1.0, unit.hp / 2.0))
+    pygame.draw.rect(surface, (60, 60, 60), (sx - radius, sy + radius + 3, bar_w, 4))
+    if unit.hp > 0:
+        pygame.draw.rect(surface, (0, 255, 0), (sx - radius, sy + radius + 3, int(bar_w * hp_ratio), 4))
+    if Unit.FONT:
+        surface.blit(render_text(Unit.FONT, str(unit.action_points), True, (255, 255, 255)), (sx - 5, sy - 10))
+
+
+def bench_unit_draw(count=1000, frames=30):
+    """Drawing many units per frame: primitive draws vs cached sprite pieces, per unit and batched."""
+    screen = _headless_screen()
+    import pygame
+    from camera import Camera
+    from hexmap import HexMap
+    from unit import Unit
+    from unit_catalog import UNIT_CATALOG
+    from unit_sprites import SPRITES
+    from unit_table import UnitTable
+
+    Unit.init_fonts()
+    camera = Camera()
+    hexmap = HexMap(screen, camera)
+    names = list(UNIT_CATALOG)
+    table = UnitTable(count)
+    units = []
+    for i in range(count):
+        name = names[i % len(names)]
+        unit = Unit(i % 40, i // 40, owner=i % 2, unit_class=name, table=table,
+                    **UNIT_CATALOG[name]["stats"])
+        unit.hp = i % 3            # dead, wounded and healthy bars
+        unit.action_points = i % 3
+        units.append(unit)
+
+    def legacy():
+        for unit in units:
+            _legacy_unit_draw(unit, screen, camera, hexmap)
+
+    def per_unit():
+        for unit in units:
+            unit.draw(screen, camera, hexmap)
+
+    def batched():
+        Unit.draw_all(screen, units, camera, hexmap)
+
+    SPRITES.clear()
+    frames_drawn = []
+    for draw in (legacy, per_unit, batched):
+        screen.fill((0, 0, 0))
+        draw()
+        frames_drawn.append(pygame.image.tobytes(screen, "RGB"))
+    t_legacy, _ = _timed(legacy, frames)
+    t_per_unit, _ = _timed(per_unit, frames)
+    t_batched, _ = _timed(batched, frames)
+    stats = SPRITES.stats()
+    print(f"{count} units per frame ({stats['bodies']} bodies, {stats['bars']} HP bars, "
+          f"{stats['labels']} AP labels cached)")
+    print(f"  primitives:          {t_legacy * 1e3:7.2f} ms/frame")
+    print(f"  sprites, per unit:   {t_per_unit * 1e3:7.2f} ms/frame")
+    print(f"  sprites, batched:    {t_batched * 1e3:7.2f} ms/frame   "
+          f"(same pixels as primitives: {frames_drawn[0] == frames_drawn[1] == frames_drawn[2]})")
+
+
+# -------------------------------------------------------
+# Combat
+# -------------------------------------------------------
+def bench_combat(attacks=200_000):
+    """perform_attack in a loop vs batched resolve_attacks, and their hit/wound distributions."""
+    import numpy as np
+
+    from combat import resolve_attacks
+    from unit import Unit
+    from unit_catalog import UNIT_CATALOG
+    from unit_table import UnitTable
+
+    table = UnitTable()
+    names = list(UNIT_CATALOG)
+    units = [Unit(0, 0, owner=i % 2, unit_class=name, table=table, **UNIT_CATALOG[name]["stats"])
+             for i, name in enumerate(names * 2)]
+    pairs = [(a, d) for a in units for d in units if a.owner != d.owner]
+    base_hp = {u.row: u.hp for u in units}
+
+    random.seed(11)
+    loop_n = attacks // 10
+
+    def loop():
+        hits = unsaved = 0
+        for i in range(loop_n):
+            a, d = pairs[i % len(pairs)]
+            d.hp = base_hp[d.row]
+            a.action_points = 1
+            h, u, _k = a.perform_attack(d, "melee")
+            hits += h
+            unsaved += u
+        return hits, unsaved
+
+    attacker_rows = np.array([a.row for a, _ in pairs] * (attacks // len(pairs) + 1))[:attacks]
+    defender_rows = np.array([d.row for _, d in pairs] * (attacks // len(pairs) + 1))[:attacks]
+    for u in units:
+        u.hp = base_hp[u.row]
+    rng = np.random.default_rng(11)
+
+    t_loop, (loop_hits, loop_unsaved) = _timed(loop)
+    t_batch, (hits, unsaved, killed) = _timed(
+        lambda: resolve_attacks(table, attacker_rows, defender_rows, "melee", rng))
+
+    expected_hits = sum(a.melee["attack"] * a.melee["hit"] / 6 for a, _ in pairs) / len(pairs)
+    expected_unsaved = sum(
+        a.melee["attack"] * a.melee["hit"] / 6 * (6 - d.save) / 6 for a, d in pairs) / len(pairs)
+
+    print(f"melee attacks over all catalog pairings "
+          f"(expected mean hits {expected_hits:.4f}, unsaved {expected_unsaved:.4f})")
+    print(f"  perform_attack loop: {loop_n / t_loop:12,.0f} attacks/s   "
+          f"mean hits {loop_hits / loop_n:.4f}  mean unsaved {loop_unsaved / loop_n:.4f}")
+    print(f"  resolve_attacks:     {attacks / t_batch:12,.0f} attacks/s   "
+          f"mean hits {hits.mean():.4f}  mean unsaved {unsaved.mean():.4f}  "
+          f"kill rate {killed.mean():.4f}")
+
+
+def bench_odds(repeat=1000):
+    """Exact attack odds for every UNIT_CATALOG pairing: first (cold) and memoized lookups."""
+    from combat import attack_odds
+    from unit_catalog import UNIT_CATALOG
+
+    stats = [info["stats"] for info in UNIT_CATALOG.values()]
+    keys = [
+        (w["attack"], w["hit"], w["damage"], d["save"], d["hp"])
+        for a in stats for d in stats
+        for w in (a["melee"], a.get("ranged") or {"attack": 0, "hit": 0, "damage": 0})
+    ]
+
+    attack_odds.cache_clear()
+    t_cold, _ = _timed(lambda: [attack_odds(*k) for k in keys])
+    t_warm, _ = _timed(lambda: [attack_odds(*k) for k in keys], repeat)
+    print(f"exact odds for {len(keys)} catalog attacker/target/weapon combinations")
+    print(f"  cold:      {t_cold * 1e6:8.1f} us")
+    print(f"  memoized:  {t_warm * 1e6:8.1f} us")
+
+
+# -------------------------------------------------------
+# Headless games
+# -------------------------------------------------------
+def bench_headless(games=100, max_turns=60):
+    """Random self-play on the pygame-free GameState: games and actions per second."""
+    from game_state import GameState
+
+    roster = ["captain", "soldier", "marksman"]
+    rng = random.Random(5)
+
+    def play():
+        actions = 0
+        results = {0: 0, 1: 0, None: 0}
+        for seed in range(games):
+            state = GameState(TerrainGrid(13, 13), {0: roster, 1: roster},
+                              max_turns=max_turns, rng=random.Random(seed))
+            while not state.over:
+                state.apply(rng.choice(state.legal_actions()))
+                actions += 1
+            results[state.winner] += 1
+        return actions, results
+
+    t, (actions, results) = _timed(play)
+    print(f"{games} random games on 13x13, 3 units a side, at most {max_turns} turns")
+    print(f"  {games / t * 60:8.0f} games/min   {actions / t:8.0f} actions/s   "
+          f"(P1 {results[0]}, P2 {results[1]}, draws {results[None]})")
+
+
+def bench_mcts(games=200, budgets=(0.0, 0.02, 0.1, 0.5, 1.0)):
+    """
+    MCTS against GreedyPolicy at several per-turn budgets: win rate (with
+    its 95% margin) and search iterations. A budget of 0 never searches,
+    so that row is the greedy fallback against greedy.
+    """
+    import math
+    from game_state import GameState
+    from mcts import MCTSPolicy
+    from policies import GreedyPolicy
+    from tournament import draft_roster
+
+    print(f"{games} games per budget on 13x13, drafted rosters, MCTS alternating first and second")
+    for budget in budgets:
+        wins = searches = iterations = 0
+        start = time.perf_counter()
+        for seed in range(games):
+            rng = random.Random(seed)
+            rosters = {0: draft_roster(rng), 1: draft_roster(rng)}
+            state = GameState(TerrainGrid(13, 13), rosters, max_turns=100, rng=random.Random(seed))
+            ai = MCTSPolicy(random.Random(seed), budget)
+            players = [ai, GreedyPolicy(random.Random(seed))]
+            if seed % 2:
+                players.reverse()
+            while not state.over:
+                state.apply(players[state.current_player].choose(state))
+            wins += state.winner == players.index(ai)
+            searches += ai.searches
+            iterations += ai.total_iterations
+        t = time.perf_counter() - start
+        rate = wins / games
+        margin = 1.96 * math.sqrt(rate * (1 - rate) / games)
+        print(f"  {budget:5.2f} s/turn: MCTS wins {rate:6.1%} +-{margin:5.1%}   "
+              f"{iterations / max(1, searches):7.0f} iterations/search   {t:6.1f} s")
+
+
+def bench_zobrist(games=50, seconds=1.0):
+    """Incremental Zobrist hash upkeep vs rehashing, and MCTS dedup rate per transposition table setup."""
+    import mcts
+    from game_state import GameState
+    from policies import GreedyPolicy
+    from zobrist import KEYS, TranspositionTable
+
+    roster = ["captain", "soldier", "marksman"]
+    rng = random.Random(9)
+    states = []
+    for seed in range(games):
+        state = GameState(TerrainGrid(13, 13), {0: roster, 1: roster}, max_turns=60, rng=random.Random(seed))
+        greedy = GreedyPolicy(random.Random(seed))
+        while not state.over:
+            state.apply(greedy.choose(state) if rng.random() < 0.7 else rng.choice(state.legal_actions()))
+            states.append(state.copy())
+
+    t_full, _ = _timed(lambda: [KEYS.full(s) for s in states])
+    print(f"{len(states)} positions from greedy/random games")
+    print(f"  full rehash {t_full / len(states) * 1e6:6.1f} us/position "
+          f"(the incremental update is a few XORs per action)")
+
+    state = GameState(TerrainGrid(13, 13), {0: roster, 1: roster}, rng=random.Random(1))
+    greedy = GreedyPolicy(random.Random(1))
+    while state.phase == "setup":
+        state.apply(greedy.choose(state))
+    for _ in range(4):
+        state.apply(greedy.choose(state))
+
+    class NoTable:
+        probes = hits = 0
+
+        def get(self, key, default=None):
+            return default
+
+        def put(self, key, value, depth=0):
+            pass
+
+    print(f"MCTS from one mid-game position, {seconds:.1f} s each")
+    setups = [("none", 0, NoTable())] + [
+        (policy, size, TranspositionTable(size, policy))
+        for size, policy in [(64, "always"), (64, "depth"), (64, "two_tier"), (1 << 14, "two_tier")]
+    ]
+    for policy, size, table in setups:
+        _lines, stats = mcts.search(state.copy(), time.monotonic() + seconds, random.Random(2), table)
+        print(f"  {policy:<8} {size:6d} slots: {stats.nodes_per_second:7.0f} nodes/s   "
+              f"{stats.iterations / stats.seconds:6.0f} iterations/s   dedup {stats.dedup_rate:6.1%}")
+
+
+def bench_make(games=20, per_position=8):
+    """Trying hypothetical actions: deepcopy + apply vs GameState.copy + apply vs make/unmake."""
+    import copy
+    from game_state import GameState
+    from policies import GreedyPolicy
+
+    roster = ["captain", "soldier", "marksman"]
+    rng = random.Random(11)
+    trials = []      # (state, actions to try on it)
+    for seed in range(games):
+        state = GameState(TerrainGrid(13, 13), {0: roster, 1: roster}, max_turns=60, rng=random.Random(seed))
+        greedy = GreedyPolicy(random.Random(seed))
+        while not state.over:
+            actions = state.legal_actions()
+            if state.phase == "play":
+                trials.append((state.copy(), rng.sample(actions, min(per_position, len(actions)))))
+            state.apply(greedy.choose(state) if rng.random() < 0.7 else rng.choice(actions))
+    tries = sum(len(actions) for _state, actions in trials)
+
+    def deep():
+        for state, actions in trials:
+            for action in actions:
+                copy.deepcopy(state).apply(action)
+
+    def copied():
+        for state, actions in trials:
+            for action in actions:
+                state.copy().apply(action)
+
+    def make_unmake():
+        for state, actions in trials:
+            for action in actions:
+                state.unmake(state.make(action))
+
+    t_deep, _ = _timed(deep)
+    t_copy, _ = _timed(copied)
+    t_make, _ = _timed(make_unmake)
+    print(f"{tries} actions tried from {len(trials)} play positions")
+    print(f"  deepcopy + apply:  {tries / t_deep:9.0f} actions/s")
+    print(f"  copy + apply:      {tries / t_copy:9.0f} actions/s   ({t_deep / t_copy:5.1f}x)")
+    print(f"  make + unmake:     {tries / t_make:9.0f} actions/s   ({t_deep / t_make:5.1f}x)")
+
+
+# -------------------------------------------------------
+# Text
+# -------------------------------------------------------
+def bench_text(frames=300):
+    """A frame's worth of UI labels: SysFont + font.render every frame vs get_font + render_text."""
+    _headless_screen()
+    import pygame
+    from fonts import TEXT_CACHE, get_font, render_text
+
+    labels = ["Map Editor", "Map name:", "Terrains:", "Height:", "Brush size:", "Saved maps:"]
+    labels += [name.title() for name in TERRAIN_TYPES] + [str(i) for i in range(10)]
+    white = (255, 255, 255)
+
+    def uncached():
+        font = pygame.font.SysFont("arial", 16)
+        for text in labels:
+            font.render(text, True, white)
+
+    def cached():
+        font = get_font("arial", 16)
+        for text in labels:
+            render_text(font, text, True, white)
+
+    TEXT_CACHE.clear()
+    t_old, _ = _timed(uncached, frames)
+    t_new, _ = _timed(cached, frames)
+    print(f"{len(labels)} labels per frame")
+    print(f"  SysFont + render:        {t_old * 1e3:7.3f} ms/frame")
+    print(f"  get_font + render_text:  {t_new * 1e3:7.3f} ms/frame   "
+          f"(hits {TEXT_CACHE.hits}, misses {TEXT_CACHE.misses})")
+
+
+BENCHMARKS = {
+    "terrain": bench_terrain,
+    "mapfile": bench_mapfile,
+    "mapped": bench_mapped,
+    "chunked": bench_chunked,
+    "catalog": bench_catalog,
+    "reachability": bench_reachability,
+    "find_path": bench_find_path,
+    "draw": bench_draw,
+    "editor_brush": bench_editor_brush,
+    "occupancy": bench_occupancy,
+    "units": bench_units,
+    "unit_draw": bench_unit_draw,
+    "combat": bench_combat,
+    "odds": bench_odds,
+    "headless": bench_headless,
+    "mcts": bench_mcts,
+    "zobrist": bench_zobrist,
+    "make": bench_make,
+    "text": bench_text,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
@@ -0,0 +1,336 @@
+# chunked_terrain.py
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+from mapfile import (
+    RECORD,
+    MapFormatError,
+    atomic_write,
+    grid_to_records,
+    palette_lookup,
+    read_file_header,
+    records_to_grid,
+    same_file,
+)
+from settings import CHUNK_MEMORY_BUDGET, CHUNK_SIZE
+from terrain_grid import TerrainGrid
+
+
+class ChunkedTerrainGrid(TerrainGrid):
+    """
+    A TerrainGrid over a .hexm file that keeps only some of the map in memory.
+
+    The map is split into chunk_size x chunk_size axial chunks, each decoded
+    into a small in-memory TerrainGrid the first time a tile in it is read.
+    Decoded chunks live in an LRU bounded by max_bytes; stream() pins the
+    chunks around the camera and active units so they stay resident, and
+    everything else is evicted oldest-first once the budget is exceeded.
+
+    Edited chunks are dirty and are never evicted, so unsaved edits are kept
+    until save() writes them to the file.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, max_bytes=CHUNK_MEMORY_BUDGET):
+        self.path = path
+        self.width, self.height, palette, self._offset = read_file_header(path)
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.chunk_bytes = TerrainGrid(chunk_size, chunk_size).memory_usage()
+
+        # file palette index <-> TERRAIN_IDS
+        self._to_id = palette_lookup(palette)
+        self._to_file = np.zeros(256, dtype=np.uint8)
+        self._to_file[self._to_id] = np.arange(len(self._to_id), dtype=np.uint8)
+
+        self.chunks = OrderedDict()   # (cq, cr) -> TerrainGrid, least recently used first
+        self.dirty_chunks = set()
+        self.pinned = set()
+        self._filled = None           # set by fill(): unread chunks are all this type
+        self._last_key = None         # one-entry cache for runs of lookups in the same chunk
+        self._last_chunk = None
+        self.loads = 0
+        self.evictions = 0
+
+        self._file = open(path, "rb")
+        expected = self._offset + self.width * self.height * RECORD.itemsize
+        if self._file.seek(0, 2) < expected:
+            self._file.close()
+            raise MapFormatError("map file is truncated")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reader(self):
+        """
+        Another grid over the same file, for reading on another thread. It
+        has its own file handle and chunk cache (within the same max_bytes),
+        so neither grid's LRU is touched from two threads. Unsaved edits
+        aren't part of it.
+        """
+        return ChunkedTerrainGrid(*self.__reduce__()[1])
+
+    def __reduce__(self):
+        # pickles (e.g. to a search process) as its file, which the copy streams itself
+        if self.dirty_chunks or self._filled is not None:
+            raise ValueError("chunked grid has unsaved edits; save it before sharing it")
+        return ChunkedTerrainGrid, (self.path, self.chunk_size, self.max_bytes)
+
+    # -----------------------
+    # Chunks
+    # -----------------------
+    def chunk_key(self, q, r):
+        return q // self.chunk_size, r // self.chunk_size
+
+    def chunk_count(self):
+        cs = self.chunk_size
+        return -(-self.width // cs), -(-self.height // cs)
+
+    def chunk_bounds(self, cq, cr):
+        """(q0, r0, width, height) of a chunk in map tiles."""
+        cs = self.chunk_size
+        q0, r0 = cq * cs, cr * cs
+        return q0, r0, min(cs, self.width - q0), min(cs, self.height - r0)
+
+    def chunk(self, cq, cr):
+        """The decoded chunk, loading it (and evicting others) if needed."""
+        key = (cq, cr)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self._load_chunk(cq, cr)
+        self.chunks[key] = chunk
+        self.loads += 1
+        self._evict(keep=key)
+        return chunk
+
+    def stream(self, areas):
+        """
+        Make the chunks overlapping `areas` resident and pin them until the
+        next call. Each area is a (q_min, r_min, q_max, r_max) tile rectangle
+        (inclusive, clamped to the map).
+        """
+        wanted = set()
+        cs = self.chunk_size
+        for q_min, r_min, q_max, r_max in areas:
+            q_min, r_min = max(q_min, 0), max(r_min, 0)
+            q_max, r_max = min(q_max, self.width - 1), min(r_max, self.height - 1)
+            if q_min > q_max or r_min > r_max:
+                continue
+            for cr in range(r_min // cs, r_max // cs + 1):
+                for cq in range(q_min // cs, q_max // cs + 1):
+                    wanted.add((cq, cr))
+
+        self.pinned = wanted
+        for key in wanted:
+            self.chunk(*key)
+        return wanted
+
+    def resident_bytes(self):
+        return len(self.chunks) * self.chunk_bytes
+
+    def _evict(self, keep=None):
+        if len(self.chunks) * self.chunk_bytes <= self.max_bytes:
+            return
+        for key in list(self.chunks):
+            if key == keep or key in self.pinned or key in self.dirty_chunks:
+                continue
+            del self.chunks[key]
+            self.evictions += 1
+            if key == self._last_key:
+                self._last_key = self._last_chunk = None
+            if len(self.chunks) * self.chunk_bytes <= self.max_bytes:
+                break
+
+    def _peek_chunk(self, key):
+        """The resident chunk, or a fresh uncached decode of it."""
+        chunk = self.chunks.get(key)
+        return chunk if chunk is not None else self._load_chunk(*key)
+
+    def _load_chunk(self, cq, cr):
+        q0, r0, w, h = self.chunk_bounds(cq, cr)
+        if self._filled is not None:
+            return TerrainGrid(w, h, fill=self._filled)
+
+        size = RECORD.itemsize
+        buf = bytearray(w * h * size)
+        view = memoryview(buf)
+        for row in range(h):
+            self._file.seek(self._offset + ((r0 + row) * self.width + q0) * size)
+            self._file.readinto(view[row * w * size:(row + 1) * w * size])
+        records = np.frombuffer(buf, dtype=RECORD)
+        return records_to_grid(w, h, records, self._to_id)
+
+    def _write_chunk(self, fh, cq, cr, chunk):
+        q0, r0, w, h = self.chunk_bounds(cq, cr)
+        data = grid_to_records(chunk, self._to_file).tobytes()
+        row_bytes = w * RECORD.itemsize
+        for row in range(h):
+            fh.seek(self._offset + ((r0 + row) * self.width + q0) * RECORD.itemsize)
+            fh.write(data[row * row_bytes:(row + 1) * row_bytes])
+
+    def _locate(self, q, r):
+        cs = self.chunk_size
+        key = (q // cs, r // cs)
+        if key != self._last_key:
+            self._last_chunk = self.chunk(*key)
+            self._last_key = key
+        return self._last_chunk, q - key[0] * cs, r - key[1] * cs
+
+    # -----------------------
+    # Tile access
+    # -----------------------
+    def props(self, q, r):
+        if not (0 <= q < self.width and 0 <= r < self.height):
+            return None
+        chunk, lq, lr = self._locate(q, r)
+        return chunk.props(lq, lr)
+
+    def terrain_type(self, q, r):
+        chunk, lq, lr = self._locate(q, r)
+        return chunk.terrain_type(lq, lr)
+
+    def type_name(self, q, r):
+        chunk, lq, lr = self._locate(q, r)
+        return chunk.type_name(lq, lr)
+
+    def set_tile(self, q, r, ttype, height=None, move_cost=None, passable=None):
+        chunk, lq, lr = self._locate(q, r)
+        if not chunk.set_tile(lq, lr, ttype, height, move_cost, passable):
+            return False
+        self.dirty_chunks.add(self._last_key)
+        return True
+
+    def fill(self, ttype="plain"):
+        """
+        Reset every tile to `ttype`. Chunks that aren't resident are read one
+        at a time to report what changed, but not kept.
+        """
+        changed = []
+        cols, rows = self.chunk_count()
+        for cr in range(rows):
+            for cq in range(cols):
+                chunk = self._peek_chunk((cq, cr))
+                q0, r0, _w, _h = self.chunk_bounds(cq, cr)
+                changed.extend((q0 + q, r0 + r) for q, r in chunk.fill(ttype))
+
+        self._filled = ttype
+        self.dirty_chunks.clear()
+        return changed
+
+    def copy(self):
+        """An in-memory TerrainGrid of the whole map (including unsaved edits)."""
+        grid = TerrainGrid(self.width, self.height)
+        cols, rows = self.chunk_count()
+        for cr in range(rows):
+            for cq in range(cols):
+                chunk = self._peek_chunk((cq, cr))
+                q0, r0, w, h = self.chunk_bounds(cq, cr)
+                for row in range(h):
+                    dst = (r0 + row) * self.width + q0
+                    src = row * w
+                    grid.type_ids[dst:dst + w] = chunk.type_ids[src:src + w]
+                    grid.heights[dst:dst + w] = chunk.heights[src:src + w]
+                    grid.passable[dst:dst + w] = chunk.passable[src:src + w]
+                for i, cost in chunk.cost_overrides.items():
+                    grid.cost_overrides[(r0 + i // w) * self.width + q0 + i % w] = cost
+        grid.rebuild_codes()
+        return grid
+
+    def memory_usage(self):
+        """Approximate bytes of decoded chunks currently held."""
+        return self.resident_bytes()
+
+    # -----------------------
+    # Saving
+    # -----------------------
+    def save(self, path=None):
+        """
+        Write edits to `path` (default: the file the map was opened from).
+        Only dirty chunks are rewritten, or every chunk after fill().
+        """
+        if path is not None and not same_file(path, self.path):
+            shutil.copyfile(self.path, path)
+            self._write_changes(path)
+            return
+        self._write_changes(self.path)
+        self.dirty_chunks.clear()
+        self._filled = None
+
+    def snapshot(self):
+        """
+        A frozen copy of the unsaved edits (see ChunkedSnapshot), cheap to
+        take on the UI thread and safe to write from a worker thread.
+        """
+        return ChunkedSnapshot(self, {key: self.chunks[key].copy() for key in self.dirty_chunks})
+
+    def mark_saved(self, snapshot, path):
+        """
+        Call on the owning thread once `snapshot` has been written to `path`.
+        If that was this map's own file, read from the new file from now on
+        and clear the dirty chunks that haven't been edited since.
+        """
+        if not same_file(path, self.path):
+            return
+        self._file.close()
+        self._file = open(self.path, "rb")
+        for key, saved in snapshot.chunks.items():
+            chunk = self.chunks.get(key)
+            if chunk is not None and chunk.same_tiles(saved):
+                self.dirty_chunks.discard(key)
+        if self._filled == snapshot.filled:
+            self._filled = None
+
+    def _write_changes(self, path):
+        with open(path, "r+b") as fh:
+            if self._filled is not None:
+                cols, rows = self.chunk_count()
+                keys = [(cq, cr) for cr in range(rows) for cq in range(cols)]
+            else:
+                keys = sorted(self.dirty_chunks, key=lambda k: (k[1], k[0]))
+            for key in keys:
+                chunk = self._peek_chunk(key)
+                self._write_chunk(fh, *key, chunk)
+
+
+class ChunkedSnapshot:
+    """
+    Unsaved state of a ChunkedTerrainGrid at one moment: copies of its dirty
+    chunks plus any pending fill(). save() rebuilds the full file from the
+    grid's source file and these chunks, without touching the live grid's
+    chunk cache, so it can run while the grid keeps being edited.
+    """
+
+    def __init__(self, grid, chunks):
+        self.grid = grid          # only its immutable layout is used
+        self.source = grid.path
+        self.chunks = chunks
+        self.filled = grid._filled
+
+    def save(self, path):
+        atomic_write(path, self._write)
+
+    def _write(self, tmp):
+        grid = self.grid
+        shutil.copyfile(self.source, tmp)
+        with open(tmp, "r+b") as fh:
+            if self.filled is not None:
+                cols, rows = grid.chunk_count()
+                keys = [(cq, cr) for cr in range(rows) for cq in range(cols)]
+            else:
+                keys = sorted(self.chunks, key=lambda k: (k[1], k[0]))
+            for key in keys:
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    _q0, _r0, w, h = grid.chunk_bounds(*key)
+                    chunk = TerrainGrid(w, h, fill=self.filled)
+                grid._write_chunk(fh, *key, chunk)
+
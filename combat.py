@@ -0,0 +1,149 @@
+# combat.py
+from functools import lru_cache
+from math import comb
+from typing import NamedTuple
+
+import numpy as np
+
+
+def roll_attacks(attacks, hit, damage, save, target_hp, rng=None):
+    """
+    Resolve many independent attacks at once with the Unit.perform_attack rules.
+
+    All arguments are equal-length arrays (one entry per attack): dice to
+    roll, hit value (a d6 <= hit hits), damage per unsaved wound, the
+    target's save (a d6 > save wounds) and the target's current hp.
+    Returns (hits, unsaved, killed) arrays. Nothing is written back.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    attacks = np.asarray(attacks, dtype=np.int64)
+    hit = np.asarray(hit)
+    damage = np.asarray(damage)
+    save = np.asarray(save)
+    target_hp = np.asarray(target_hp)
+
+    n = attacks.shape[0]
+    max_dice = int(attacks.max(initial=0))
+    if n == 0 or max_dice <= 0:
+        zeros = np.zeros(n, dtype=np.int64)
+        return zeros, zeros.copy(), np.zeros(n, dtype=bool)
+
+    # one row of dice per attack; columns past that attack's dice count are ignored
+    live = np.arange(max_dice) < attacks[:, None]
+    hit_rolls = rng.integers(1, 7, size=(n, max_dice), dtype=np.int8)
+    save_rolls = rng.integers(1, 7, size=(n, max_dice), dtype=np.int8)
+
+    hit_mask = live & (hit_rolls <= hit[:, None])
+    unsaved_mask = hit_mask & (save_rolls > save[:, None])
+
+    hits = hit_mask.sum(axis=1)
+    unsaved = unsaved_mask.sum(axis=1)
+    killed = (attacks > 0) & (target_hp - unsaved * damage <= 0)
+    return hits, unsaved, killed
+
+
+def resolve_attacks(table, attacker_rows, defender_rows, weapon_types, rng=None):
+    """
+    Batch version of Unit.perform_attack over UnitTable rows.
+
+    weapon_types is a sequence of "melee"/"ranged" (or a single string for
+    all attacks). Returns (hits, unsaved, killed) per attack; hp and AP in
+    the table are left untouched so callers decide how to apply results.
+    """
+    attacker_rows = np.asarray(attacker_rows)
+    defender_rows = np.asarray(defender_rows)
+    if isinstance(weapon_types, str):
+        ranged = np.full(attacker_rows.shape[0], weapon_types == "ranged")
+    else:
+        ranged = np.asarray(weapon_types) == "ranged"
+
+    def stat(field):
+        return np.where(
+            ranged,
+            getattr(table, f"ranged_{field}")[attacker_rows],
+            getattr(table, f"melee_{field}")[attacker_rows],
+        )
+
+    return roll_attacks(
+        stat("attack"),
+        stat("hit"),
+        stat("damage"),
+        table.save[defender_rows],
+        table.hp[defender_rows],
+        rng,
+    )
+
+
+# -------------------------------------------------------
+# Exact odds
+# -------------------------------------------------------
+class AttackOdds(NamedTuple):
+    """Exact outcome distribution of one attack (index = count)."""
+
+    hits: tuple            # P(hits == k)
+    unsaved: tuple         # P(unsaved wounds == k)
+    damage: tuple          # (damage dealt, probability) pairs
+    kill_chance: float
+    expected_hits: float
+    expected_damage: float
+
+
+def _binomial(n, p):
+    return tuple(comb(n, k) * p ** k * (1 - p) ** (n - k) for k in range(n + 1))
+
+
+@lru_cache(maxsize=None)
+def attack_odds(attack, hit, damage, save, target_hp):
+    """
+    Exact distribution for one attack under the perform_attack rules,
+    memoized by the stat tuple.
+
+    Every die hits with p = hit/6 and each hit wounds with p = (6 - save)/6,
+    independently, so hits and unsaved wounds are both binomial in `attack`.
+    """
+    if attack <= 0:
+        return AttackOdds((1.0,), (1.0,), ((0, 1.0),), 0.0, 0.0, 0.0)
+
+    p_hit = min(max(hit, 0), 6) / 6
+    p_wound = min(max(6 - save, 0), 6) / 6
+
+    hits = _binomial(attack, p_hit)
+    unsaved = _binomial(attack, p_hit * p_wound)
+    dealt = tuple((k * damage, p) for k, p in enumerate(unsaved))
+    kill_chance = sum(p for k, p in enumerate(unsaved) if target_hp - k * damage <= 0)
+
+    return AttackOdds(
+        hits,
+        unsaved,
+        dealt,
+        kill_chance,
+        attack * p_hit,
+        attack * p_hit * p_wound * damage,
+    )
+
+
+def odds_for(attacker, defender, weapon_type="melee"):
+    """attack_odds for two units, using the defender's current hp."""
+    weapon = attacker.melee if weapon_type == "melee" else attacker.ranged
+    return attack_odds(weapon["attack"], weapon["hit"], weapon["damage"], defender.save, defender.hp)
+
+
+@lru_cache(maxsize=None)
+def attack_outcomes(attack, hit, damage, save, target_hp):
+    """
+    The distinct results of one attack as (unsaved wounds, probability)
+    pairs, for search: outcomes that kill the target are merged into one,
+    the fewest wounds that do. Memoized like attack_odds.
+    """
+    outcomes = []
+    kill = None               # index of the merged killing outcome
+    for wounds, p in enumerate(attack_odds(attack, hit, damage, save, target_hp).unsaved):
+        if p <= 0:
+            continue
+        if damage > 0 and target_hp <= wounds * damage:
+            if kill is not None:
+                outcomes[kill] = (outcomes[kill][0], outcomes[kill][1] + p)
+                continue
+            kill = len(outcomes)
+        outcomes.append((wounds, p))
+    return tuple(outcomes)
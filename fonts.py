@@ -0,0 +1,75 @@
+# fonts.py
+from collections import OrderedDict
+
+import pygame
+
+_FONTS = {}   # (family, size, bold) -> Font
+
+# how many bytes of rendered text surfaces TextCache keeps
+TEXT_CACHE_BYTES = 8_000_000
+
+
+def get_font(family, size, bold=False):
+    """
+    The font for (family, size, bold), resolved once and shared.
+    family None means pygame's built-in default font.
+    """
+    key = (family, size, bold)
+    font = _FONTS.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        if family is None:
+            font = pygame.font.Font(None, size)
+            font.set_bold(bold)
+        else:
+            font = pygame.font.SysFont(family, size, bold=bold)
+        _FONTS[key] = font
+    return font
+
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, colour, antialias), LRU-bounded by surface bytes."""
+
+    def __init__(self, max_bytes=TEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, tuple(color), antialias)
+        surf = self.cache.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return surf
+
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.cache[key] = surf
+        self.bytes += _surface_bytes(surf)
+        # LRU eviction by byte budget (never evict the surface just rendered)
+        while self.bytes > self.max_bytes and len(self.cache) > 1:
+            _key, old = self.cache.popitem(last=False)
+            self.bytes -= _surface_bytes(old)
+        return surf
+
+    def clear(self):
+        self.cache.clear()
+        self.bytes = 0
+        self.hits = self.misses = 0
+
+
+def _surface_bytes(surf):
+    w, h = surf.get_size()
+    return w * h * surf.get_bytesize()
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, antialias, color):
+    """Cached drop-in for font.render(text, antialias, color)."""
+    return TEXT_CACHE.render(font, text, antialias, color)
@@ -1,27 +1,37 @@
 # game_screen.py
 import pygame
-import random
-from collections import deque
 
 from screen_base import Screen
 from settings import (
     WINDOW_WIDTH, WINDOW_HEIGHT,
-    NUM_PLAYERS, UNITS_PER_PLAYER,
-    BOTTOM_UI_HEIGHT, LOG_WIDTH
+    BOTTOM_UI_HEIGHT, LOG_WIDTH,
+    AI_PLAYERS, AI_TURN_BUDGET, AI_WORKERS, AI_ACTION_DELAY
 )
 from camera import Camera
 from hexmap import HexMap
+from mapfile import open_map
 from unit import Unit
 from unit_catalog import UNIT_CATALOG
-from turn_manager import TurnManager
+from game_state import GameState, MOVE
+from combat import odds_for
+from fonts import get_font, render_text
+from ai_player import AIPlayer
+from mcts import MCTSPolicy
+from policies import GreedyPolicy
 
 
 class GameScreen(Screen):
-    def __init__(self, app, map_name, roster):
+    """
+    Plays a GameState: turns clicks into its actions, animates moves and
+    draws the map, units and UI. All the rules live in the state. The
+    players in ai_players are played by MCTS on a background thread.
+    """
+
+    def __init__(self, app, map_name, roster, ai_players=AI_PLAYERS):
         super().__init__(app)
         
         self.screen = app.screen
-        self.font = pygame.font.SysFont("arial", 24)
+        self.font = get_font("arial", 24)
 
         # External choices
         self.map_name = map_name
@@ -34,36 +44,33 @@ class GameScreen(Screen):
         self.center_camera_on_map()
 
         # --- State ---
-        self.units = []
-        self.player_units = []
-
-        for player, list_of_names in self.roster_data.items():
-            units = []
-            for name in list_of_names:
-                print("Adding", name, "to player", player)
-                info = UNIT_CATALOG[name]
-                u = Unit(q=0, r=0, owner=player,unit_class=name, **info["stats"])
-                u.cost = info["cost"]
-                u.load_icon(info["icon"])
-                units.append(u)
-            self.player_units.append(units)
+        Unit.init_fonts()
+        self.state = GameState(self.hexmap.terrain, self.roster_data, unit_type=Unit)
+        for units in self.state.player_units:
+            for u in units:
+                u.load_icon(UNIT_CATALOG[u.unit_class]["icon"])
 
         self.selected_unit = None
         self.reachable_tiles = set()
+        self.reach_tree = {}
         self.attackable_enemies = set()
+
+        # move animation: the state moves a unit at once, the screen walks it along the path
         self.moving = False
+        self.moving_unit = None
+        self.move_at = None
         self.move_path = []
         self.move_timer = 0
         self.move_delay = 0.2
-        self.move_highlight = None
 
-        # Turn system
-        units_per_player = [len(units) for units in self.player_units]
-        self.turns = TurnManager(NUM_PLAYERS, units_per_player)
-        self.player_moved = [False] * NUM_PLAYERS
+        # computer players; their actions are applied one at a time, AI_ACTION_DELAY apart
+        self.ai = {
+            p: AIPlayer(p, MCTSPolicy(budget=AI_TURN_BUDGET, workers=AI_WORKERS))
+            for p in ai_players if p < self.state.num_players
+        }
+        self.ai_wait = 0
 
         # Combat log
-        self.combat_log = []
         self.MAX_LOG_LINES = 8
 
         # UI
@@ -76,12 +83,12 @@ class GameScreen(Screen):
         usable_w = WINDOW_WIDTH
         usable_h = WINDOW_HEIGHT - BOTTOM_UI_HEIGHT
 
-        xs, ys = [], []
-        for r in range(self.hexmap.height):
-            for q in range(self.hexmap.width):
-                x, y = self.hexmap.hex_to_pixel(q, r)
-                xs.append(x)
-                ys.append(y)
+        # the extreme tile centers are the grid corners; no need to walk every tile
+        corners = [
+            (0, 0), (self.hexmap.width - 1, 0),
+            (0, self.hexmap.height - 1), (self.hexmap.width - 1, self.hexmap.height - 1),
+        ]
+        xs, ys = zip(*(self.hexmap.hex_to_pixel(q, r) for q, r in corners))
 
         cx = (min(xs) + max(xs)) / 2
         cy = (min(ys) + max(ys)) / 2
@@ -90,32 +97,20 @@ class GameScreen(Screen):
         self.camera.x = (usable_w / 2) - cx
         self.camera.y = (usable_h / 2) - cy
 
-    def in_spawn_zone(self, player, r):
-        zone = 4
-        if player == 0:
-            return r < zone
-        return r >= self.hexmap.height - zone
     # ---------------------------------------------------------
     # MAP LOADING
     # ---------------------------------------------------------
     def load_chosen_map(self):
         from settings import MAPS_DIR
-        import os, json
+        import os
 
         path = os.path.join(MAPS_DIR, self.map_name)
         if not os.path.isfile(path):
             print(f"Map file not found: {path}")
             return
 
-        with open(path, "r") as fh:
-            data = json.load(fh)
-
-        self.hexmap.width = data.get("width", self.hexmap.width)
-        self.hexmap.height = data.get("height", self.hexmap.height)
-
-        for key, info in data.get("tiles", {}).items():
-            q, r = map(int, key.split(","))
-            self.hexmap.terrain[(q, r)] = info
+        grid = open_map(path, (self.hexmap.width, self.hexmap.height))
+        self.hexmap.set_terrain(grid)
 
     # ---------------------------------------------------------
     # INPUT
@@ -124,22 +119,22 @@ class GameScreen(Screen):
         #print("GameScreen.handle_event:", ev)
         if ev.type == pygame.KEYDOWN:
             if ev.key == pygame.K_ESCAPE:
+                for ai in self.ai.values():
+                    ai.close()
                 from menu_screen import MenuScreen
                 self.next_screen = MenuScreen(self.app)
                 self.done = True
 
         elif ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-            print("EVENT:", ev)
             self.handle_left_click(ev)
-               
+
 
     def handle_left_click(self, ev):
 
-        if self.moving:
-            return 
-        
+        if self.moving or self.state.current_player in self.ai:
+            return
+
         mx, my = getattr(ev, "pos", pygame.mouse.get_pos())
-        print("click screen coords:", mx, my)
 
         # FIRST: UI buttons
         if self.end_btn.collidepoint((mx, my)):
@@ -147,82 +142,37 @@ class GameScreen(Screen):
             return
 
         wx, wy = self.camera.screen_to_world((mx, my))
-        print("world coords:", wx, wy)
         q, r = self.hexmap.pixel_to_hex(wx, wy)
-        print("computed hex:", (q, r), "inside:", self.hexmap.is_inside_grid(q, r),
-            "in_spawn:", self.in_spawn_zone(self.turns.current_player, r))
 
         if not self.hexmap.is_inside_grid(q, r):
             return
-        
-        if self.end_btn.collidepoint((mx, my)):
-            self.end_turn()
-            return
 
+        state = self.state
+        if state.over:
+            return
         tile = (q, r)
-        clicked_unit = next(
-                (u for u in self.units if (u.q, u.r) == tile),
-                None
-        )
+        clicked_unit = state.unit_at(tile)
 
         # Placement
-        if self.turns.phase == "setup":
-            if self.turns.units_placed[self.turns.current_player] < len(self.player_units[self.turns.current_player]):
-                if self.in_spawn_zone(self.turns.current_player, r):
-                    if not any((u.q, u.r) == tile for u in self.units):
-                        u = self.player_units[self.turns.current_player][self.turns.units_placed[self.turns.current_player]]
-                        u.q, u.r = q, r
-                        self.units.append(u)
-                        self.turns.record_placement(self.turns.current_player)
-                        if not self.turns.can_place_unit(self.turns.current_player):
-                            self.turns.next_turn()
+        if state.phase == "setup":
+            if state.can_place(tile):
+                state.place(tile)
             return
-        
-        if self.turns.phase == "setup":
-            if self.turns.units_placed[self.turns.current_player] >= len(self.player_units[self.turns.current_player]):
-                print("No remaining units to place for player", self.turns.current_player)
-                return
-            if not self.in_spawn_zone(self.turns.current_player, r):
-                print("Tile not in spawn zone:", (q, r))
-                return
-            if any((u.q, u.r) == tile for u in self.units):
-                print("Tile occupied:", tile)
-                return
-            # place unit:
-            print("Placing unit for player", self.turns.current_player, "at", tile)
-
 
         # Selection
-        if clicked_unit and clicked_unit.owner == self.turns.current_player:
+        if clicked_unit and clicked_unit.owner == state.current_player:
             self.selected_unit = clicked_unit
-            self.update_attackable_enemies()
-            blocked = {(u.q, u.r) for u in self.units if u is not self.selected_unit}
-            self.reachable_tiles = self.hexmap.get_reachable_tiles(
-                tile, clicked_unit.move_range, blocked
-            )
+            self.refresh_selection()
 
         elif self.selected_unit and tile in self.reachable_tiles:
-            if self.selected_unit.action_points > 0:
-                blocked = {(u.q, u.r) for u in self.units if u is not self.selected_unit}
-                path = self.hexmap.find_path(
-                    (self.selected_unit.q, self.selected_unit.r),
-                    tile,
-                    blocked
-                )
-                if len(path) > 1:
-                    self.move_path = path[1:]
-                    self.moving = True
-                    self.move_timer = 0
-                    self.selected_unit.action_points -= 1
-
-        elif self.selected_unit and clicked_unit and clicked_unit.owner != self.turns.current_player:
-            if self.selected_unit.action_points > 0:
-                if self.attack(self.selected_unit, clicked_unit):
-                    self.auto_end_turn()
-
-        elif not clicked_unit and self.turns.phase == "play":
-            # ignore empty clicks to preserve selection
-            return
+            unit = self.selected_unit
+            if unit.action_points > 0 and tile != (unit.q, unit.r):
+                # reuse the predecessor tree from the highlight search
+                self.start_move(unit, state.move(unit, tile, self.reach_tree))
+
+        elif self.selected_unit and tile in self.attackable_enemies:
+            state.attack(self.selected_unit, clicked_unit)
+            self.refresh_selection()
 
 
     # ---------------------------------------------------------
@@ -231,34 +181,32 @@ class GameScreen(Screen):
     def update(self, dt):
         self.move_timer += dt
 
-        # --- HANDLE MOVEMENT ---
+        # --- MOVE ANIMATION ---
         if self.moving and self.move_path:
             if self.move_timer >= self.move_delay:
                 self.move_timer = 0
-
-                next_q, next_r = self.move_path.pop(0)
-                self.selected_unit.q = next_q
-                self.selected_unit.r = next_r
+                self.move_at = self.move_path.pop(0)
 
         # --- END MOVEMENT ---
-
-        # Movement animation
-        if not self.move_path:
+        if not self.move_path and self.moving:
             self.moving = False
-
-            if self.selected_unit:
-                if self.selected_unit.action_points > 0:
-                    blocked = {(u.q, u.r) for u in self.units if u is not self.selected_unit}
-                    self.reachable_tiles = self.hexmap.get_reachable_tiles(
-                        (self.selected_unit.q, self.selected_unit.r),
-                        self.selected_unit.move_range,
-                        blocked
-                    )
-                    self.update_attackable_enemies()
+            self.moving_unit = self.move_at = None
+            self.refresh_selection()
+
+        # --- COMPUTER PLAYERS ---
+        self.ai_wait = max(0, self.ai_wait - dt)
+        ai = self.ai.get(self.state.current_player)
+        if ai is not None and not self.state.over and not self.moving and self.ai_wait <= 0:
+            action = ai.poll()
+            if action is None and not ai.busy:
+                if ai.error is not None:
+                    self.notice(f"P{ai.player + 1} search failed ({ai.error}), playing greedily")
+                    ai.error = None
+                    self.play_ai_action(GreedyPolicy().choose(self.state))
                 else:
-                    self.reachable_tiles.clear()
-                    self.attackable_enemies.clear()
-                    self.auto_end_turn()
+                    ai.think(self.state)
+            elif action is not None:
+                self.play_ai_action(action)
 
         events = pygame.event.get()
         keys = pygame.key.get_pressed()
@@ -274,69 +222,103 @@ class GameScreen(Screen):
         surface.fill((30, 30, 30))
 
         # draw map / tiles first
-        self.hexmap.draw()
-
-        # draw units (placed on the map)
-        # ensure units are drawn with camera transform via Unit.draw(surface, camera, hexmap)
-        for u in self.units:
-            try:
-                u.draw(surface, self.camera, self.hexmap)
-            except Exception as e:
-                # keep rendering robust in debug runs
-                print("Error drawing unit:", e)
+        view = surface.get_rect()
+        state = self.state
+        self.hexmap.stream_terrain(view, ((u.q, u.r) for u in state.units))
+        self.hexmap.draw(view)
+        visible = set(self.hexmap.visible_tiles(self.camera, view))
+
+        # draw units (placed on the map), all in one batch; the moving unit
+        # is drawn partway along its path
+        try:
+            Unit.draw_all(surface, state.units, self.camera, self.hexmap,
+                          moving=self.moving_unit, at=self.move_at)
+        except Exception as e:
+            # keep rendering robust in debug runs
+            print("Error drawing units:", e)
 
         # GameScreen.draw()
-        if self.selected_unit:
-            q, r = self.selected_unit.q, self.selected_unit.r
+        if self.selected_unit and state.current_player not in self.ai:
+            q, r = self.move_at if self.moving else (self.selected_unit.q, self.selected_unit.r)
             self.hexmap.draw_highlight(
                 q, r,
                 color=(0, 150, 255, 120)
             )
 
         # placement-phase highlights and roster UI
-        if self.turns.phase == "setup":
+        if state.phase == "setup":
             self.draw_roster_panel()
-            for r in range(self.hexmap.height):
-                for q in range(self.hexmap.width):
-                    if self.in_spawn_zone(self.turns.current_player, r):
-                        self.hexmap.draw_highlight(
-                            q, r,
-                            color=(80, 120, 200, 80)
-                        )
+            for r, q_min, q_max in self.hexmap.visible_rows(self.camera, view):
+                if not state.in_spawn_zone(state.current_player, r):
+                    continue
+                for q in range(q_min, q_max + 1):
+                    self.hexmap.draw_highlight(
+                        q, r,
+                        color=(80, 120, 200, 80)
+                    )
         # movement highlights (play phase)
-        if self.selected_unit and self.turns.phase == "play":
-            for (q, r) in self.reachable_tiles:
+        if self.selected_unit and not self.moving and state.phase == "play":
+            for (q, r) in self.reachable_tiles & visible:
                 self.hexmap.draw_highlight(
                     q, r,
                     color=(80, 200, 120, 80)
                 )
-            for (q, r) in self.attackable_enemies:
+            for (q, r) in self.attackable_enemies & visible:
                 self.hexmap.draw_highlight(
                     q, r,
                     color=(200, 80, 80, 160)
         )
         # draw overlays/UI on top of map & units
         self.draw_ui()
+        self.draw_attack_odds(surface)
+
+    def draw_attack_odds(self, surface):
+        """Tooltip with exact attack odds when hovering a target of the selected unit."""
+        if not self.selected_unit or self.moving or Unit.TOOLTIP_FONT is None:
+            return
+        mouse_pos = pygame.mouse.get_pos()
+        tile = self.hexmap.pixel_to_hex(*self.camera.screen_to_world(mouse_pos))
+        if tile not in self.attackable_enemies:
+            return
+
+        target = self.state.unit_at(tile)
+        weapon_type = self.state.choose_weapon(self.selected_unit, target)
+        if target is None or weapon_type is None:
+            return
+
+        odds = odds_for(self.selected_unit, target, weapon_type)
+        target.draw_tooltip(surface, mouse_pos, extra_lines=[
+            f"{weapon_type.capitalize()} attack:",
+            f"  Expected hits: {odds.expected_hits:.2f}",
+            f"  Expected damage: {odds.expected_damage:.2f}",
+            f"  Kill chance: {odds.kill_chance:.0%}",
+        ])
 
     def draw_ui(self):
         mx, my = pygame.mouse.get_pos()
         hover = self.end_btn.collidepoint((mx, my))
         color = (90, 150, 200) if hover else (70, 130, 180)
 
-        turn_text = f"Player {self.turns.current_player + 1}"
-        if self.turns.phase == "setup":
+        state = self.state
+        turn_text = f"Player {state.current_player + 1}"
+        if state.over:
+            turn_text = "Draw" if state.winner is None else f"Player {state.winner + 1} wins"
+        elif state.phase == "setup":
             turn_text += " – Deployment"
         else:
             turn_text += " – Play"
+        ai = self.ai.get(state.current_player)
+        if ai is not None and not state.over and ai.busy:
+            turn_text += " (thinking…)"
 
-        txt = self.font.render(turn_text, True, (255, 255, 255))
+        txt = render_text(self.font, turn_text, True, (255, 255, 255))
         self.screen.blit(txt, (30, 30))
 
         
         pygame.draw.rect(self.screen, color, self.end_btn, border_radius=8)
         pygame.draw.rect(self.screen, (255, 255, 255), self.end_btn, 2, border_radius=8)
 
-        txt = self.font.render("End Turn", True, (255, 255, 255))
+        txt = render_text(self.font, "End Turn", True, (255, 255, 255))
         self.screen.blit(txt, (self.end_btn.x + 20, self.end_btn.y + 10))
 
         ui_y = WINDOW_HEIGHT - BOTTOM_UI_HEIGHT
@@ -344,8 +326,8 @@ class GameScreen(Screen):
         pygame.draw.rect(self.screen, (100, 100, 150),
                          (10, ui_y + 10, LOG_WIDTH, BOTTOM_UI_HEIGHT - 20), 2)
 
-        for i, line in enumerate(self.combat_log[:self.MAX_LOG_LINES]):
-            txt = self.font.render(line, True, (220, 220, 220))
+        for i, line in enumerate(state.log[:self.MAX_LOG_LINES]):
+            txt = render_text(self.font, line, True, (220, 220, 220))
             self.screen.blit(txt, (20, ui_y + 20 + i * 22))
 
     def draw_roster_panel(self):
@@ -359,111 +341,70 @@ class GameScreen(Screen):
         pygame.draw.rect(self.screen, (120, 120, 160),
                         (panel_x, panel_y, panel_w, panel_h), 2)
 
-        title = self.font.render(
-            f"Player {self.turns.current_player + 1} Roster",
+        title = render_text(
+            self.font,
+            f"Player {self.state.current_player + 1} Roster",
             True, (255, 255, 255)
         )
         self.screen.blit(title, (panel_x + 10, panel_y + 10))
 
         y = panel_y + 50
-        for i, unit in enumerate(self.player_units[self.turns.current_player]):
+        player = self.state.current_player
+        for i, unit in enumerate(self.state.player_units[player]):
             color = (200, 200, 200)
-            if i == self.turns.units_placed[self.turns.current_player]:
+            if i == self.state.turns.units_placed[player]:
                 color = (255, 255, 120)  # next unit to place
 
-            txt = self.font.render(unit.unit_class, True, color)
+            txt = render_text(self.font, unit.unit_class, True, color)
             self.screen.blit(txt, (panel_x + 20, y))
             y += 28
 
-    def end_turn(self):
-        
-        if self.turns.phase == "setup":
-            if self.turns.can_place_unit(self.turns.current_player):
-                print("Cannot end turn: units still to place")
-                return
-        self.selected_unit = None
-        self.reachable_tiles.clear()
-        self.attackable_enemies.clear()
-        self.moving = False
-        self.move_path.clear()
-        self.hexmap.selected_hex = None
-
-        self.turns.next_turn()
-
-        # reset AP for new player's units
-        for u in self.units:
-            if u.owner == self.turns.current_player:
-                u.reset_actions()
-
-    def auto_end_turn(self):
-        if self.selected_unit and self.selected_unit.action_points <= 0:
-            self.end_turn()
-
-    def attack(self, attacker, defender):
-        if attacker.action_points <= 0:
-            return False
-
-        # 1. Melee has priority
-        if attacker.can_attack(defender, "melee"):
-            weapon_type = "melee"
-
-        # 2. Try ranged
-        elif (
-            attacker.can_attack(defender, "ranged")
-            and not self.is_adjacent_to_enemy(attacker)
-        ):
-            weapon_type = "ranged"
-
-        else:
-            print("No valid attack (range or adjacency restriction)")
-            return False
-
-        hits, unsaved, killed = attacker.perform_attack(defender, weapon_type)
-
-        self.combat_log.insert(
-            0,
-            f"P{attacker.owner+1} {attacker.unit_class} "
-            f"{weapon_type} attacks {defender.unit_class}: "
-            f"{hits} hits, {unsaved} unsaved"
-        )
+    def play_ai_action(self, action):
+        state = self.state
+        unit = state.unit_at(action.src) if action.src is not None else None
+        result = state.apply(action)
+        if action.kind == MOVE:
+            self.start_move(unit, result)
+        self.ai_wait = AI_ACTION_DELAY
+
+    def start_move(self, unit, path):
+        """Walk `unit` (already moved by the state) along path on screen."""
+        self.moving_unit = unit
+        self.move_at = path[0]
+        self.move_path = path[1:]
+        self.moving = True
+        self.move_timer = 0
 
-        if killed:
-            self.units.remove(defender)
-            self.combat_log.insert(0, f"{defender.unit_class} destroyed")
-
-        return True
-
-    
-    def is_adjacent_to_enemy(self, unit):
-        for dq, dr in self.hexmap.AXIAL_DIRECTIONS:
-            nq, nr = unit.q + dq, unit.r + dr
-            for other in self.units:
-                if other.owner != unit.owner and (other.q, other.r) == (nq, nr):
-                    return True
-        return False
-    
-    def update_attackable_enemies(self):
-        self.attackable_enemies.clear()
-
-        if not self.selected_unit:
+    def end_turn(self):
+        if self.state.current_player in self.ai:
             return
+        if self.moving or not self.state.can_end_turn():
+            if not self.moving:
+                self.notice("Cannot end turn: units still to place")
+            return
+        self.clear_selection()
+        self.state.end_turn()
 
-        attacker = self.selected_unit
-
-        for enemy in self.units:
-            if enemy.owner == attacker.owner:
-                continue
-
-            # melee possible
-            if attacker.can_attack(enemy, "melee"):
-                self.attackable_enemies.add((enemy.q, enemy.r))
-                continue
-
-            # ranged possible
-            if (
-                attacker.can_attack(enemy, "ranged")
-                and not self.is_adjacent_to_enemy(attacker)
-            ):
-                self.attackable_enemies.add((enemy.q, enemy.r))
+    def notice(self, text):
+        """Show text at the top of the log panel, once however often it's raised."""
+        if not self.state.log or self.state.log[0] != text:
+            self.state.log.insert(0, text)
 
+    def clear_selection(self):
+        self.selected_unit = None
+        self.reachable_tiles = set()
+        self.reach_tree = {}
+        self.attackable_enemies = set()
+        self.hexmap.selected_hex = None
 
+    def refresh_selection(self):
+        """Recompute reach and targets for the selected unit (dropping it once its turn is over)."""
+        unit = self.selected_unit
+        if not unit:
+            return
+        state = self.state
+        if state.over or unit.owner != state.current_player or unit.action_points <= 0:
+            self.clear_selection()
+            return
+        self.reachable_tiles, self.reach_tree = state.reachable(unit)
+        self.attackable_enemies = state.attack_targets(unit)
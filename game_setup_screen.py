@@ -6,17 +6,20 @@ from settings import (
     SETUP_ROSTER_WIDTH,
     SETUP_PANEL_GAP,
     SETUP_TOP_MARGIN,
+    ROSTER_BUDGET,
+    AI_PLAYERS,
     FPS
 )
 from game_screen import GameScreen
 from screen_base import Screen
 from unit_catalog import UNIT_CATALOG
+from assets import ASSETS
+from map_catalog import CATALOG
+from fonts import get_font, render_text
 
 pygame.init()
-font = pygame.font.SysFont("arial", 28)
-smallfont = pygame.font.SysFont("arial", 22)
-
-MAP_FOLDER = "maps"
+font = get_font("arial", 28)
+smallfont = get_font("arial", 22)
 
 
 class GameSetupScreen(Screen):
@@ -27,44 +30,47 @@ class GameSetupScreen(Screen):
         # Maps
         self.maps = self.load_maps()
         self.map_index = 0
+        self.catalog_seen = (CATALOG.generation, self.catalog_mtimes())
 
         # Drafting
-        self.budget = {0: 200, 1: 200}
+        self.budget = {0: ROSTER_BUDGET, 1: ROSTER_BUDGET}
         self.selected_player = 0
         self.player_rosters = {0: [], 1: []}
         self.unit_list = list(UNIT_CATALOG.keys())
         self.unit_card_scroll = 0
+        self.vs_computer = False      # player 2 played by the computer
 
     # --------------------------------------------------------------
 
     def load_maps(self):
-        if not os.path.isdir(MAP_FOLDER):
-            return ["Default"]
-
-        maps = [
-            f for f in os.listdir(MAP_FOLDER)
-            if f.endswith(".png") or f.endswith(".json")
-        ]
+        maps = CATALOG.names()
         return maps if maps else ["Default"]
 
+    def catalog_mtimes(self):
+        # a preview rebuilt on its own (map_preview.py) must be reloaded too
+        return {info.name: (info.mtime, info.preview_mtime) for info in CATALOG.maps()}
+
     # --------------------------------------------------------------
 
     def draw_preview(self, surface, x, y):
         map_file = self.maps[self.map_index]
-        base, ext = os.path.splitext(map_file)
-        img_path = os.path.join(MAP_FOLDER, base + ".png")
+        info = CATALOG.get(map_file)
 
         preview_area = pygame.Rect(x, y, 300, 300)
         pygame.draw.rect(surface, (70, 70, 90), preview_area)
 
-        if os.path.isfile(img_path):
-            img = pygame.image.load(img_path).convert()
-            img = pygame.transform.scale(img, (300, 300))
-            surface.blit(img, preview_area)
+        if info is not None:
+            img = ASSETS.image(info.preview_path, (300, 300))
+            if img is not None:
+                surface.blit(img, preview_area)
 
-        txt = font.render(base, True, (255, 255, 255))
+        txt = render_text(font, os.path.splitext(map_file)[0], True, (255, 255, 255))
         surface.blit(txt, (x + 10, y + 10))
 
+        if info is not None:
+            txt = render_text(smallfont, info.summary(), True, (230, 230, 230))
+            surface.blit(txt, (x + 10, y + 300 - txt.get_height() - 8))
+
     # --------------------------------------------------------------
 
     def draw(self, surface):
@@ -89,7 +95,7 @@ class GameSetupScreen(Screen):
         )
 
         # Title
-        title = font.render("Quick Game Setup", True, (255, 255, 255))
+        title = render_text(font, "Quick Game Setup", True, (255, 255, 255))
         surface.blit(title, (40, 30))
 
         # ----------------------
@@ -97,8 +103,8 @@ class GameSetupScreen(Screen):
         # ----------------------
         self.draw_preview(surface, 40, 100)
 
-        prev_btn = smallfont.render("< Prev", True, (255, 255, 255))
-        next_btn = smallfont.render("Next >", True, (255, 255, 255))
+        prev_btn = render_text(smallfont, "< Prev", True, (255, 255, 255))
+        next_btn = render_text(smallfont, "Next >", True, (255, 255, 255))
 
         prev_rect = pygame.Rect(40, 420, 100, 40)
         next_rect = pygame.Rect(160, 420, 100, 40)
@@ -119,15 +125,12 @@ class GameSetupScreen(Screen):
             pygame.draw.rect(surface, (60, 60, 80), card)
 
             info = UNIT_CATALOG[name]
-            txt = smallfont.render(f"{name.capitalize()} — {info['cost']} pts", True, (255, 255, 255))
+            txt = render_text(smallfont, f"{name.capitalize()} — {info['cost']} pts", True, (255, 255, 255))
             surface.blit(txt, (420, y + 10))
 
-            try:
-                icon = pygame.image.load(info["icon"]).convert_alpha()
-                icon = pygame.transform.scale(icon, (48, 48))
+            icon = ASSETS.image(info["icon"], (48, 48))
+            if icon is not None:
                 surface.blit(icon, (410 + 420, y + 10))
-            except:
-                pass
 
             card_rects.append((name, card))
             y += 80
@@ -141,8 +144,8 @@ class GameSetupScreen(Screen):
         pygame.draw.rect(surface, (120, 80, 80) if self.selected_player == 0 else (70, 70, 90), p1_btn)
         pygame.draw.rect(surface, (80, 120, 80) if self.selected_player == 1 else (70, 70, 90), p2_btn)
 
-        surface.blit(smallfont.render("Player 1", True, (255, 255, 255)), (p1_btn.x + 20, p1_btn.y + 8))
-        surface.blit(smallfont.render("Player 2", True, (255, 255, 255)), (p2_btn.x + 20, p2_btn.y + 8))
+        surface.blit(render_text(smallfont, "Player 1", True, (255, 255, 255)), (p1_btn.x + 20, p1_btn.y + 8))
+        surface.blit(render_text(smallfont, "Player 2", True, (255, 255, 255)), (p2_btn.x + 20, p2_btn.y + 8))
 
         # ----------------------
         # ROSTER PREVIEW
@@ -154,10 +157,11 @@ class GameSetupScreen(Screen):
         pygame.draw.rect(surface, (35, 35, 50), (roster_x, roster_y, roster_w, roster_h))
         pygame.draw.rect(surface, (120, 120, 160), (roster_x, roster_y, roster_w, roster_h), 2)
 
-        title = smallfont.render(f"Player {self.selected_player + 1} Roster", True, (255,255,255))
+        title = render_text(smallfont, f"Player {self.selected_player + 1} Roster", True, (255,255,255))
         surface.blit(title, (roster_x + 10, roster_y + 10))
 
-        budget_txt = smallfont.render(
+        budget_txt = render_text(
+            smallfont,
             f"Budget: {self.budget[self.selected_player]} pts",
             True, (200, 200, 200)
         )
@@ -172,30 +176,37 @@ class GameSetupScreen(Screen):
             entry_rect = pygame.Rect(roster_x + 10, y, roster_w - 20, 40)
             pygame.draw.rect(surface, (60, 60, 80), entry_rect)
 
-            txt = smallfont.render(
+            txt = render_text(
+                smallfont,
                 f"{unit_name.capitalize()} (-{info['cost']})",
                 True, (255,255,255)
             )
             surface.blit(txt, (entry_rect.x + 45, entry_rect.y + 10))
 
             # icon
-            try:
-                icon = pygame.image.load(info["icon"]).convert_alpha()
-                icon = pygame.transform.scale(icon, (32, 32))
+            icon = ASSETS.image(info["icon"], (32, 32))
+            if icon is not None:
                 surface.blit(icon, (entry_rect.x + 5, entry_rect.y + 4))
-            except:
-                pass
 
             roster_rects.append((idx, unit_name, entry_rect))
             y += 45
 
+        # ----------------------
+        # OPPONENT
+        # ----------------------
+        opponent_btn = pygame.Rect(400, 480, 310, 40)
+        pygame.draw.rect(surface, (80, 80, 130) if self.vs_computer else (70, 70, 90), opponent_btn)
+        opponent = "Computer" if self.vs_computer else "Human"
+        surface.blit(render_text(smallfont, f"Player 2: {opponent}", True, (255, 255, 255)),
+                     (opponent_btn.x + 20, opponent_btn.y + 8))
+
         # ----------------------
         # START BUTTON
         # ----------------------
         start_btn = pygame.Rect(720, 420, 180, 50)
         pygame.draw.rect(surface, (100, 160, 100), start_btn)
         pygame.draw.rect(surface, (255, 255, 255), start_btn, 2)
-        surface.blit(font.render("Start", True, (255, 255, 255)),
+        surface.blit(render_text(font, "Start", True, (255, 255, 255)),
                          (start_btn.x + 40, start_btn.y + 5))
 
         surface_rects = {
@@ -204,6 +215,7 @@ class GameSetupScreen(Screen):
             "cards": card_rects,
             "p1": p1_btn,
             "p2": p2_btn,
+            "opponent": opponent_btn,
             "start": start_btn,
             "roster": roster_rects
         }
@@ -254,18 +266,33 @@ class GameSetupScreen(Screen):
             if self._rects["p2"].collidepoint((mx, my)):
                 self.selected_player = 1
 
+            if self._rects["opponent"].collidepoint((mx, my)):
+                self.vs_computer = not self.vs_computer
+
             # Start game
             if self._rects["start"].collidepoint((mx, my)):
                 chosen_map = self.maps[self.map_index]
                 self.next_screen = GameScreen(
                     self.app,
                     chosen_map,
-                    self.player_rosters
+                    self.player_rosters,
+                    ai_players=(1,) if self.vs_computer else AI_PLAYERS
                 )
                 self.done = True
 
     def update(self, dt):
-        pass
+        # pick up maps indexed, saved or deleted since the screen opened
+        CATALOG.refresh()
+        generation, mtimes = self.catalog_seen
+        if CATALOG.generation == generation:
+            return
+        for info in CATALOG.maps():
+            if mtimes.get(info.name) != (info.mtime, info.preview_mtime):
+                ASSETS.invalidate(info.preview_path)
+        self.catalog_seen = (CATALOG.generation, self.catalog_mtimes())
+        current = self.maps[self.map_index]
+        self.maps = self.load_maps()
+        self.map_index = self.maps.index(current) if current in self.maps else 0
     # --------------------------------------------------------------
 
     
@@ -0,0 +1,484 @@
+# game_state.py
+"""
+The game rules, without pygame.
+
+GameState holds the terrain, the units and whose turn it is. It lists the
+legal actions for the player to move, applies them and detects the end of
+the game, so games can be simulated headless; GameScreen is a view over
+one. Actions name tiles rather than unit objects, so they stay valid
+across copies of a state and can be logged or replayed.
+
+For search, make() plays a legal action in place and returns an Undo
+record (the AP, hp, tile and turn values it changed, and any unit it
+removed) that unmake() restores, so hypotheticals need no copying.
+Attacks are chance events: make() takes their number of unsaved wounds
+as an explicit outcome from chance_outcomes(), or draws one.
+"""
+import random
+from typing import NamedTuple
+
+from combat import attack_outcomes
+from occupancy import OccupancyIndex
+from pathfinding import AXIAL_DIRECTIONS, path_from_tree, reachable_with_paths
+from settings import NUM_PLAYERS
+from turn_manager import TurnManager
+from unit_catalog import UNIT_CATALOG
+from unit_table import UnitRow, UnitTable
+from zobrist import KEYS
+
+SPAWN_ROWS = 4   # rows at each player's edge of the map where units deploy
+
+# Action kinds
+PLACE = "place"        # deploy the next roster unit on dst
+MOVE = "move"          # move the unit on src to dst
+ATTACK = "attack"      # the unit on src attacks the unit on dst
+END_TURN = "end_turn"
+
+
+class Action(NamedTuple):
+    kind: str
+    src: tuple = None
+    dst: tuple = None
+
+
+class AttackResult(NamedTuple):
+    weapon: str
+    hits: int
+    unsaved: int
+    killed: bool
+
+
+class Undo(NamedTuple):
+    """What GameState.unmake needs to take back one make()."""
+    action: Action
+    turns: tuple             # (current_player, phase, turn, over, winner) before the action
+    hash: int
+    unit: object = None      # the unit that moved, attacked or was placed
+    ap: int = 0              # its AP before
+    target: object = None    # the attacked unit
+    hp: int = 0              # its hp before
+    killed_at: int = -1      # its index in units, if the attack killed it
+    refilled: tuple = None   # ((unit, ap), ...) if the action started a turn and refilled AP
+
+
+class IllegalAction(ValueError):
+    pass
+
+
+class GameState:
+    """
+    One game in progress.
+
+    rosters maps player -> list of UNIT_CATALOG names; units are created as
+    `unit_type` (UnitRow, or unit.Unit for a screen that draws them) in one
+    shared UnitTable. After deployment a unit's action that spends its last
+    AP ends the turn. The game is over once at most one player has units
+    left, or after max_turns play turns (a draw). `hash` is the state's
+    Zobrist hash (see zobrist.py), kept current by every action.
+    """
+
+    def __init__(self, terrain, rosters, unit_type=UnitRow, num_players=NUM_PLAYERS,
+                 max_turns=None, rng=None):
+        self.terrain = terrain
+        self.num_players = num_players
+        self.max_turns = max_turns
+        self.rng = rng if rng is not None else random.Random()
+
+        self.table = UnitTable()
+        self.units = []            # units on the map
+        self.player_units = []     # per player, in deployment order
+        for player in range(num_players):
+            units = []
+            for name in rosters.get(player, ()):
+                info = UNIT_CATALOG[name]
+                u = unit_type(q=0, r=0, owner=player, unit_class=name, table=self.table, **info["stats"])
+                u.cost = info["cost"]
+                units.append(u)
+            self.player_units.append(units)
+
+        self.occupancy = OccupancyIndex(AXIAL_DIRECTIONS)
+        self._reach = {}           # tile -> (tiles, came_from), valid for _reach_version
+        self._reach_version = None
+        self.turns = TurnManager(num_players, [len(units) for units in self.player_units])
+        self.turn = 0              # play turns completed
+        self.over = False
+        self.winner = None
+        self.log = []              # combat log, newest first
+        self.hash = KEYS.full(self)
+        self._refilled = None      # AP the last turn change refilled, for make()
+
+    def copy(self, rng=None):
+        """
+        An independent copy for search: same terrain (games never change it),
+        a copied unit table with plain UnitRow views, and the same turn and
+        move cache. rng defaults to a clone of this state's generator. The
+        combat log is not copied.
+        """
+        other = GameState.__new__(GameState)
+        other.terrain = self.terrain
+        other.num_players = self.num_players
+        other.max_turns = self.max_turns
+        if rng is None:
+            rng = random.Random()
+            rng.setstate(self.rng.getstate())
+        other.rng = rng
+
+        table = other.table = self.table.copy()
+        views = {}
+
+        def view(unit):
+            copied = views.get(unit.row)
+            if copied is None:
+                copied = views[unit.row] = unit.copy_to(table)
+            return copied
+
+        other.player_units = [[view(u) for u in units] for units in self.player_units]
+        other.units = [view(u) for u in self.units]
+        other.occupancy = self.occupancy.copy(view)
+        # cached reach results are read-only, so the copy can share them
+        other._reach = dict(self._reach)
+        other._reach_version = self._reach_version
+        other.turns = self.turns.copy()
+        other.turn = self.turn
+        other.over = self.over
+        other.winner = self.winner
+        other.log = []
+        other.hash = self.hash
+        other._refilled = None
+        return other
+
+    # -----------------------
+    # Queries
+    # -----------------------
+    @property
+    def current_player(self):
+        return self.turns.current_player
+
+    @property
+    def phase(self):
+        return self.turns.phase
+
+    def unit_at(self, tile):
+        return self.occupancy.unit_at(tile)
+
+    def in_spawn_zone(self, player, r):
+        if player == 0:
+            return r < SPAWN_ROWS
+        return r >= self.terrain.height - SPAWN_ROWS
+
+    def next_to_place(self):
+        """The current player's next unit to deploy, or None."""
+        player = self.current_player
+        placed = self.turns.units_placed[player]
+        if self.phase != "setup" or placed >= len(self.player_units[player]):
+            return None
+        return self.player_units[player][placed]
+
+    def can_place(self, tile):
+        q, r = tile
+        return (self.next_to_place() is not None
+                and 0 <= q < self.terrain.width and 0 <= r < self.terrain.height
+                and self.in_spawn_zone(self.current_player, r)
+                and not self.occupancy.is_occupied(tile))
+
+    def can_end_turn(self):
+        return not self.over and not self.turns.can_place_unit(self.current_player)
+
+    def reachable(self, unit):
+        """
+        (tiles, came_from) for where `unit` can move this action. Cached until
+        a unit is placed, moved or removed; treat the result as read-only.
+        """
+        if self._reach_version != self.occupancy.version:
+            self._reach.clear()
+            self._reach_version = self.occupancy.version
+        start = (unit.q, unit.r)
+        found = self._reach.get(start)
+        if found is None:
+            found = self._reach[start] = reachable_with_paths(
+                self.terrain, start, unit.move_range, self.occupancy.blocked_for(unit))
+        return found
+
+    def choose_weapon(self, attacker, defender):
+        """Weapon the attacker would use on the defender, or None if it cannot attack."""
+        # 1. Melee has priority
+        if attacker.can_attack(defender, "melee"):
+            return "melee"
+
+        # 2. Ranged, unless engaged in melee
+        if attacker.can_attack(defender, "ranged") and not self.occupancy.has_adjacent_enemy(attacker):
+            return "ranged"
+
+        return None
+
+    def attack_targets(self, attacker):
+        """Tiles of the enemies `attacker` can attack."""
+        # ranged fire is blocked while engaged; that only depends on the attacker
+        can_shoot = not self.occupancy.has_adjacent_enemy(attacker)
+        targets = set()
+        for tile in self.occupancy.enemy_hexes(attacker.owner):
+            enemy = self.occupancy.unit_at(tile)
+            if attacker.can_attack(enemy, "melee") or (can_shoot and attacker.can_attack(enemy, "ranged")):
+                targets.add(tile)
+        return targets
+
+    def legal_actions(self):
+        """Every action the current player may take (empty once the game is over)."""
+        if self.over:
+            return []
+        player = self.current_player
+        if self.phase == "setup":
+            if self.next_to_place() is None:
+                return [Action(END_TURN)]
+            return [
+                Action(PLACE, dst=(q, r))
+                for r in range(self.terrain.height) if self.in_spawn_zone(player, r)
+                for q in range(self.terrain.width)
+                if not self.occupancy.is_occupied((q, r))
+            ]
+
+        actions = []
+        for tile in sorted(self.occupancy.hexes_of(player)):
+            unit = self.occupancy.unit_at(tile)
+            if unit.action_points <= 0:
+                continue
+            reachable, _tree = self.reachable(unit)
+            actions.extend(Action(MOVE, tile, dst) for dst in sorted(reachable) if dst != tile)
+            actions.extend(Action(ATTACK, tile, dst) for dst in sorted(self.attack_targets(unit)))
+        actions.append(Action(END_TURN))
+        return actions
+
+    def chance_outcomes(self, action):
+        """
+        The possible results of an attack action as (unsaved wounds,
+        probability) pairs (see combat.attack_outcomes), for make().
+        """
+        attacker, defender = self.occupancy.unit_at(action.src), self.occupancy.unit_at(action.dst)
+        return self._outcomes(attacker, defender)[1]
+
+    # -----------------------
+    # Search: make / unmake
+    # -----------------------
+    def make(self, action, outcome=None):
+        """
+        Play a legal action (from legal_actions) in place, without copying
+        anything, and return the Undo that unmake() takes it back with.
+        For an attack, outcome is its number of unsaved wounds (see
+        chance_outcomes); None draws one with self.rng. Moves and attacks
+        skip apply()'s legality checks, and nothing is logged.
+        """
+        turns = self.turns
+        before = (turns.current_player, turns.phase, self.turn, self.over, self.winner)
+        h = self.hash
+        self._refilled = None
+        kind = action.kind
+
+        if kind == MOVE:
+            unit = self.occupancy.unit_at(action.src)
+            ap = unit.action_points
+            self._move(unit, action.dst)
+            return Undo(action, before, h, unit, ap, refilled=self._refilled)
+
+        if kind == ATTACK:
+            attacker, defender = self.occupancy.unit_at(action.src), self.occupancy.unit_at(action.dst)
+            ap, hp = attacker.action_points, defender.hp
+            weapon, outcomes = self._outcomes(attacker, defender)
+            if outcome is None:
+                roll = self.rng.random()
+                for outcome, p in outcomes:
+                    roll -= p
+                    if roll < 0:
+                        break
+            if weapon["attack"] > 0:   # as in perform_attack, an unarmed attack costs nothing
+                attacker.action_points = ap - 1
+                defender.hp = hp - outcome * weapon["damage"]
+            self.hash ^= (KEYS.ap(attacker.row, ap) ^ KEYS.ap(attacker.row, attacker.action_points)
+                          ^ KEYS.hp(defender.row, hp) ^ KEYS.hp(defender.row, defender.hp))
+            killed_at = -1
+            if defender.hp <= 0:
+                killed_at = self.units.index(defender)
+                self._kill(defender)
+            if not self.over:
+                self._spent(attacker)
+            return Undo(action, before, h, attacker, ap, defender, hp, killed_at, self._refilled)
+
+        if kind == PLACE:
+            unit = self.place(action.dst)
+            return Undo(action, before, h, unit, refilled=self._refilled)
+
+        self._next_turn()
+        return Undo(action, before, h, refilled=self._refilled)
+
+    def unmake(self, undo):
+        """Take back the make() that returned `undo` (the most recent one not yet taken back)."""
+        if undo.refilled:
+            for unit, ap in undo.refilled:
+                unit.action_points = ap
+        turns = self.turns
+        turns.current_player, turns.phase, self.turn, self.over, self.winner = undo.turns
+
+        kind = undo.action.kind
+        unit = undo.unit
+        if kind == MOVE:
+            unit.action_points = undo.ap
+            self.occupancy.move(unit, *undo.action.src)
+        elif kind == ATTACK:
+            unit.action_points = undo.ap
+            target = undo.target
+            target.hp = undo.hp
+            if undo.killed_at >= 0:
+                self.table.restore(target.row)
+                self.units.insert(undo.killed_at, target)
+                self.occupancy.place(target)
+        elif kind == PLACE:
+            self.units.pop()
+            self.occupancy.remove(unit)
+            turns.units_placed[turns.current_player] -= 1
+        self.hash = undo.hash
+
+    # -----------------------
+    # Actions
+    # -----------------------
+    def apply(self, action):
+        """
+        Play one action for the current player. Returns the placed unit, the
+        move path, the AttackResult or None (end of turn); raises
+        IllegalAction if the rules don't allow it.
+        """
+        if self.over:
+            raise IllegalAction("the game is over")
+        kind = action.kind
+        if kind == PLACE:
+            return self.place(action.dst)
+        if kind == END_TURN:
+            return self.end_turn()
+
+        unit = self.occupancy.unit_at(action.src)
+        if unit is None or unit.owner != self.current_player:
+            raise IllegalAction(f"no unit of player {self.current_player} on {action.src}")
+        if kind == MOVE:
+            return self.move(unit, action.dst)
+        if kind == ATTACK:
+            target = self.occupancy.unit_at(action.dst)
+            if target is None:
+                raise IllegalAction(f"nothing to attack on {action.dst}")
+            return self.attack(unit, target)
+        raise IllegalAction(f"unknown action {kind!r}")
+
+    def place(self, tile):
+        if not self.can_place(tile):
+            raise IllegalAction(f"cannot deploy on {tile}")
+        unit = self.next_to_place()
+        player = self.current_player
+        unit.q, unit.r = tile
+        self.units.append(unit)
+        self.occupancy.place(unit)
+        placed = self.turns.units_placed[player]
+        self.turns.record_placement(player)
+        self.hash ^= KEYS.unit(unit) ^ KEYS.placed(player, placed) ^ KEYS.placed(player, placed + 1)
+        if not self.turns.can_place_unit(player):
+            self._next_turn()
+        return unit
+
+    def move(self, unit, tile, came_from=None):
+        """
+        Move `unit` to `tile`, spending one AP. came_from is the predecessor
+        tree from reachable(unit), if the caller already has it.
+        """
+        if self.phase != "play" or unit.action_points <= 0 or tile == (unit.q, unit.r):
+            raise IllegalAction(f"{unit.unit_class} cannot move to {tile}")
+        if came_from is None:
+            _reachable, came_from = self.reachable(unit)
+        path = path_from_tree(came_from, tile)
+        if path is None:
+            raise IllegalAction(f"{tile} is out of reach")
+        self._move(unit, tile)
+        return path
+
+    def attack(self, attacker, defender):
+        if self.phase != "play" or attacker.action_points <= 0:
+            raise IllegalAction(f"{attacker.unit_class} cannot attack")
+        weapon_type = self.choose_weapon(attacker, defender)
+        if weapon_type is None or defender.owner == attacker.owner:
+            raise IllegalAction("no valid attack (range or adjacency restriction)")
+
+        ap, hp = attacker.action_points, defender.hp
+        hits, unsaved, killed = attacker.perform_attack(defender, weapon_type, self.rng)
+        self.hash ^= (KEYS.ap(attacker.row, ap) ^ KEYS.ap(attacker.row, attacker.action_points)
+                      ^ KEYS.hp(defender.row, hp) ^ KEYS.hp(defender.row, defender.hp))
+        self.log.insert(
+            0,
+            f"P{attacker.owner+1} {attacker.unit_class} "
+            f"{weapon_type} attacks {defender.unit_class}: "
+            f"{hits} hits, {unsaved} unsaved"
+        )
+
+        if killed:
+            self._kill(defender)
+            self.log.insert(0, f"{defender.unit_class} destroyed")
+
+        if not self.over:
+            self._spent(attacker)
+        return AttackResult(weapon_type, hits, unsaved, killed)
+
+    def end_turn(self):
+        if not self.can_end_turn():
+            raise IllegalAction("units still to place")
+        self._next_turn()
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _outcomes(self, attacker, defender):
+        """(weapon, attack_outcomes) for a legal attack."""
+        weapon = attacker.melee if self.choose_weapon(attacker, defender) == "melee" else attacker.ranged
+        return weapon, attack_outcomes(weapon["attack"], weapon["hit"], weapon["damage"], defender.save, defender.hp)
+
+    def _move(self, unit, tile):
+        row, ap, (q, r) = unit.row, unit.action_points, (unit.q, unit.r)
+        unit.action_points = ap - 1
+        self.occupancy.move(unit, *tile)
+        self.hash ^= (KEYS.position(row, q, r) ^ KEYS.position(row, *tile)
+                      ^ KEYS.ap(row, ap) ^ KEYS.ap(row, ap - 1))
+        self._spent(unit)
+
+    def _kill(self, unit):
+        self.hash ^= KEYS.unit(unit)
+        self.units.remove(unit)
+        self.occupancy.remove(unit)
+        unit.release()
+        self._check_over()
+
+    def _spent(self, unit):
+        # a unit that has used its last AP ends its player's turn
+        if unit.action_points <= 0:
+            self._next_turn()
+
+    def _next_turn(self):
+        if self.phase == "play":
+            self.turn += 1
+        before = KEYS.player(self.current_player) ^ KEYS.phase(self.phase)
+        self.turns.next_turn()
+        player = self.current_player
+        h = self.hash ^ before ^ KEYS.player(player) ^ KEYS.phase(self.phase)
+
+        # reset AP for the new player's units
+        refilled = tuple((u, u.action_points) for u in self.units if u.owner == player)
+        for u, ap in refilled:
+            h ^= KEYS.ap(u.row, ap)
+        self.table.reset_actions(player)
+        for u, _ap in refilled:
+            h ^= KEYS.ap(u.row, u.action_points)
+        self.hash = h
+        self._refilled = refilled
+        self._check_over()
+
+    def _check_over(self):
+        if self.phase != "play":
+            return
+        alive = {u.owner for u in self.units}
+        if len(alive) <= 1:
+            self.over = True
+            self.winner = alive.pop() if alive else None
+        elif self.max_turns is not None and self.turn >= self.max_turns:
+            self.over = True
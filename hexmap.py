@@ -2,16 +2,28 @@
 import pygame
 import math
 import random
-from settings import HEX_SIZE, GRID_WIDTH, GRID_HEIGHT, WINDOW_WIDTH, WINDOW_HEIGHT, MAP_OFFSET_X, MAP_OFFSET_Y, TERRAIN_TYPES
-from collections import deque
+from collections import OrderedDict
+from settings import HEX_SIZE, GRID_WIDTH, GRID_HEIGHT, WINDOW_WIDTH, WINDOW_HEIGHT, MAP_OFFSET_X, MAP_OFFSET_Y
+import pathfinding
+from terrain_grid import TerrainGrid
 
 SQRT3 = math.sqrt(3.0)
 
+# pre-rendered terrain layers: transparent key colour, block size in tiles
+# and how many cached block pixels to keep across zoom levels
+LAYER_COLORKEY = (255, 0, 255)
+LAYER_BLOCK = 8
+LAYER_CACHE_PIXELS = 16_000_000
+
+# chunked terrain: tiles kept resident around the view and each focus tile
+STREAM_MARGIN = 8
+
+# default find_path budget: tiles expanded per step of hex distance to the goal
+PATH_EXPANSIONS_PER_STEP = 20
+PATH_MIN_EXPANSIONS = 500
+
 class HexMap:
-    AXIAL_DIRECTIONS = [
-        (1, 0), (1, -1), (0, -1),
-        (-1, 0), (-1, 1), (0, 1)
-    ]
+    AXIAL_DIRECTIONS = pathfinding.AXIAL_DIRECTIONS
 
     def __init__(self, surface, camera):
         self.surface = surface
@@ -28,9 +40,13 @@ class HexMap:
         self.hover_hex = None
         self.selected_hex = None
 
-        # terrain: (q,r) -> dict{type,move_cost,height,passable}
-        self.terrain = {}
-        self.corner_cache = {}
+        # terrain: array-backed grid, still usable as (q,r) -> dict{type,move_cost,height,passable}
+        self.terrain = None
+        self.corner_offsets = []
+        self.layer_cache = OrderedDict()   # (zoom, bq, br) -> (surface, world origin)
+        self.layer_cache_pixels = 0
+        self._heuristic_goal = None
+        self._heuristic_cache = {}
         self._init_terrain()
         self._cache_corners()
 
@@ -38,26 +54,32 @@ class HexMap:
     # Setup helpers
     # -----------------------
     def _init_terrain(self):
-        for r in range(self.height):
-            for q in range(self.width):
-                # default plain
-                self.terrain[(q, r)] = {
-                    "type": "plain",
-                    **TERRAIN_TYPES["plain"]
-                }
-
+        # default plain
+        self.terrain = TerrainGrid(self.width, self.height, "plain")
+
+    def set_terrain(self, grid):
+        """Replace the terrain with a loaded grid (may change map size), closing the old one."""
+        old = self.terrain
+        close = getattr(old, "close", None)
+        if close is not None and old is not grid:
+            close()   # mapped and chunked grids hold a file (and a mapping) open
+        self.terrain = grid
+        self.width = grid.width
+        self.height = grid.height
+        self.invalidate_terrain_layer()
 
     def _cache_corners(self):
-        # precompute world-space center & corner points for each tile (unzoomed)
-        for r in range(self.height):
-            for q in range(self.width):
-                px, py = self.hex_to_pixel(q, r)  # world pixel (includes offset)
-                corners = []
-                for i in range(6):
-                    angle = math.radians(60 * i + 30)
-                    corners.append((px + self.size * math.cos(angle),
-                                    py + self.size * math.sin(angle)))
-                self.corner_cache[(q, r)] = corners
+        # every tile has the same shape: precompute corner offsets from the center (unzoomed)
+        self.corner_offsets = []
+        for i in range(6):
+            angle = math.radians(60 * i + 30)
+            self.corner_offsets.append((self.size * math.cos(angle),
+                                        self.size * math.sin(angle)))
+
+    def tile_corners(self, q, r):
+        """World-space corner points of tile (q, r)."""
+        px, py = self.hex_to_pixel(q, r)
+        return [(px + dx, py + dy) for dx, dy in self.corner_offsets]
 
     def hex_corners(self, cx, cy):
         """
@@ -126,24 +148,166 @@ class HexMap:
         # corners are already in screen space
         pygame.draw.polygon(self.surface, color, corners, width)
 
-    def draw(self):
-        # Draw terrain by iterating all tiles and drawing filled polygon using cached corners
-        for (q, r), corners in self.corner_cache.items():
-            # convert each corner to screen via camera
-            screen_corners = [self.camera.apply(point) for point in corners]
-            tile = self.terrain[(q, r)]
-            ttype = tile["type"]
-            tdef = TERRAIN_TYPES[ttype]
+    def invalidate_terrain_layer(self):
+        """Drop the pre-rendered terrain; call after changing self.terrain."""
+        self.layer_cache.clear()
+        self.layer_cache_pixels = 0
 
-            color = tdef["color"]
+    def redraw_tiles(self, tiles):
+        """
+        Patch changed tiles into the cached terrain blocks of every zoom level,
+        instead of dropping the cache. Outlines of same-block neighbours are
+        redrawn too, since the new fill covers their shared edges.
+        """
+        by_block = {}
+        for q, r in tiles:
+            by_block.setdefault((q // LAYER_BLOCK, r // LAYER_BLOCK), []).append((q, r))
+        if not by_block:
+            return
+
+        for (zoom, bq, br), (layer, (ox, oy)) in self.layer_cache.items():
+            changed = by_block.get((bq, br))
+            if not changed:
+                continue
 
-            screen_corners = [self.camera.apply(pt) for pt in corners]
-            pygame.draw.polygon(self.surface, color, screen_corners, 0)
+            def local(q, r):
+                return [((x - ox) * zoom, (y - oy) * zoom) for x, y in self.tile_corners(q, r)]
+
+            outlined = set(changed)
+            # one lock for the whole patch: the layer is RLE-encoded, and
+            # each draw call would otherwise decode and re-encode it
+            layer.lock()
+            for q, r in changed:
+                pygame.draw.polygon(layer, self.terrain.terrain_type(q, r).color, local(q, r), 0)
+                for nq, nr in self.neighbors(q, r):
+                    if (self.is_inside_grid(nq, nr)
+                            and nq // LAYER_BLOCK == bq and nr // LAYER_BLOCK == br):
+                        outlined.add((nq, nr))
+            for q, r in outlined:
+                pygame.draw.polygon(layer, (100, 100, 100), local(q, r), 1)
+            layer.unlock()
 
-        # Draw hex outlines on top
-        for (q, r), corners in self.corner_cache.items():
-            screen_corners = [self.camera.apply(point) for point in corners]
-            pygame.draw.polygon(self.surface, (100,100,100), screen_corners, 1)
+    # -----------------------
+    # Visibility
+    # -----------------------
+    def visible_rows(self, camera, rect):
+        """
+        Yield (r, q_min, q_max) for every grid row that overlaps the screen
+        rectangle `rect` under `camera`. Ranges are inclusive and clamped.
+        """
+        left, top = camera.screen_to_world(rect.topleft)
+        right, bottom = camera.screen_to_world(rect.bottomright)
+        pad = self.size
+
+        row_h = 1.5 * self.size
+        col_w = SQRT3 * self.size
+        r_min = max(0, int(math.floor((top - self.offset_y - pad) / row_h)))
+        r_max = min(self.height - 1, int(math.ceil((bottom - self.offset_y + pad) / row_h)))
+
+        for r in range(r_min, r_max + 1):
+            q_min = max(0, int(math.floor((left - self.offset_x - pad) / col_w - r / 2)))
+            q_max = min(self.width - 1, int(math.ceil((right - self.offset_x + pad) / col_w - r / 2)))
+            if q_min <= q_max:
+                yield r, q_min, q_max
+
+    def visible_tiles(self, camera=None, rect=None):
+        """Axial coords of all tiles visible through `camera` inside `rect` (screen space)."""
+        camera = camera or self.camera
+        rect = rect or self.surface.get_rect()
+        return [
+            (q, r)
+            for r, q_min, q_max in self.visible_rows(camera, rect)
+            for q in range(q_min, q_max + 1)
+        ]
+
+    def stream_terrain(self, rect=None, focus=(), margin=STREAM_MARGIN):
+        """
+        For chunked terrain, keep the chunks under the view and around each
+        focus tile (e.g. units), plus `margin` tiles, resident. Does nothing
+        for grids that are fully in memory.
+        """
+        stream = getattr(self.terrain, "stream", None)
+        if stream is None:
+            return
+        rect = rect or self.surface.get_rect()
+        areas = [(q - margin, r - margin, q + margin, r + margin) for q, r in focus]
+        rows = list(self.visible_rows(self.camera, rect))
+        if rows:
+            areas.append((
+                min(q_min for _r, q_min, _q_max in rows) - margin,
+                rows[0][0] - margin,
+                max(q_max for _r, _q_min, q_max in rows) + margin,
+                rows[-1][0] + margin,
+            ))
+        stream(areas)
+
+    def _visible_blocks(self, camera, rect):
+        blocks = {}
+        for r, q_min, q_max in self.visible_rows(camera, rect):
+            br = r // LAYER_BLOCK
+            for bq in range(q_min // LAYER_BLOCK, q_max // LAYER_BLOCK + 1):
+                blocks[(bq, br)] = None
+        return list(blocks)
+
+    # -----------------------
+    # Terrain layer
+    # -----------------------
+    def _render_terrain_block(self, zoom, bq, br):
+        """Render the tiles of one LAYER_BLOCK x LAYER_BLOCK block into a world-space surface."""
+        q0, r0 = bq * LAYER_BLOCK, br * LAYER_BLOCK
+        tiles = [
+            (q, r)
+            for r in range(r0, min(r0 + LAYER_BLOCK, self.height))
+            for q in range(q0, min(q0 + LAYER_BLOCK, self.width))
+        ]
+        corners = [self.tile_corners(q, r) for q, r in tiles]
+        min_x = min(x for cs in corners for x, _ in cs)
+        min_y = min(y for cs in corners for _, y in cs)
+        max_x = max(x for cs in corners for x, _ in cs)
+        max_y = max(y for cs in corners for _, y in cs)
+
+        w = int(math.ceil((max_x - min_x) * zoom)) + 2
+        h = int(math.ceil((max_y - min_y) * zoom)) + 2
+        layer = pygame.Surface((w, h))
+        layer.fill(LAYER_COLORKEY)
+        layer.set_colorkey(LAYER_COLORKEY, pygame.RLEACCEL)
+
+        local = [[((x - min_x) * zoom, (y - min_y) * zoom) for x, y in cs] for cs in corners]
+        for (q, r), cs in zip(tiles, local):
+            color = self.terrain.terrain_type(q, r).color
+            pygame.draw.polygon(layer, color, cs, 0)
+        for cs in local:
+            pygame.draw.polygon(layer, (100, 100, 100), cs, 1)
+
+        return layer, (min_x, min_y)
+
+    def _terrain_block(self, zoom, bq, br):
+        key = (zoom, bq, br)
+        cached = self.layer_cache.get(key)
+        if cached is not None:
+            self.layer_cache.move_to_end(key)
+            return cached
+
+        cached = self._render_terrain_block(zoom, bq, br)
+        w, h = cached[0].get_size()
+        self.layer_cache[key] = cached
+        self.layer_cache_pixels += w * h
+        # LRU eviction by pixel budget (never evict the block just rendered)
+        while self.layer_cache_pixels > LAYER_CACHE_PIXELS and len(self.layer_cache) > 1:
+            _key, (old, _origin) = self.layer_cache.popitem(last=False)
+            ow, oh = old.get_size()
+            self.layer_cache_pixels -= ow * oh
+        return cached
+
+    def draw(self, rect=None):
+        # terrain is static: blocks are rendered once per zoom level and only
+        # the blocks overlapping the view are blitted
+        rect = rect or self.surface.get_rect()
+        zoom = round(self.camera.zoom, 3)
+        for bq, br in self._visible_blocks(self.camera, rect):
+            layer, origin = self._terrain_block(zoom, bq, br)
+            sx, sy = self.camera.apply(origin)
+            self.surface.blit(layer, (int(round(sx)), int(round(sy))))
 
 
     # -----------------------
@@ -153,72 +317,35 @@ class HexMap:
         return 0 <= q < self.width and 0 <= r < self.height
 
     def neighbors(self, q, r):
-        return [(q + dq, r + dr) for dq, dr in self.AXIAL_DIRECTIONS]
+        return pathfinding.neighbors(q, r)
+
+    # search lives in pathfinding (no pygame); these run it on this map's terrain
+    def reachable_with_paths(self, start, move_points, blocked):
+        return pathfinding.reachable_with_paths(self.terrain, start, move_points, blocked)
 
     def get_reachable_tiles(self, start, move_points, blocked):
-        from collections import deque
-        reachable = set()
-        frontier = deque([(start, move_points)])
-        came_from = {start: None}
-        while frontier:
-            current, remaining = frontier.popleft()
-            if remaining < 0:
-                continue
-            reachable.add(current)
-            for n in self.neighbors(*current):
-                if not self.is_inside_grid(*n): continue
-                if n in blocked: continue
-                terrain = self.terrain.get(n, {"move_cost": 1, "passable": True, "height": 1})
-                if not terrain["passable"]: continue
-                cur_height = self.terrain.get(current, {"height": 1})["height"]
-                if abs(cur_height - terrain["height"]) > 1: continue
-                cost = terrain["move_cost"]
-                new_remain = remaining - cost
-                if n not in came_from or new_remain > 0:
-                    came_from[n] = current
-                    frontier.append((n, new_remain))
-        return reachable
-    
+        return self.reachable_with_paths(start, move_points, blocked)[0]
+
+    path_from_tree = staticmethod(pathfinding.path_from_tree)
+    hex_distance = staticmethod(pathfinding.hex_distance)
 
-    def find_path(self, start, goal, blocked):
-        if start == goal:
-            return [start]
-
-        frontier = deque([start])
-        came_from = {start: None}
-
-        while frontier:
-            current = frontier.popleft()
-
-            for neighbor in self.neighbors(*current):
-                if not self.is_inside_grid(*neighbor):
-                    continue
-                if neighbor in blocked:
-                    continue
-
-                terrain = self.terrain.get(neighbor)
-                if not terrain or not terrain["passable"]:
-                    continue
-
-                cur_h = self.terrain[current]["height"]
-                if abs(cur_h - terrain["height"]) > 1:
-                    continue
-
-                if neighbor not in came_from:
-                    came_from[neighbor] = current
-                    if neighbor == goal:
-                        frontier.clear()
-                        break
-                    frontier.append(neighbor)
-
-        if goal not in came_from:
-            return None
-
-        # reconstruct path
-        path = []
-        cur = goal
-        while cur is not None:
-            path.append(cur)
-            cur = came_from[cur]
-        path.reverse()
-        return path
+    def _heuristic_for(self, goal):
+        # h(n) = cube distance * cheapest step; cached per goal so repeated
+        # queries towards the same tile (e.g. several units) reuse it
+        if self._heuristic_goal != goal:
+            self._heuristic_goal = goal
+            self._heuristic_cache = {}
+        return self._heuristic_cache
+
+    def find_path(self, start, goal, blocked, max_expansions=None):
+        """
+        A* on this map (see pathfinding.find_path). max_expansions defaults
+        to PATH_EXPANSIONS_PER_STEP per step of hex distance, so a walled-off
+        goal gives up early instead of flooding the map; pass math.inf to
+        search until the goal is proven unreachable.
+        """
+        if max_expansions is None:
+            max_expansions = max(PATH_MIN_EXPANSIONS,
+                                 PATH_EXPANSIONS_PER_STEP * pathfinding.hex_distance(start, goal))
+        return pathfinding.find_path(self.terrain, start, goal, blocked, max_expansions,
+                                     self._heuristic_for(goal))
@@ -0,0 +1,284 @@
+# map_catalog.py
+import json
+import mmap
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from mapfile import (
+    BINARY_EXT,
+    RECORD,
+    atomic_write,
+    is_map_file,
+    load_json,
+    read_file_header,
+)
+from map_preview import preview_path_for
+from settings import MAPS_DIR, TERRAIN_LIST
+from terrain_grid import TerrainGrid
+
+CATALOG_FILE = ".map_catalog"   # inside the maps directory; not a map extension
+CATALOG_VERSION = 1
+POLL_INTERVAL = 1.0             # seconds between directory scans
+
+
+class MapInfo(NamedTuple):
+    name: str
+    path: str
+    width: int
+    height: int
+    histogram: dict      # terrain name -> tile count
+    preview_path: str
+    mtime: float
+    size: int
+    preview_mtime: float = None   # None while the map has no preview
+
+    def summary(self, top=3):
+        """'13x13  plain 62%  forest 14%  water 9%'"""
+        total = max(1, self.width * self.height)
+        common = sorted(self.histogram.items(), key=lambda kv: -kv[1])[:top]
+        parts = [f"{name} {count * 100 // total}%" for name, count in common]
+        return "  ".join([f"{self.width}x{self.height}", *parts])
+
+
+def terrain_histogram(path):
+    """(width, height, {terrain name: count}) for a map file."""
+    if os.path.splitext(path)[1].lower() != BINARY_EXT:
+        grid = load_json(path)
+        return grid.width, grid.height, grid_histogram(grid)
+    width, height, names, offset = read_file_header(path)
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        records = np.frombuffer(mm, dtype=RECORD, count=width * height, offset=offset)
+        counts = np.bincount(records["type"], minlength=len(names))
+        del records   # release the mmap buffer before it closes
+    return width, height, {name: int(n) for name, n in zip(names, counts) if n}
+
+
+def grid_histogram(grid):
+    """{terrain name: count} for an in-memory TerrainGrid."""
+    counts = np.bincount(np.frombuffer(grid.type_ids, dtype=np.uint8), minlength=len(TERRAIN_LIST))
+    return {name: int(n) for name, n in zip(TERRAIN_LIST, counts) if n}
+
+
+def map_info(path, grid=None):
+    """
+    MapInfo for the map file at `path`, as the catalog would index it.
+    grid is the file's contents already in memory (the TerrainGrid just
+    saved there), so the file needn't be read again.
+    """
+    st = os.stat(path)
+    if type(grid) is TerrainGrid:
+        width, height, hist = grid.width, grid.height, grid_histogram(grid)
+    else:
+        width, height, hist = terrain_histogram(path)
+    preview = preview_path_for(path)
+    try:
+        preview_mtime = os.stat(preview).st_mtime
+    except OSError:
+        preview_mtime = None
+    return MapInfo(os.path.basename(path), path, width, height, hist, preview,
+                   st.st_mtime, st.st_size, preview_mtime)
+
+
+class MapCatalog:
+    """
+    In-memory index of the maps directory: name, size, terrain histogram,
+    preview path and the map's and preview's mtimes for every map.
+
+    Indexing runs on a background thread, so screens can call refresh()
+    every frame: at most every POLL_INTERVAL seconds it wakes the indexer,
+    which rescans the directory and only re-reads maps whose mtime or size
+    changed, publishing each one as soon as it is read. maps() and get()
+    answer from what has been indexed so far. The index is kept on disk in
+    CATALOG_FILE, so a restart only re-reads maps that changed while the
+    game wasn't running. Screens compare `generation` with the value they
+    last saw to notice changes. The standard library has no portable
+    file-change notification, so changes are found by polling mtimes.
+    """
+
+    def __init__(self, maps_dir=MAPS_DIR, poll_interval=POLL_INTERVAL):
+        self.maps_dir = maps_dir
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.rescan = False       # refresh() asked again while the indexer was running
+        self.entries = {}         # name -> MapInfo
+        self.sorted = []          # entries by name; None until rebuilt after a change
+        self.last_poll = None
+        self.generation = 0       # bumped whenever an entry is added, changed or removed
+        self.errors = {}          # name -> ((mtime, size), message) for maps that couldn't be indexed
+        self.reads = 0            # map files read to index them, for reporting
+        self._loaded = False      # the on-disk index has been read
+        self._unsaved = False     # entries changed since the index was last written
+
+    @property
+    def index_path(self):
+        return os.path.join(self.maps_dir, CATALOG_FILE)
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.thread is not None
+
+    def maps(self):
+        """MapInfo for every map indexed so far, sorted by name (refreshing if due)."""
+        self.refresh()
+        with self.lock:
+            if self.sorted is None:
+                self.sorted = [self.entries[n] for n in sorted(self.entries)]
+            return self.sorted
+
+    def names(self):
+        return [info.name for info in self.maps()]
+
+    def get(self, name):
+        self.refresh()
+        with self.lock:
+            return self.entries.get(name)
+
+    def refresh(self, force=False):
+        """Wake the indexer if the poll interval has passed (or force). Never blocks on I/O."""
+        now = time.monotonic()
+        if not force and self.last_poll is not None and now - self.last_poll < self.poll_interval:
+            return
+        self.last_poll = now
+        with self.lock:
+            self.rescan = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="map-catalog", daemon=True)
+                self.thread.start()
+
+    def add(self, info):
+        """Publish an entry built elsewhere (map_info on the map saver's thread)."""
+        with self.lock:
+            self.errors.pop(info.name, None)
+            self._publish(info.name, info)
+        self.refresh(force=True)   # the indexer writes the on-disk index
+
+    def wait(self, timeout=None):
+        """Block until the indexer is idle (e.g. in benchmarks)."""
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # -----------------------
+    # Indexer thread
+    # -----------------------
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.rescan:
+                    self.thread = None
+                    return
+                self.rescan = False
+            if not self._loaded:
+                entries = self._load_index()
+                with self.lock:
+                    for name, info in entries.items():
+                        self.entries.setdefault(name, info)
+                    self.sorted = None
+                    self.generation += 1
+                self._loaded = True
+            self._scan()
+            if self._unsaved:
+                self._unsaved = False
+                self._save_index()
+
+    def _scan(self):
+        seen = {}
+        files = {}    # every file name -> mtime, to find previews without another stat
+        if os.path.isdir(self.maps_dir):
+            with os.scandir(self.maps_dir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        files[entry.name] = st.st_mtime
+                        if is_map_file(entry.name):
+                            seen[entry.name] = (st.st_mtime, st.st_size)
+
+        with self.lock:
+            for name in [name for name in self.entries if name not in seen]:
+                self._publish(name, None)
+            current = dict(self.entries)
+
+        for name, (mtime, size) in seen.items():
+            info = current.get(name)
+            preview_mtime = files.get(os.path.basename(preview_path_for(name)))
+            if info is not None and info.mtime == mtime and info.size == size:
+                if info.preview_mtime != preview_mtime:
+                    with self.lock:
+                        self._publish(name, info._replace(preview_mtime=preview_mtime))
+                continue
+            if self.errors.get(name, (None,))[0] == (mtime, size):
+                continue   # still the same broken file
+            path = os.path.join(self.maps_dir, name)
+            self.reads += 1
+            try:
+                width, height, hist = terrain_histogram(path)
+            except Exception as exc:
+                with self.lock:
+                    self.errors[name] = ((mtime, size), f"{type(exc).__name__}: {exc}")
+                    if name in self.entries:
+                        self._publish(name, None)
+                continue
+            info = MapInfo(name, path, width, height, hist, preview_path_for(path), mtime, size, preview_mtime)
+            with self.lock:
+                self.errors.pop(name, None)
+                self._publish(name, info)
+
+    def _publish(self, name, info):
+        # caller holds the lock; info None removes the entry
+        if info is None:
+            del self.entries[name]
+        else:
+            self.entries[name] = info
+        self.sorted = None
+        self.generation += 1
+        self._unsaved = True
+
+    # -----------------------
+    # Persistence
+    # -----------------------
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CATALOG_VERSION:
+            return {}
+        entries = {}
+        for name, fields in data.get("maps", {}).items():
+            path = os.path.join(self.maps_dir, name)
+            entries[name] = MapInfo(name, path, fields["width"], fields["height"], fields["histogram"],
+                                    preview_path_for(path), fields["mtime"], fields["size"],
+                                    fields.get("preview_mtime"))
+        return entries
+
+    def _save_index(self):
+        with self.lock:
+            infos = list(self.entries.values())
+        data = {
+            "version": CATALOG_VERSION,
+            "maps": {
+                info.name: {"width": info.width, "height": info.height, "histogram": info.histogram,
+                            "mtime": info.mtime, "size": info.size, "preview_mtime": info.preview_mtime}
+                for info in infos
+            },
+        }
+
+        def write(tmp):
+            with open(tmp, "w") as fh:
+                json.dump(data, fh)
+
+        try:
+            atomic_write(self.index_path, write)
+        except OSError:
+            pass   # a read-only maps dir just means no persistent index
+
+
+# shared by the editor and setup screens
+CATALOG = MapCatalog()
@@ -1,17 +1,28 @@
 # map_editor.py
 import pygame
 import os
-import json
 from datetime import datetime
 from hexmap import HexMap
-from settings import WINDOW_WIDTH, WINDOW_HEIGHT, GRID_WIDTH, GRID_HEIGHT, HEX_SIZE, FPS, SIDEBAR_WIDTH as SIDEBAR_W, TERRAIN_TYPES, TERRAIN_LIST
+from mapfile import BINARY_EXT, open_map, with_map_extension
+from map_catalog import CATALOG
+from map_preview import preview_path_for
+from map_saver import MapSaver
+from settings import WINDOW_WIDTH, WINDOW_HEIGHT, GRID_WIDTH, GRID_HEIGHT, FPS, SIDEBAR_WIDTH as SIDEBAR_W, TERRAIN_LIST
 from screen_base import Screen
 from camera import Camera
+from assets import ASSETS
+from fonts import get_font, render_text
 
 MAPS_DIR = "maps"
 
 TERRAIN_UI_LIST = TERRAIN_LIST  # ordered list from settings
 
+# above this share of changed tiles, drop the terrain cache instead of patching
+DIRTY_REBUILD_RATIO = 0.25
+
+# how long the "Saved ..." notice stays up
+SAVE_NOTICE_MS = 2500
+
 if not os.path.exists(MAPS_DIR):
     os.makedirs(MAPS_DIR)
 
@@ -39,163 +50,54 @@ class MapEditorScreen(Screen):
         self.sidebar_scroll = 0
         self.sidebar_scroll_speed = 25
         self.sidebar_content_height = 0   # calculated automatically
+
+        # tiles changed by brush / New Map since the last frame
+        self.dirty_tiles = set()
+
+        # background saving: progress bar while busy, then a short notice
+        self.saver = MapSaver()
+        self.save_notice = None   # (text, ticks when shown)
     
 
 
-        self.font = pygame.font.SysFont("arial", 16)
-        self.title_font = pygame.font.SysFont("arial", 22, bold=True)
+        self.font = get_font("arial", 16)
+        self.title_font = get_font("arial", 22, bold=True)
 
-        self.map_name = f"map_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        self.map_name = f"map_{datetime.now().strftime('%Y%m%d_%H%M%S')}{BINARY_EXT}"
 
     # -------------------------------------------------------------------
-    # Saving / loading logic (unchanged)
+    # Saving / loading logic
     # -------------------------------------------------------------------
-    def save_preview_image(self, filename):
-        """
-        Render a 300x300 preview of the current hex map with:
-
-        ✔ Real hex shapes
-        ✔ Height shading
-        ✔ Impassable tile overlay
-        ✔ Perfect centering
-
-        Saves to: maps/<mapname>.png
-        """
-
-        import pygame
-        import os
-        import math
-
-        PREV_SIZE = 300
-        base, ext = os.path.splitext(filename)
-        out_path = os.path.join(MAPS_DIR, base + ".png")
-
-        # Create surface
-        surf = pygame.Surface((PREV_SIZE, PREV_SIZE))
-        surf.fill((25, 25, 30))
-
-        # Collect all pixel-coordinates BEFORE scaling
-        pixel_centers = []
-        for (q, r) in self.hexmap.terrain.keys():
-            px, py = self.hexmap.hex_to_pixel(q, r)
-            pixel_centers.append((px, py))
-
-        if not pixel_centers:
-            pygame.image.save(surf, out_path)
-            return
-
-        xs = [p[0] for p in pixel_centers]
-        ys = [p[1] for p in pixel_centers]
-
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-
-        map_w = max_x - min_x + HEX_SIZE * 2
-        map_h = max_y - min_y + HEX_SIZE * 2
-
-        # Fit map in preview
-        scale = min(PREV_SIZE / map_w, PREV_SIZE / map_h)
-
-        # Perfect centering
-        offset_x = (PREV_SIZE - map_w * scale) / 2
-        offset_y = (PREV_SIZE - map_h * scale) / 2
-
-        def to_preview(px, py):
-            px = (px - min_x) * scale + offset_x
-            py = (py - min_y) * scale + offset_y
-            return int(px), int(py)
-
-        def hex_corners(px, py, size):
-            """Return pixel coords of a scaled hex."""
-            corners = []
-            for i in range(6):
-                angle = math.radians(60 * i - 30)
-                cx = px + size * math.cos(angle)
-                cy = py + size * math.sin(angle)
-                corners.append((cx, cy))
-            return corners
-
-        # Render each tile
-        for (q, r), data in self.hexmap.terrain.items():
-            terr = data["type"]
-            height = data.get("height", 0)
-            imp = data.get("impassable", False)
-
-            base_color = TERRAIN_TYPES[terr]["color"]
-
-            # HEIGHT SHADING (0–10 expected)
-            # Darker for higher elevation
-            shade = max(0, min(10, height))
-            factor = 1 - shade * 0.04  # reduces brightness
-            color = (
-                int(base_color[0] * factor),
-                int(base_color[1] * factor),
-                int(base_color[2] * factor),
-            )
-
-            px, py = self.hexmap.hex_to_pixel(q, r)
-            sx, sy = to_preview(px, py)
-            hex_size_scaled = HEX_SIZE * scale
-
-            corners = hex_corners(sx, sy, hex_size_scaled)
-
-            # Fill hex
-            pygame.draw.polygon(surf, color, corners)
-
-            # Impassable overlay (red X)
-            if imp:
-                pygame.draw.line(
-                    surf, (200, 40, 40),
-                    corners[0], corners[3], max(1, int(hex_size_scaled * 0.15))
-                )
-                pygame.draw.line(
-                    surf, (200, 40, 40),
-                    corners[1], corners[4], max(1, int(hex_size_scaled * 0.15))
-                )
-
-            # Hex outline
-            pygame.draw.polygon(surf, (20, 20, 20), corners, 1)
-
-        # Save preview PNG
-        pygame.image.save(surf, out_path)
-        print("Saved preview:", out_path)
-
-    
     def list_maps(self):
-        files = [f for f in os.listdir(MAPS_DIR) if f.endswith(".json")]
-        files.sort()
-        return files
+        return CATALOG.names()
 
     def save_map(self, filename=None):
+        """Snapshot the map and write it plus its .png preview in the background."""
         if filename is None:
             filename = self.map_name
+        filename = with_map_extension(filename)
         path = os.path.join(MAPS_DIR, filename)
-        payload = {
-            "width": self.hexmap.width,
-            "height": self.hexmap.height,
-            "tiles": {}
-        }
-        for (q,r), data in self.hexmap.terrain.items():
-            payload["tiles"][f"{q},{r}"] = data
-        with open(path, "w") as fh:
-            json.dump(payload, fh, indent=2)
-        print("Saved map:", path)
-
-        # ALSO save preview PNG
-        self.save_preview_image(filename)
+        self.saver.save(self.hexmap.terrain, path, preview_path_for(path))
+
+    def finish_saves(self):
+        """Pick up saves the worker has completed (runs on the UI thread)."""
+        for result in self.saver.poll():
+            name = os.path.basename(result.map_path)
+            if result.error is not None:
+                self.save_notice = (f"Saving {name} failed: {result.error}", pygame.time.get_ticks())
+                continue
+            ASSETS.invalidate(result.preview_path)
+            CATALOG.add(result.info)
+            mark_saved = getattr(self.hexmap.terrain, "mark_saved", None)
+            if mark_saved is not None:
+                mark_saved(result.snapshot, result.map_path)
+            self.save_notice = (f"Saved {name}", pygame.time.get_ticks())
 
     def load_map(self, filename):
         path = os.path.join(MAPS_DIR, filename)
-        with open(path, "r") as fh:
-            payload = json.load(fh)
-        width = payload.get("width", self.hexmap.width)
-        height = payload.get("height", self.hexmap.height)
-        tiles = payload.get("tiles", {})
-        for key, info in tiles.items():
-            q_s, r_s = key.split(",")
-            q, r = int(q_s), int(r_s)
-            if (q, r) in self.hexmap.terrain:
-                self.hexmap.terrain[(q, r)] = info
+        grid = open_map(path, (self.hexmap.width, self.hexmap.height))
+        self.hexmap.set_terrain(grid)
+        self.dirty_tiles.clear()
         print("Loaded map:", path)
 
     # -------------------------------------------------------------------
@@ -204,7 +106,6 @@ class MapEditorScreen(Screen):
     def apply_brush(self, q, r):
         coords = [(q, r)]
         terrain_name = TERRAIN_UI_LIST[self.selected_terrain_idx]
-        base = TERRAIN_TYPES[terrain_name]
         if self.brush_size > 0:
             for dq in range(-self.brush_size, self.brush_size + 1):
                 for dr in range(-self.brush_size, self.brush_size + 1):
@@ -214,14 +115,15 @@ class MapEditorScreen(Screen):
         for (qq, rr) in coords:
             if not self.hexmap.is_inside_grid(qq, rr):
                 continue
-            self.hexmap.terrain[(qq, rr)] = {
-                "type": terrain_name,
-                "move_cost": base["move_cost"],
-                "height": self.selected_height,
-                "passable": self.passable
-            }
+            if self.hexmap.terrain.set_tile(
+                qq, rr, terrain_name,
+                height=self.selected_height,
+                passable=self.passable
+            ):
+                self.dirty_tiles.add((qq, rr))
 
     def sample_tile(self, q, r):
+        # only reads the tile into the brush settings: nothing to mark dirty
         if (q, r) in self.hexmap.terrain:
             t = self.hexmap.terrain[(q, r)]
             terrain_name = t["type"]
@@ -229,6 +131,17 @@ class MapEditorScreen(Screen):
             self.selected_height = t["height"]
             self.passable = t["passable"]
 
+    def flush_dirty_tiles(self):
+        """Patch tiles changed since the last frame into the cached terrain layer."""
+        if not self.dirty_tiles:
+            return
+        if len(self.dirty_tiles) > DIRTY_REBUILD_RATIO * len(self.hexmap.terrain):
+            # most of the map changed: re-rendering visible blocks is cheaper
+            self.hexmap.invalidate_terrain_layer()
+        else:
+            self.hexmap.redraw_tiles(self.dirty_tiles)
+        self.dirty_tiles.clear()
+
     # -------------------------------------------------------------------
 # Sidebar UI
 # -------------------------------------------------------------------
@@ -248,25 +161,25 @@ class MapEditorScreen(Screen):
         offset_y = -self.sidebar_scroll
 
         # --- Title ---
-        title_surf = self.title_font.render("Map Editor", True, (230,230,230))
+        title_surf = render_text(self.title_font, "Map Editor", True, (230,230,230))
         sidebar_surface.blit(title_surf, (local_x, y + offset_y))
         y += 44
 
         # --- MAP NAME ---
-        name_label = self.font.render("Map name:", True, (200,200,200))
+        name_label = render_text(self.font, "Map name:", True, (200,200,200))
         sidebar_surface.blit(name_label, (local_x, y + offset_y))
         y += 24
 
         name_box_local = pygame.Rect(local_x, y, SIDEBAR_W - 24, 28)
         pygame.draw.rect(sidebar_surface, (70,70,90), (name_box_local.x, name_box_local.y + offset_y, name_box_local.w, name_box_local.h))
         displayed_name = self.map_name if not self.typing_name else self.map_name + "|"
-        sidebar_surface.blit(self.font.render(displayed_name, True, (255,255,255)), (name_box_local.x + 4, name_box_local.y + 6 + offset_y))
+        sidebar_surface.blit(render_text(self.font, displayed_name, True, (255,255,255)), (name_box_local.x + 4, name_box_local.y + 6 + offset_y))
         # store local rect for hit testing
         self.name_box_local = name_box_local
         y += 40
 
         # --- TERRAIN SELECTION ---
-        terrain_label = self.font.render("Terrains:", True, (200,200,200))
+        terrain_label = render_text(self.font, "Terrains:", True, (200,200,200))
         sidebar_surface.blit(terrain_label, (local_x, y + offset_y))
         y += 28
 
@@ -276,24 +189,24 @@ class MapEditorScreen(Screen):
             rect_local = pygame.Rect(local_x, y, SIDEBAR_W - 24, 28)
             color = (80,80,80) if idx != self.selected_terrain_idx else (65,110,180)
             pygame.draw.rect(sidebar_surface, color, (rect_local.x, rect_local.y + offset_y, rect_local.w, rect_local.h))
-            sidebar_surface.blit(self.font.render(name.title(), True, (255,255,255)), (rect_local.x + 8, rect_local.y + 6 + offset_y))
+            sidebar_surface.blit(render_text(self.font, name.title(), True, (255,255,255)), (rect_local.x + 8, rect_local.y + 6 + offset_y))
             self.terrain_boxes_local.append(rect_local)
             y += 34
 
         # --- HEIGHT CONTROLS ---
         y += 6
-        sidebar_surface.blit(self.font.render("Height:", True, (200,200,200)), (local_x, y + offset_y))
+        sidebar_surface.blit(render_text(self.font, "Height:", True, (200,200,200)), (local_x, y + offset_y))
         y += 26
         minus_local = pygame.Rect(local_x, y, 26, 26)
         plus_local = pygame.Rect(local_x + SIDEBAR_W - 24 - 26, y, 26, 26)
 
         pygame.draw.rect(sidebar_surface, (70,70,90), (minus_local.x, minus_local.y + offset_y, minus_local.w, minus_local.h))
         pygame.draw.rect(sidebar_surface, (70,70,90), (plus_local.x, plus_local.y + offset_y, plus_local.w, plus_local.h))
-        sidebar_surface.blit(self.font.render("-", True, (255,255,255)), (minus_local.x + 4, minus_local.y + 4 + offset_y))
-        sidebar_surface.blit(self.font.render("+", True, (255,255,255)), (plus_local.x + 4, plus_local.y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, "-", True, (255,255,255)), (minus_local.x + 4, minus_local.y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, "+", True, (255,255,255)), (plus_local.x + 4, plus_local.y + 4 + offset_y))
 
         mid_x = local_x + (SIDEBAR_W // 2) - 8
-        sidebar_surface.blit(self.font.render(str(self.selected_height), True, (255,255,255)), (mid_x, y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, str(self.selected_height), True, (255,255,255)), (mid_x, y + 4 + offset_y))
 
         self.height_minus_local = minus_local
         self.height_plus_local = plus_local
@@ -304,20 +217,20 @@ class MapEditorScreen(Screen):
         pygame.draw.rect(sidebar_surface, (110,60,60) if not self.passable else (60,110,60),
                         (toggle_local.x, toggle_local.y + offset_y, toggle_local.w, toggle_local.h))
         txt = "Passable: " + ("Yes" if self.passable else "No")
-        sidebar_surface.blit(self.font.render(txt, True, (255,255,255)), (toggle_local.x + 8, toggle_local.y + 6 + offset_y))
+        sidebar_surface.blit(render_text(self.font, txt, True, (255,255,255)), (toggle_local.x + 8, toggle_local.y + 6 + offset_y))
         self.passable_btn_local = toggle_local
         y += 40
 
         # --- BRUSH SIZE ---
-        sidebar_surface.blit(self.font.render("Brush size:", True, (200,200,200)), (local_x, y + offset_y))
+        sidebar_surface.blit(render_text(self.font, "Brush size:", True, (200,200,200)), (local_x, y + offset_y))
         y += 26
         brush_minus_local = pygame.Rect(local_x, y, 26, 26)
         brush_plus_local = pygame.Rect(local_x + SIDEBAR_W - 24 - 26, y, 26, 26)
         pygame.draw.rect(sidebar_surface, (70,70,90), (brush_minus_local.x, brush_minus_local.y + offset_y, brush_minus_local.w, brush_minus_local.h))
         pygame.draw.rect(sidebar_surface, (70,70,90), (brush_plus_local.x, brush_plus_local.y + offset_y, brush_plus_local.w, brush_plus_local.h))
-        sidebar_surface.blit(self.font.render("-", True, (255,255,255)), (brush_minus_local.x + 4, brush_minus_local.y + 4 + offset_y))
-        sidebar_surface.blit(self.font.render("+", True, (255,255,255)), (brush_plus_local.x + 4, brush_plus_local.y + 4 + offset_y))
-        sidebar_surface.blit(self.font.render(str(self.brush_size), True, (255,255,255)), (mid_x, y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, "-", True, (255,255,255)), (brush_minus_local.x + 4, brush_minus_local.y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, "+", True, (255,255,255)), (brush_plus_local.x + 4, brush_plus_local.y + 4 + offset_y))
+        sidebar_surface.blit(render_text(self.font, str(self.brush_size), True, (255,255,255)), (mid_x, y + 4 + offset_y))
         self.brush_minus_local = brush_minus_local
         self.brush_plus_local = brush_plus_local
         y += 40
@@ -330,16 +243,16 @@ class MapEditorScreen(Screen):
         for label, key in [("New Map","new"),("Save","save"),("Load","load"),("Back","back")]:
             btn_local = pygame.Rect(local_x, y, SIDEBAR_W - 24, btn_h)
             pygame.draw.rect(sidebar_surface, (70,70,90), (btn_local.x, btn_local.y + offset_y, btn_local.w, btn_local.h))
-            sidebar_surface.blit(self.font.render(label, True, (240,240,240)), (btn_local.x + 8, btn_local.y + 6 + offset_y))
+            sidebar_surface.blit(render_text(self.font, label, True, (240,240,240)), (btn_local.x + 8, btn_local.y + 6 + offset_y))
             self.buttons_local.append((btn_local, key))
             y += btn_h + spacing
 
         # --- List saved maps (simple listing) ---
         y += 12
-        sidebar_surface.blit(self.font.render("Saved maps:", True, (200,200,200)), (local_x, y + offset_y))
+        sidebar_surface.blit(render_text(self.font, "Saved maps:", True, (200,200,200)), (local_x, y + offset_y))
         y += 22
         for m in self.list_maps()[-16:][::-1]:
-            sidebar_surface.blit(self.font.render(m, True, (180,180,180)), (local_x, y + offset_y))
+            sidebar_surface.blit(render_text(self.font, m, True, (180,180,180)), (local_x, y + offset_y))
             y += 18
 
         # compute content height so scrolling clamp can use it
@@ -403,8 +316,7 @@ class MapEditorScreen(Screen):
         for rect_local, action in self.buttons_local:
             if rect_local.collidepoint(mx_local, my_local):
                 if action == "new":
-                    for k in list(self.hexmap.terrain.keys()):
-                        self.hexmap.terrain[k] = {"type":"plain","move_cost":1,"height":1,"passable":True}
+                    self.dirty_tiles.update(self.hexmap.terrain.fill("plain"))
                 elif action == "save":
                     self.save_map(self.map_name)
                 elif action == "load":
@@ -419,7 +331,7 @@ class MapEditorScreen(Screen):
     
     def draw_load_menu(self):
         pygame.draw.rect(self.surface, (20,20,26), (0, 0, WINDOW_WIDTH, WINDOW_HEIGHT))
-        title = self.title_font.render("Load Map", True, (230,230,230))
+        title = render_text(self.title_font, "Load Map", True, (230,230,230))
         self.surface.blit(title, (40, 20))
 
         self.load_boxes = []
@@ -428,13 +340,13 @@ class MapEditorScreen(Screen):
         for m in self.list_maps():
             rect = pygame.Rect(40, y, WINDOW_WIDTH - 80, 32)
             pygame.draw.rect(self.surface, (60,60,80), rect)
-            self.surface.blit(self.font.render(m, True, (255,255,255)), (50, y+6))
+            self.surface.blit(render_text(self.font, m, True, (255,255,255)), (50, y+6))
             self.load_boxes.append((rect, m))
             y += 40
 
         back_rect = pygame.Rect(40, y+20, 160, 36)
         pygame.draw.rect(self.surface, (100,60,60), back_rect)
-        self.surface.blit(self.font.render("Back", True, (255,255,255)), (85, y+26))
+        self.surface.blit(render_text(self.font, "Back", True, (255,255,255)), (85, y+26))
         self.load_back_btn = back_rect
 
     def handle_load_click(self, mx, my):
@@ -513,7 +425,7 @@ class MapEditorScreen(Screen):
                 self.save_map()
 
     def update(self, dt):
-        pass
+        self.finish_saves()
     
     def draw(self, surface):
         mx, my = pygame.mouse.get_pos()
@@ -525,10 +437,32 @@ class MapEditorScreen(Screen):
             return
 
         surface.fill((30,30,36))
-        self.hexmap.draw()
+        self.flush_dirty_tiles()
+        self.hexmap.stream_terrain(self.map_rect)
+        self.hexmap.draw(self.map_rect)
         self.draw_sidebar()
 
         if self.hexmap.is_inside_grid(q, r):
             px, py = self.hexmap.hex_to_pixel(q, r)
             sx2, sy2 = self.camera.apply((px, py))
             pygame.draw.circle(surface, (255,255,0), (int(sx2), int(sy2)), 6, 2)
+
+        self.draw_save_status(surface)
+
+    def draw_save_status(self, surface):
+        """Progress bar while a save runs in the background, then a short notice."""
+        x, y = self.map_rect.left + 10, self.map_rect.bottom - 34
+        if self.saver.busy:
+            label = render_text(self.font, self.saver.stage + "...", True, (230,230,230))
+            pygame.draw.rect(surface, (40,40,50), (x, y, 220, 24))
+            pygame.draw.rect(surface, (70,130,180), (x, y, int(220 * self.saver.progress), 24))
+            pygame.draw.rect(surface, (200,200,200), (x, y, 220, 24), 1)
+            surface.blit(label, (x + 6, y + 4))
+        elif self.save_notice is not None:
+            text, shown_at = self.save_notice
+            if pygame.time.get_ticks() - shown_at > SAVE_NOTICE_MS:
+                self.save_notice = None
+                return
+            label = render_text(self.font, text, True, (230,230,230))
+            pygame.draw.rect(surface, (40,40,50), (x, y, label.get_width() + 12, 24))
+            surface.blit(label, (x + 6, y + 4))
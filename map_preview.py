@@ -0,0 +1,171 @@
+# map_preview.py
+"""
+Map preview images.
+
+Regenerate every out-of-date preview in the maps directory with:
+    python map_preview.py [--force] [--jobs N] [MAPS_DIR]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from mapfile import atomic_write, is_map_file, open_map
+from settings import HEX_SIZE, MAPS_DIR
+from terrain_grid import TERRAIN
+
+PREVIEW_SIZE = 300
+PREVIEW_MAX_TILES = 150   # tiles per side; bigger maps are sampled on a stride
+
+
+def render_preview(terrain, size=PREVIEW_SIZE, progress=None):
+    """
+    A size x size Surface showing the whole map: real hex shapes, height
+    shading and a red X over impassable tiles, centred.
+
+    Works on any TerrainGrid and needs no display, so it can run on a worker
+    thread. Maps wider or taller than PREVIEW_MAX_TILES are drawn from every
+    n-th tile. progress(fraction) is called once per drawn row.
+    """
+    surf = pygame.Surface((size, size))
+    surf.fill((25, 25, 30))
+    width, height = terrain.width, terrain.height
+    if width <= 0 or height <= 0:
+        return surf
+
+    stride = max(1, math.ceil(max(width, height) / PREVIEW_MAX_TILES))
+    hex_size = HEX_SIZE * stride
+
+    # pixel centres of the sampled tiles span this box (axial parallelogram)
+    cols = math.ceil(width / stride)
+    rows = math.ceil(height / stride)
+    max_x = hex_size * math.sqrt(3) * ((cols - 1) + (rows - 1) / 2)
+    max_y = hex_size * 1.5 * (rows - 1)
+    map_w = max_x + hex_size * 2
+    map_h = max_y + hex_size * 2
+
+    scale = min(size / map_w, size / map_h)
+    offset_x = (size - map_w * scale) / 2
+    offset_y = (size - map_h * scale) / 2
+    scaled = hex_size * scale
+    corner_offsets = [
+        (scaled * math.cos(math.radians(60 * i - 30)), scaled * math.sin(math.radians(60 * i - 30)))
+        for i in range(6)
+    ]
+    cross_width = max(1, int(scaled * 0.15))
+
+    # height-shaded colour per (type, height), darker for higher ground
+    shades = {}
+
+    def shade(type_id, h):
+        color = shades.get((type_id, h))
+        if color is None:
+            base = TERRAIN[type_id].color
+            factor = 1 - max(0, min(10, h)) * 0.04
+            color = shades[(type_id, h)] = tuple(int(c * factor) for c in base)
+        return color
+
+    props = terrain.props
+    for row in range(rows):
+        r = row * stride
+        for col in range(cols):
+            type_id, h, _cost, passable = props(col * stride, r)
+            sx = int((hex_size * math.sqrt(3) * (col + row / 2) + hex_size) * scale + offset_x)
+            sy = int((hex_size * 1.5 * row + hex_size) * scale + offset_y)
+            corners = [(sx + dx, sy + dy) for dx, dy in corner_offsets]
+
+            pygame.draw.polygon(surf, shade(type_id, h), corners)
+            if not passable:
+                pygame.draw.line(surf, (200, 40, 40), corners[0], corners[3], cross_width)
+                pygame.draw.line(surf, (200, 40, 40), corners[1], corners[4], cross_width)
+            pygame.draw.polygon(surf, (20, 20, 20), corners, 1)
+
+        if progress is not None:
+            progress((row + 1) / rows)
+    return surf
+
+
+def save_preview(terrain, out_path, size=PREVIEW_SIZE, progress=None):
+    """Render the preview and write it to out_path (a .png), replacing it atomically."""
+    surf = render_preview(terrain, size, progress)
+    atomic_write(out_path, lambda tmp: pygame.image.save(surf, tmp))
+
+
+# -------------------------------------------------------
+# Bulk regeneration
+# -------------------------------------------------------
+def preview_path_for(map_path):
+    return os.path.splitext(map_path)[0] + ".png"
+
+
+def stale_previews(maps_dir=MAPS_DIR, force=False):
+    """
+    (map_path, preview_path) for every map whose preview is missing or
+    older than the map file (all maps if force). When foo.json and foo.hexm
+    both exist they share foo.png; the newer map wins.
+    """
+    newest = {}
+    for name in sorted(os.listdir(maps_dir)):
+        if not is_map_file(name):
+            continue
+        map_path = os.path.join(maps_dir, name)
+        preview = preview_path_for(map_path)
+        mtime = os.path.getmtime(map_path)
+        if preview not in newest or mtime > newest[preview][1]:
+            newest[preview] = (map_path, mtime)
+
+    jobs = []
+    for preview, (map_path, mtime) in newest.items():
+        if force or not os.path.exists(preview) or os.path.getmtime(preview) < mtime:
+            jobs.append((map_path, preview))
+    return jobs
+
+
+def regenerate_preview(map_path, preview_path):
+    """Render one map's preview; returns (map_path, error message or None)."""
+    try:
+        grid = open_map(map_path)
+        try:
+            save_preview(grid, preview_path)
+        finally:
+            close = getattr(grid, "close", None)
+            if close is not None:
+                close()
+    except Exception as exc:
+        return map_path, f"{type(exc).__name__}: {exc}"
+    return map_path, None
+
+
+def regenerate_previews(maps_dir=MAPS_DIR, jobs=None, force=False, report=print):
+    """Rebuild stale previews in parallel worker processes; returns the failures."""
+    todo = stale_previews(maps_dir, force)
+    if not todo:
+        report("all previews are up to date")
+        return []
+
+    failures = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(regenerate_preview, *job) for job in todo]
+        for future in futures:
+            map_path, error = future.result()
+            if error is None:
+                report(f"  {os.path.basename(map_path)}")
+            else:
+                report(f"  {os.path.basename(map_path)}: FAILED ({error})")
+                failures.append((map_path, error))
+    report(f"{len(todo) - len(failures)}/{len(todo)} previews in {time.perf_counter() - start:.2f} s")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate map preview images.")
+    parser.add_argument("maps_dir", nargs="?", default=MAPS_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild previews that are up to date too")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    sys.exit(1 if regenerate_previews(args.maps_dir, args.jobs, args.force) else 0)
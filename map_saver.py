@@ -0,0 +1,109 @@
+# map_saver.py
+import os
+import threading
+from collections import deque
+from typing import NamedTuple
+
+from map_catalog import map_info
+from map_preview import save_preview
+from mapfile import BINARY_EXT, MappedTerrainGrid, save_map_file
+from terrain_grid import TerrainGrid
+
+
+class SaveResult(NamedTuple):
+    map_path: str
+    preview_path: str
+    snapshot: object
+    info: object = None        # the saved map's catalog MapInfo
+    error: Exception = None
+
+
+def snapshot_terrain(grid, map_path):
+    """
+    Something a worker thread can save to map_path while `grid` keeps
+    changing: the chunked grid's own snapshot for .hexm, else a copy.
+    """
+    if os.path.splitext(map_path)[1].lower() == BINARY_EXT and hasattr(grid, "snapshot"):
+        return grid.snapshot()
+    return grid.copy()
+
+
+class MapSaver:
+    """
+    Saves maps and their preview images on a background thread.
+
+    save() snapshots the terrain on the calling (UI) thread, which is just a
+    few array copies, and hands it to a worker that writes the map and then
+    renders the preview. Both files are replaced atomically, and the map's
+    catalog entry (map_info) is built there too, from the snapshot. While the worker
+    runs, `stage` and `progress` describe what it is doing; finished saves
+    are collected with poll(). If save() is called again before the worker
+    picks up the previous request, only the newest one is written.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pending = None      # (snapshot, map_path, preview_path)
+        self.finished = deque()  # SaveResult, oldest first
+        self.stage = ""
+        self.progress = 0.0
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.thread is not None
+
+    def save(self, grid, map_path, preview_path):
+        job = (snapshot_terrain(grid, map_path), map_path, preview_path)
+        with self.lock:
+            self.pending = job
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="map-saver", daemon=True)
+                self.thread.start()
+
+    def poll(self):
+        """Finished saves since the last call."""
+        results = []
+        while self.finished:
+            results.append(self.finished.popleft())
+        return results
+
+    def wait(self, timeout=None):
+        """Block until the worker is idle (e.g. before quitting)."""
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # -----------------------
+    # Worker thread
+    # -----------------------
+    def _run(self):
+        while True:
+            with self.lock:
+                job = self.pending
+                self.pending = None
+                if job is None:
+                    self.thread = None
+                    self.stage = ""
+                    return
+            self.finished.append(self._save(*job))
+
+    def _save(self, snapshot, map_path, preview_path):
+        try:
+            self.stage, self.progress = "Saving map", 0.0
+            save_map_file(map_path, snapshot)
+
+            self.stage, self.progress = "Rendering preview", 0.2
+            # chunked snapshots only hold the edits; draw from the written file
+            source = snapshot if isinstance(snapshot, TerrainGrid) else MappedTerrainGrid(map_path)
+            try:
+                save_preview(source, preview_path,
+                             progress=lambda f: setattr(self, "progress", 0.2 + 0.8 * f))
+            finally:
+                if source is not snapshot:
+                    source.close()
+            info = map_info(map_path, snapshot)
+        except Exception as exc:   # reported to the UI instead of killing the worker
+            return SaveResult(map_path, preview_path, snapshot, error=exc)
+        return SaveResult(map_path, preview_path, snapshot, info)
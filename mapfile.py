@@ -0,0 +1,487 @@
+# mapfile.py
+"""
+Map files on disk.
+
+Two formats are supported and chosen by file extension:
+
+    .json   the original editor format: {"width", "height", "tiles": {"q,r": {...}}}
+    .hexm   compact binary format (below)
+
+Binary layout (little-endian), version 1:
+
+    header    4s magic b"HEXM", u16 version, u16 palette size,
+              u32 width, u32 height
+    palette   per entry: u8 length + utf-8 terrain name
+    padding   zero bytes up to the next multiple of 8
+    records   width * height fixed 6-byte records, row-major (r * width + q):
+              u8 palette index, i8 height, u16 move cost, u8 passable, u8 reserved
+
+Records start at an aligned offset and have a fixed size, so the file can be
+memory-mapped and any tile read without parsing the rest; open_map() does
+that (MappedTerrainGrid) instead of decoding the whole file.
+
+Convert between formats with:
+    python mapfile.py maps/foo.json maps/foo.hexm
+    python mapfile.py maps/foo.hexm maps/foo.json
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+
+from settings import CHUNKED_MAP_TILES, TERRAIN_LIST
+from terrain_grid import MOVE_COSTS, TERRAIN, TERRAIN_BY_NAME, TERRAIN_IDS, TerrainGrid
+
+MAGIC = b"HEXM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+ALIGN = 8
+RECORD = np.dtype([
+    ("type", "u1"),
+    ("height", "i1"),
+    ("move_cost", "<u2"),
+    ("passable", "u1"),
+    ("reserved", "u1"),
+])
+RECORD_STRUCT = struct.Struct("<BbHBx")   # one RECORD, for single-tile access
+
+JSON_EXT = ".json"
+BINARY_EXT = ".hexm"
+MAP_EXTENSIONS = (JSON_EXT, BINARY_EXT)
+
+_MOVE_COSTS = np.array(MOVE_COSTS, dtype=np.uint16)   # TERRAIN_IDS -> the type's move cost
+
+
+class MapFormatError(ValueError):
+    """The file is not a map this version can read."""
+
+
+# -------------------------------------------------------
+# Binary format
+# -------------------------------------------------------
+def read_header(buf):
+    """Parse the header and palette; returns (width, height, palette, records offset)."""
+    if len(buf) < HEADER.size:
+        raise MapFormatError("file too short for a map header")
+    magic, version, palette_size, width, height = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise MapFormatError("not a binary map (bad magic)")
+    if version > VERSION:
+        raise MapFormatError(f"map format version {version} is newer than supported ({VERSION})")
+
+    offset = HEADER.size
+    palette = []
+    for _ in range(palette_size):
+        length = buf[offset]
+        palette.append(bytes(buf[offset + 1:offset + 1 + length]).decode("utf-8"))
+        offset += 1 + length
+    offset += -offset % ALIGN
+    return width, height, palette, offset
+
+
+def read_file_header(path):
+    """read_header for a file on disk, without reading its records."""
+    with open(path, "rb") as fh:
+        head = fh.read(HEADER.size)
+        if len(head) == HEADER.size:
+            palette_size = HEADER.unpack(head)[2]
+            head += fh.read(palette_size * 256)   # entries are at most 1 + 255 bytes
+    try:
+        return read_header(head)
+    except IndexError:
+        raise MapFormatError("map palette is truncated") from None
+
+
+def palette_lookup(palette):
+    """Array mapping file palette indices to this build's TERRAIN_IDS."""
+    try:
+        return np.array([TERRAIN_IDS[name] for name in palette], dtype=np.uint8)
+    except KeyError as exc:
+        raise MapFormatError(f"unknown terrain type {exc.args[0]!r}") from None
+
+
+def encode_binary(grid):
+    """The .hexm bytes for a TerrainGrid."""
+    header = bytearray(HEADER.pack(MAGIC, VERSION, len(TERRAIN_LIST), grid.width, grid.height))
+    for name in TERRAIN_LIST:
+        encoded = name.encode("utf-8")
+        header.append(len(encoded))
+        header += encoded
+    header += bytes(-len(header) % ALIGN)
+
+    return bytes(header) + grid_to_records(grid).tobytes()
+
+
+def decode_binary(buf):
+    """A TerrainGrid from .hexm bytes (or any buffer, e.g. an mmap)."""
+    width, height, palette, offset = read_header(buf)
+    n = width * height
+    if len(buf) < offset + n * RECORD.itemsize:
+        raise MapFormatError("map file is truncated")
+    records = np.frombuffer(buf, dtype=RECORD, count=n, offset=offset)
+    return records_to_grid(width, height, records, palette_lookup(palette))
+
+
+def records_to_grid(width, height, records, lookup):
+    """A TerrainGrid from a RECORD array; lookup maps palette index -> TERRAIN_IDS."""
+    grid = TerrainGrid.__new__(TerrainGrid)
+    grid.width = width
+    grid.height = height
+    type_ids = lookup[records["type"]]
+    grid.type_ids = array("B", type_ids.tobytes())
+    grid.heights = array("b", records["height"].tobytes())
+    grid.passable = array("B", records["passable"].tobytes())
+
+    # only costs that differ from the terrain type's are kept per tile
+    costs = records["move_cost"]
+    custom = np.flatnonzero(costs != _MOVE_COSTS[type_ids])
+    grid.cost_overrides = dict(zip(custom.tolist(), costs[custom].tolist()))
+    grid.rebuild_codes()
+    return grid
+
+
+def grid_to_records(grid, to_file=None):
+    """A RECORD array for a TerrainGrid; to_file maps TERRAIN_IDS -> palette index."""
+    type_ids = np.frombuffer(grid.type_ids, dtype=np.uint8)
+    records = np.zeros(grid.width * grid.height, dtype=RECORD)
+    records["type"] = type_ids if to_file is None else to_file[type_ids]
+    records["height"] = np.frombuffer(grid.heights, dtype=np.int8)
+    records["move_cost"] = _MOVE_COSTS[type_ids]
+    if grid.cost_overrides:
+        custom = np.fromiter(grid.cost_overrides, dtype=np.intp, count=len(grid.cost_overrides))
+        records["move_cost"][custom] = list(grid.cost_overrides.values())
+    records["passable"] = np.frombuffer(grid.passable, dtype=np.uint8)
+    return records
+
+
+def save_binary(path, grid):
+    if hasattr(grid, "save"):   # mapped/chunked grids write back their own edits
+        grid.save(path)
+        return
+    with open(path, "wb") as fh:
+        fh.write(encode_binary(grid))
+
+
+def load_binary(path):
+    with open(path, "rb") as fh:
+        return decode_binary(fh.read())
+
+
+# -------------------------------------------------------
+# Memory-mapped maps
+# -------------------------------------------------------
+class MappedTerrainGrid(TerrainGrid):
+    """
+    A TerrainGrid that reads its tiles straight out of a memory-mapped
+    .hexm file.
+
+    Opening only parses the header. A tile record is decoded the first time
+    props(), type_name() or the mapping view asks for it, so the OS pages in
+    just the parts of the map that are drawn, searched or edited. The mapping
+    is copy-on-write: edits stay private to this process and are tracked as
+    dirty records until save() (or mark_saved() after a save elsewhere)
+    writes them back. close() releases the mapping and the file; the grid
+    is also a context manager that closes on exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+        self.dirty = set()        # record indices changed since open/save
+        self._all_dirty = False
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        self._mm = None
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+            self.width, self.height, palette, self._offset = read_header(self._mm)
+            if len(self._mm) < self._offset + self.width * self.height * RECORD.itemsize:
+                raise MapFormatError("map file is truncated")
+            # file palette index <-> TERRAIN_IDS
+            self._to_id = tuple(int(i) for i in palette_lookup(palette))
+        except Exception:
+            self.close()
+            raise
+        self._to_file = {type_id: index for index, type_id in enumerate(self._to_id)}
+
+    @staticmethod
+    def can_map(path):
+        """True if `path` is a .hexm whose palette covers every terrain type."""
+        try:
+            _w, _h, palette, _offset = read_file_header(path)
+        except MapFormatError:
+            return False
+        return set(TERRAIN_LIST) <= set(palette)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reader(self):
+        """
+        Another grid over the same file, for reading on another thread. It
+        has its own mapping (the OS shares the pages), so closing either
+        grid doesn't affect the other. Unsaved edits aren't part of it.
+        """
+        return MappedTerrainGrid(*self.__reduce__()[1])
+
+    def __reduce__(self):
+        # pickles (e.g. to a search process) as its file, which the copy maps itself
+        if self.dirty or self._all_dirty:
+            raise ValueError("mapped grid has unsaved edits; save it before sharing it")
+        return MappedTerrainGrid, (self.path,)
+
+    # -----------------------
+    # Tile access
+    # -----------------------
+    def props(self, q, r):
+        if not (0 <= q < self.width and 0 <= r < self.height):
+            return None
+        t, h, c, p = RECORD_STRUCT.unpack_from(
+            self._mm, self._offset + (r * self.width + q) * RECORD_STRUCT.size)
+        return self._to_id[t], h, c, p
+
+    def terrain_type(self, q, r):
+        return TERRAIN[self._to_id[self._mm[self._offset + (r * self.width + q) * RECORD_STRUCT.size]]]
+
+    def type_name(self, q, r):
+        return self.terrain_type(q, r).name
+
+    def set_tile(self, q, r, ttype, height=None, move_cost=None, passable=None):
+        base = TERRAIN_BY_NAME[ttype]
+        i = r * self.width + q
+        new = (
+            self._to_file[base.id],
+            base.height if height is None else height,
+            base.move_cost if move_cost is None else move_cost,
+            int(base.passable if passable is None else passable),
+        )
+        pos = self._offset + i * RECORD_STRUCT.size
+        if new == RECORD_STRUCT.unpack_from(self._mm, pos):
+            return False
+        RECORD_STRUCT.pack_into(self._mm, pos, *new)
+        self.dirty.add(i)
+        return True
+
+    def fill(self, ttype="plain"):
+        base = TERRAIN_BY_NAME[ttype]
+        default = (self._to_file[base.id], base.height, base.move_cost, int(base.passable))
+        records = np.frombuffer(self._mm, dtype=RECORD, count=self.width * self.height,
+                                offset=self._offset)
+        differs = ((records["type"] != default[0]) | (records["height"] != default[1])
+                   | (records["move_cost"] != default[2]) | (records["passable"] != default[3]))
+        changed = [(int(i) % self.width, int(i) // self.width) for i in np.flatnonzero(differs)]
+
+        records["type"], records["height"], records["move_cost"], records["passable"] = default
+        del records, differs   # release the buffer export so the mmap can close
+        self._all_dirty = True
+        return changed
+
+    def copy(self):
+        """An in-memory TerrainGrid with the current contents (including unsaved edits)."""
+        return decode_binary(self._mm)
+
+    def memory_usage(self):
+        """Bytes held outside the mapping; mapped pages belong to the OS page cache."""
+        return sys.getsizeof(self) + sys.getsizeof(self.dirty)
+
+    # -----------------------
+    # Saving
+    # -----------------------
+    def save(self, path=None):
+        """
+        Write the map to `path` (default: the file it was opened from).
+        Saving back to the source file only rewrites the dirty records.
+        """
+        if path is not None and not same_file(path, self.path):
+            with open(path, "wb") as fh:
+                fh.write(self._mm[:self._offset + self.width * self.height * RECORD_STRUCT.size])
+            return
+
+        size = RECORD_STRUCT.size
+        with open(self.path, "r+b") as fh:
+            if self._all_dirty:
+                fh.seek(self._offset)
+                fh.write(self._mm[self._offset:self._offset + self.width * self.height * size])
+            else:
+                for i in sorted(self.dirty):
+                    pos = self._offset + i * size
+                    fh.seek(pos)
+                    fh.write(self._mm[pos:pos + size])
+        self.dirty.clear()
+        self._all_dirty = False
+
+    def mark_saved(self, snapshot, path):
+        """
+        Call on the owning thread once `snapshot` (a copy() of this grid)
+        has been written to `path`. If that was this map's own file, which
+        an atomic save replaces, map the new file instead of the old one
+        and keep only the edits made since the snapshot dirty.
+        """
+        if not same_file(path, self.path):
+            return
+        old_file, old_mm, old_offset, old_to_id = self._file, self._mm, self._offset, self._to_id
+        self._open()
+        n = self.width * self.height
+        old = np.frombuffer(old_mm, dtype=RECORD, count=n, offset=old_offset)
+        new = np.frombuffer(self._mm, dtype=RECORD, count=n, offset=self._offset)
+        indices = (np.arange(n) if self._all_dirty
+                   else np.fromiter(self.dirty, dtype=np.intp, count=len(self.dirty)))
+        old_types = np.array(old_to_id, dtype=np.uint8)[old["type"][indices]]
+        new_types = np.array(self._to_id, dtype=np.uint8)[new["type"][indices]]
+        edited = indices[(old_types != new_types) | (old["height"][indices] != new["height"][indices])
+                         | (old["move_cost"][indices] != new["move_cost"][indices])
+                         | (old["passable"][indices] != new["passable"][indices])]
+
+        # carry the later edits over into the new mapping
+        to_file = np.zeros(256, dtype=np.uint8)
+        to_file[list(self._to_id)] = np.arange(len(self._to_id), dtype=np.uint8)
+        new[edited] = old[edited]
+        new["type"][edited] = to_file[np.array(old_to_id, dtype=np.uint8)[old["type"][edited]]]
+        del old, new   # release the buffer exports so the old mmap can close
+
+        self.dirty = set(edited.tolist())
+        self._all_dirty = False
+        old_mm.close()
+        old_file.close()
+
+
+def same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def open_map(path, default_size=None):
+    """
+    Memory-map a .hexm map when possible (see MappedTerrainGrid), stream it
+    in chunks if it has more than CHUNKED_MAP_TILES tiles (see
+    ChunkedTerrainGrid), otherwise load it eagerly like load_map_file.
+    """
+    if os.path.splitext(path)[1].lower() == BINARY_EXT and MappedTerrainGrid.can_map(path):
+        width, height, _palette, _offset = read_file_header(path)
+        if width * height > CHUNKED_MAP_TILES:
+            from chunked_terrain import ChunkedTerrainGrid
+            return ChunkedTerrainGrid(path)
+        return MappedTerrainGrid(path)
+    return load_map_file(path, default_size)
+
+
+# -------------------------------------------------------
+# JSON format
+# -------------------------------------------------------
+def _json_tile(data):
+    """A tile in the editor's original JSON layout, including its terrain colour."""
+    return {
+        "type": data["type"],
+        "color": list(TERRAIN_BY_NAME[data["type"]].color),
+        "move_cost": data["move_cost"],
+        "height": data["height"],
+        "passable": data["passable"],
+    }
+
+
+def save_json(path, grid):
+    payload = {
+        "width": grid.width,
+        "height": grid.height,
+        "tiles": {f"{q},{r}": _json_tile(data) for (q, r), data in grid.items()},
+    }
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2)
+
+
+def load_json(path, default_size=None):
+    with open(path, "r") as fh:
+        payload = json.load(fh)
+    width, height = default_size or (None, None)
+    return TerrainGrid.from_tiles(
+        payload.get("width", width),
+        payload.get("height", height),
+        payload.get("tiles", {}),
+    )
+
+
+# -------------------------------------------------------
+# Dispatch by extension
+# -------------------------------------------------------
+def is_map_file(filename):
+    # dot-files are atomic_write temporaries and the map catalog, not maps
+    name = os.path.basename(filename)
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in MAP_EXTENSIONS
+
+
+def with_map_extension(filename, default=BINARY_EXT):
+    """`filename` unchanged if it already names a map format, else with `default` appended."""
+    return filename if is_map_file(filename) else filename + default
+
+
+def load_map_file(path, default_size=None):
+    """
+    Load a map in either format. default_size (width, height) is used for
+    JSON maps that don't record their size.
+    """
+    if os.path.splitext(path)[1].lower() == BINARY_EXT:
+        return load_binary(path)
+    return load_json(path, default_size)
+
+
+def save_map_file(path, grid):
+    """
+    Save in the format given by the extension. In-memory grids are written
+    to a temporary file that then atomically replaces `path`; mapped and
+    chunked grids saved as .hexm write their edits back themselves.
+    """
+    if os.path.splitext(path)[1].lower() == BINARY_EXT:
+        if hasattr(grid, "save"):
+            grid.save(path)
+        else:
+            atomic_write(path, lambda tmp: save_binary(tmp, grid))
+    else:
+        atomic_write(path, lambda tmp: save_json(tmp, grid))
+
+
+def atomic_write(path, write):
+    """
+    Call write(tmp_path) for a temporary file next to `path` (same
+    extension), then move it over `path` in one step, so readers never see
+    a half-written file. The temporary file is removed if write fails.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + name + ".", suffix=os.path.splitext(name)[1])
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def convert(src, dst):
+    """Rewrite the map at `src` to `dst`; formats come from the extensions."""
+    save_map_file(dst, load_map_file(src))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or not all(is_map_file(p) for p in sys.argv[1:]):
+        print("usage: python mapfile.py SRC.{json,hexm} DST.{json,hexm}")
+        sys.exit(2)
+    convert(sys.argv[1], sys.argv[2])
+    print(f"{sys.argv[1]} -> {sys.argv[2]}")
@@ -0,0 +1,434 @@
+# mcts.py
+"""
+Monte Carlo tree search player.
+
+MCTSPolicy plans a whole turn. At the start of its turn it searches for
+a share of a per-turn search budget, then plays the most visited line of
+its own moves up to the first attack. After an attack, or if the line runs
+out or stops being legal, it searches again with what is left of the
+budget, and falls back to GreedyPolicy once that is spent. Only time spent
+searching counts against the budget, not the time the caller takes to
+animate or pace the moves in between.
+
+The tree is open-loop: a node is a sequence of actions, not a state, so
+attacks can come out differently on every visit. It only spans the
+moving player's turn, the part that gets planned; the replies are left
+to the rollouts. Each iteration replays the line on one working copy of
+the root state with GameState.make(), adds one action, plays the game on
+with a cheap rollout policy that plays like GreedyPolicy, scores the
+result from the point of view of the player to move and takes every
+action back with unmake(). There are many more moves than good moves,
+so each unit's moves are cut down to a few candidates, and all actions
+are ranked by a greedy prior that steers the search (PUCT) until the
+visits say otherwise. Rankings are kept in a transposition table under
+the state's Zobrist hash, so a state reached again (on the next
+iteration, or by another move order) is not ranked twice.
+
+With workers > 1, every worker process searches its own tree from the
+same root until the same deadline (root parallelism) and the statistics
+of their first-turn lines are added up before the plan is picked.
+"""
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from combat import odds_for
+from game_state import ATTACK, END_TURN, MOVE, Action
+from pathfinding import hex_distance
+from policies import GreedyPolicy
+from unit_catalog import UNIT_CATALOG
+from zobrist import TranspositionTable
+
+DEFAULT_BUDGET = 1.0        # seconds of search per turn
+SEARCHES_PER_TURN = 3       # the budget is split for replanning after attacks
+MIN_SEARCH = 0.01           # seconds; below this, replanning is not worth it
+MIN_PLAN_VISITS = 4         # planned steps need at least this many visits
+
+MOVES_PER_UNIT = 3          # candidate moves searched per unit and action
+EXPLORATION = 1.0           # PUCT constant; rewards are in [0, 1]
+PRIOR_DECAY = 0.6           # the action ranked k-th (from 0) has prior PRIOR_DECAY ** k
+ROLLOUT_TURNS = 30          # play turns simulated after the tree before scoring
+ROLLOUT_EPSILON = 0.1       # chance a rollout move goes somewhere random
+TT_SIZE = 1 << 14           # transposition table slots per search
+TT_POLICY = "two_tier"
+MAX_PLY = 64                # tree nodes nearer the root are kept in the table first
+
+
+# -------------------------------------------------------
+# Tree
+# -------------------------------------------------------
+class _Node:
+    __slots__ = ("player", "visits", "value", "children")
+
+    def __init__(self, player):
+        self.player = player    # who chose the action leading here (None at the root)
+        self.visits = 0
+        self.value = 0.0        # sum of that player's rewards
+        self.children = {}      # action -> _Node
+
+
+def ranked_actions(state):
+    """
+    The actions worth searching, most promising first: attacks by kill
+    chance and expected damage, then moves by how much closer they get to
+    an enemy, then ending the turn, then the remaining moves. Within each
+    group, units that keep the turn going come before a unit on its last
+    AP while others have more. Only each unit's MOVES_PER_UNIT best moves
+    are kept; the rest mostly differ in which equally good tile the unit
+    ends on.
+    """
+    actions = state.legal_actions()
+    player = state.current_player
+    enemies = [(u.q, u.r) for u in state.units if u.owner != player]
+    ready = {(u.q, u.r): u.action_points for u in state.units if u.owner == player}
+    more_ap = any(ap > 1 for ap in ready.values())
+
+    def ends_turn(tile):
+        return more_ap and ready[tile] == 1
+    distance = {}   # tile -> distance to the closest enemy; most moves share their src
+
+    def closest(tile):
+        d = distance.get(tile)
+        if d is None:
+            d = distance[tile] = min((hex_distance(tile, e) for e in enemies), default=0)
+        return d
+
+    keyed = []
+    moves = {}      # src -> moves kept so far (actions come sorted by src)
+    for i, action in enumerate(actions):
+        if action.kind == ATTACK:
+            attacker, defender = state.unit_at(action.src), state.unit_at(action.dst)
+            odds = odds_for(attacker, defender, state.choose_weapon(attacker, defender))
+            key = (0, ends_turn(action.src), -odds.kill_chance, -odds.expected_damage, i)
+        elif action.kind == MOVE:
+            gain = closest(action.src) - closest(action.dst)
+            key = (1 if gain > 0 else 3, ends_turn(action.src), -gain, 0, i)
+            moves.setdefault(action.src, []).append((key, action))
+            continue
+        else:
+            key = (2, False, 0, 0, i)
+        keyed.append((key, action))
+    for options in moves.values():
+        options.sort()
+        keyed.extend(options[:MOVES_PER_UNIT])
+    keyed.sort()
+    return [action for _key, action in keyed]
+
+
+def _select(node, actions):
+    """
+    PUCT: the action with the best mean reward plus an exploration bonus
+    weighted by its prior (PRIOR_DECAY ** rank), so a small search plays
+    like the greedy ranking and a larger one overrides it. Unvisited
+    actions are valued at the mean of the visited ones (the root keeps no
+    value of its own). Returns (action, is_new).
+    """
+    children = node.children
+    visits = sum(child.visits for child in children.values())
+    fpu = sum(child.value for child in children.values()) / visits if visits else 0.5
+    sqrt_n = math.sqrt(node.visits + 1)
+    best, best_score = None, -1.0
+    prior = 1.0
+    for action in actions:
+        child = children.get(action)
+        if child is None:
+            score = fpu + EXPLORATION * prior * sqrt_n
+        else:
+            score = child.value / child.visits + EXPLORATION * prior * sqrt_n / (1 + child.visits)
+        if score > best_score:
+            best, best_score = action, score
+        prior *= PRIOR_DECAY
+    return best, best not in children
+
+
+# -------------------------------------------------------
+# Rollouts
+# -------------------------------------------------------
+def rollout_action(state, rng):
+    """
+    Cheap playout move that plays like GreedyPolicy, the way most
+    opponents of the search play: the attack most likely to kill (then to
+    do most damage), otherwise the move that gets a unit closest to an
+    enemy, otherwise end the turn. Ties are broken at random, and a move
+    is sometimes replaced by a random unit going anywhere it can reach. It
+    works from the units' reachable tiles rather than legal_actions(), so
+    no Action objects are built for moves it doesn't make.
+    """
+    player = state.current_player
+    ready = [u for u in state.units if u.owner == player and u.action_points > 0]
+    if not ready:
+        return Action(END_TURN)
+    best, best_key = None, None
+    for unit in ready:
+        for tile in state.attack_targets(unit):
+            defender = state.unit_at(tile)
+            odds = odds_for(unit, defender, state.choose_weapon(unit, defender))
+            key = (odds.kill_chance, odds.expected_damage, rng.random())
+            if best_key is None or key > best_key:
+                best, best_key = Action(ATTACK, (unit.q, unit.r), tile), key
+    if best is not None:
+        return best
+
+    if rng.random() < ROLLOUT_EPSILON:
+        unit = rng.choice(ready)
+        src = (unit.q, unit.r)
+        dst = rng.choice(sorted(state.reachable(unit)[0]))
+        return Action(END_TURN) if dst == src else Action(MOVE, src, dst)
+    enemies = [(u.q, u.r) for u in state.units if u.owner != player]
+    for unit in ready:
+        src = (unit.q, unit.r)
+        here = min(hex_distance(src, e) for e in enemies)
+        for tile in state.reachable(unit)[0]:
+            gain = here - min(hex_distance(tile, e) for e in enemies)
+            if gain > 0:
+                key = (gain, rng.random())
+                if best_key is None or key > best_key:
+                    best, best_key = Action(MOVE, src, tile), key
+    return best if best is not None else Action(END_TURN)
+
+
+def rewards(state):
+    """
+    Per-player reward in [0, 1]: 1/0 for a finished game (0.5 each for a
+    draw), otherwise each player's share of the material on the map, with
+    wounded units worth less.
+    """
+    n = state.num_players
+    if state.over:
+        if state.winner is None:
+            return [0.5] * n
+        return [1.0 if p == state.winner else 0.0 for p in range(n)]
+
+    worth = [0.0] * n
+    for u in state.units:
+        max_hp = UNIT_CATALOG[u.unit_class]["stats"]["hp"]
+        worth[u.owner] += u.cost * (0.5 + 0.5 * u.hp / max_hp)
+    total = sum(worth)
+    if total <= 0:
+        return [1.0 / n] * n
+    return [w / total for w in worth]
+
+
+# -------------------------------------------------------
+# Search
+# -------------------------------------------------------
+class SearchStats(NamedTuple):
+    iterations: int
+    nodes: int          # tree steps (states whose actions were ranked or looked up)
+    tt_probes: int
+    tt_hits: int
+    seconds: float
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def dedup_rate(self):
+        """Share of tree states found in the transposition table instead of ranked again."""
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def __add__(self, other):
+        # workers search side by side, so their time overlaps
+        return SearchStats(self.iterations + other.iterations, self.nodes + other.nodes,
+                           self.tt_probes + other.tt_probes, self.tt_hits + other.tt_hits,
+                           max(self.seconds, other.seconds))
+
+
+def _iterate(root, state, rng, table):
+    """
+    One iteration, played on `state` with make() and taken back with
+    unmake() at the end; returns the number of tree steps taken.
+    """
+    undo = []
+    node = root
+    path = [root]
+    player = state.current_player
+    while not state.over and state.current_player == player:
+        # the same states come up on every iteration (and through different move orders)
+        actions = table.get(state.hash)
+        if actions is None:
+            actions = ranked_actions(state)
+            table.put(state.hash, actions, MAX_PLY - len(path))
+        action, new = _select(node, actions)
+        undo.append(state.make(action))
+        if new:
+            node.children[action] = _Node(player)
+        node = node.children[action]
+        path.append(node)
+        if new:
+            break
+
+    end = state.turn + ROLLOUT_TURNS
+    while not state.over and state.turn < end:
+        undo.append(state.make(rollout_action(state, rng)))
+
+    scores = rewards(state)
+    while undo:
+        state.unmake(undo.pop())
+    for n in path:
+        n.visits += 1
+        if n.player is not None:
+            n.value += scores[n.player]
+    return len(path) - 1
+
+
+def _turn_lines(root, player):
+    """{action line: (visits, value)} for every tree node reached by `player`'s own actions."""
+    lines = {}
+    stack = [((), root)]
+    while stack:
+        line, node = stack.pop()
+        for action, child in node.children.items():
+            if child.player != player:
+                continue
+            sub = line + (action,)
+            lines[sub] = (child.visits, child.value)
+            stack.append((sub, child))
+    return lines
+
+
+def search(root_state, deadline, rng, table=None, stop=None):
+    """
+    Search from root_state until time.monotonic() passes deadline or the
+    `stop` event (a threading.Event) is set, after at least one iteration.
+    Returns (lines, SearchStats), lines as from _turn_lines. table defaults
+    to a fresh TranspositionTable(TT_SIZE, TT_POLICY). Module-level so
+    worker processes can run it.
+    """
+    start = time.monotonic()
+    root = _Node(None)
+    state = root_state.copy(rng=rng)   # every iteration plays on this one copy and takes its moves back
+    if table is None:
+        table = TranspositionTable(TT_SIZE, TT_POLICY)
+    iterations = nodes = 0
+    while True:
+        nodes += _iterate(root, state, rng, table)
+        iterations += 1
+        if time.monotonic() >= deadline or (stop is not None and stop.is_set()):
+            break
+    stats = SearchStats(iterations, nodes, table.probes, table.hits, time.monotonic() - start)
+    return _turn_lines(root, root_state.current_player), stats
+
+
+def best_line(lines):
+    """
+    The most visited line through merged search statistics, step by step,
+    up to the first attack: what to do after it depends on the dice.
+    """
+    children = {}
+    for line, (visits, value) in lines.items():
+        children.setdefault(line[:-1], []).append((visits, value, line))
+    plan = ()
+    while plan in children:
+        visits, _value, line = max(children[plan], key=lambda c: (c[0], c[1]))
+        if visits < MIN_PLAN_VISITS:
+            break
+        plan = line
+        if line[-1].kind == ATTACK:
+            break
+    return list(plan)
+
+
+def _warm_up():
+    """No-op task that makes the pool start a worker (and import this module) early."""
+
+
+class MCTSPolicy:
+    """
+    Plans each turn with Monte Carlo tree search within `budget` seconds
+    of search time. workers > 1 searches in that many processes
+    (None: one per CPU); call close() when done with them. Deploys like
+    GreedyPolicy. `stats` holds the last search's SearchStats (nodes per
+    second, transposition table dedup rate). close() may be called from
+    another thread: a search in progress stops after its current iteration
+    and the policy plays greedily from then on.
+    """
+
+    def __init__(self, rng=None, budget=DEFAULT_BUDGET, workers=1):
+        self.rng = rng if rng is not None else random.Random()
+        self.budget = budget
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.fallback = GreedyPolicy(self.rng)
+        self.pool = None
+        self.stopped = threading.Event()
+
+        self.turn_key = None        # (turn, player) the plan is for
+        self.turn_spent = 0.0       # seconds searched so far this turn
+        self.plan = []
+        self.stats = None           # SearchStats of the last search, for reporting
+        self.searches = 0
+        self.total_iterations = 0
+
+    def choose(self, state):
+        if state.phase == "setup":
+            if self.workers > 1:
+                self._pool()   # start the workers while deploying, not on the first turn's clock
+            return self.fallback.choose(state)
+
+        key = (state.turn, state.current_player)
+        if key != self.turn_key:
+            self.turn_key = key
+            self.turn_spent = 0.0
+            self.plan = []
+
+        if self.plan and self.plan[0] in state.legal_actions():
+            return self.plan.pop(0)
+
+        left = self.budget - self.turn_spent
+        seconds = min(left, max(self.budget / SEARCHES_PER_TURN, MIN_SEARCH))
+        if seconds < MIN_SEARCH or self.stopped.is_set():
+            return self.fallback.choose(state)
+        started = time.monotonic()
+        self.plan = self.search(state, seconds)
+        self.turn_spent += time.monotonic() - started
+        if not self.plan:
+            return self.fallback.choose(state)
+        return self.plan.pop(0)
+
+    def search(self, state, seconds):
+        """The best line of actions for the player to move, searching for `seconds`."""
+        deadline = time.monotonic() + seconds
+        self.searches += 1
+        if self.workers <= 1:
+            lines, self.stats = search(state.copy(rng=self.rng), deadline, self.rng, stop=self.stopped)
+            self.total_iterations += self.stats.iterations
+            return best_line(lines)
+
+        if self.stopped.is_set():   # closed: don't start a new pool
+            return []
+        # mapped/chunked grids pickle as their file path, not their tiles
+        root = state.copy()
+        pool = self._pool()
+        futures = [pool.submit(search, root, deadline, random.Random(self.rng.random()))
+                   for _ in range(self.workers)]
+        merged = {}
+        self.stats = None
+        for future in futures:
+            lines, stats = future.result()
+            self.stats = stats if self.stats is None else self.stats + stats
+            for line, (visits, value) in lines.items():
+                v, w = merged.get(line, (0, 0.0))
+                merged[line] = (v + visits, w + value)
+        self.total_iterations += self.stats.iterations
+        return best_line(merged)
+
+    def _pool(self):
+        if self.pool is None:
+            # spawn, not fork: the caller may be a thread of a running pygame app
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(self.workers):
+                self.pool.submit(_warm_up)
+        return self.pool
+
+    def close(self):
+        self.stopped.set()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
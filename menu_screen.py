@@ -1,12 +1,13 @@
 # menu_screen.py
 from screen_base import Screen
 import pygame
+from fonts import get_font, render_text
 
 class MenuScreen(Screen):
     def __init__(self, app):
         super().__init__(app)
         self.selected = 0
-        self.font = pygame.font.SysFont("arial", 28)
+        self.font = get_font("arial", 28)
 
     def handle_event(self, ev):
         if ev.type == pygame.KEYDOWN:
@@ -33,8 +34,8 @@ class MenuScreen(Screen):
         surface.fill((20, 20, 30))
 
         # Title
-        title = pygame.font.SysFont("arial", 48).render(
-            "HexGame", True, (240, 240, 240)
+        title = render_text(
+            get_font("arial", 48), "HexGame", True, (240, 240, 240)
         )
         surface.blit(title, (40, 40))
 
@@ -44,7 +45,7 @@ class MenuScreen(Screen):
 
         for i, text in enumerate(items):
             color = (255, 255, 255) if i == self.selected else (160, 160, 160)
-            label = self.font.render(text, True, color)
+            label = render_text(self.font, text, True, color)
             surface.blit(label, (60, y))
             y += 60
 
@@ -0,0 +1,100 @@
+# occupancy.py
+class OccupancyIndex:
+    """
+    Which unit stands on which hex.
+
+    Keeps hex -> unit plus one set of occupied hexes per owner, so "who is
+    here", "is this blocked" and "is an enemy next to me" are O(1) lookups
+    instead of scans over every unit. The index must be told about every
+    placement, move and removal; move() also updates the unit's q/r.
+    `version` changes with every one of them, so callers can cache
+    results that depend on where units stand.
+    """
+
+    def __init__(self, directions):
+        self.directions = directions
+        self.by_hex = {}      # (q, r) -> unit
+        self.by_owner = {}    # owner -> set of (q, r)
+        self.version = 0
+
+    def copy(self, unit_map):
+        """
+        The same index over other unit objects; unit_map(unit) gives the copy
+        of each unit. The version is kept so cached results stay valid.
+        """
+        other = OccupancyIndex(self.directions)
+        other.by_hex = {tile: unit_map(unit) for tile, unit in self.by_hex.items()}
+        other.by_owner = {owner: set(hexes) for owner, hexes in self.by_owner.items()}
+        other.version = self.version
+        return other
+
+    def place(self, unit):
+        tile = (unit.q, unit.r)
+        if tile in self.by_hex:
+            raise ValueError(f"hex {tile} is already occupied")
+        self.by_hex[tile] = unit
+        self.by_owner.setdefault(unit.owner, set()).add(tile)
+        self.version += 1
+
+    def move(self, unit, q, r):
+        old = (unit.q, unit.r)
+        new = (q, r)
+        if old == new:
+            return
+        if new in self.by_hex:
+            raise ValueError(f"hex {new} is already occupied")
+        del self.by_hex[old]
+        self.by_hex[new] = unit
+        owned = self.by_owner[unit.owner]
+        owned.discard(old)
+        owned.add(new)
+        unit.q, unit.r = q, r
+        self.version += 1
+
+    def remove(self, unit):
+        tile = (unit.q, unit.r)
+        if self.by_hex.get(tile) is unit:
+            del self.by_hex[tile]
+            self.by_owner[unit.owner].discard(tile)
+            self.version += 1
+
+    # -----------------------
+    # Queries
+    # -----------------------
+    def unit_at(self, tile):
+        return self.by_hex.get(tile)
+
+    def is_occupied(self, tile):
+        return tile in self.by_hex
+
+    def hexes_of(self, owner):
+        return self.by_owner.get(owner, set())
+
+    def enemy_hexes(self, owner):
+        for other, hexes in self.by_owner.items():
+            if other != owner:
+                yield from hexes
+
+    def has_adjacent_enemy(self, unit):
+        for dq, dr in self.directions:
+            other = self.by_hex.get((unit.q + dq, unit.r + dr))
+            if other is not None and other.owner != unit.owner:
+                return True
+        return False
+
+    def blocked_for(self, unit):
+        """Container view of every occupied hex except the unit's own."""
+        return _BlockedView(self.by_hex, (unit.q, unit.r))
+
+
+class _BlockedView:
+    """`tile in view` without building a set of all occupied hexes."""
+
+    __slots__ = ("by_hex", "own")
+
+    def __init__(self, by_hex, own):
+        self.by_hex = by_hex
+        self.own = own
+
+    def __contains__(self, tile):
+        return tile in self.by_hex and tile != self.own
@@ -0,0 +1,168 @@
+# pathfinding.py
+import heapq
+
+from terrain_grid import PROPS_TABLE, TERRAIN
+
+AXIAL_DIRECTIONS = [
+    (1, 0), (1, -1), (0, -1),
+    (-1, 0), (-1, 1), (0, 1)
+]
+
+# cheapest step onto passable terrain; keeps the A* heuristic admissible
+MIN_MOVE_COST = min(t.move_cost for t in TERRAIN if t.passable)
+
+
+def neighbors(q, r):
+    return [(q + dq, r + dr) for dq, dr in AXIAL_DIRECTIONS]
+
+
+def hex_distance(a, b):
+    """Cube distance between two axial coordinates."""
+    dq = a[0] - b[0]
+    dr = a[1] - b[1]
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def reachable_with_paths(terrain, start, move_points, blocked):
+    """
+    Dijkstra over remaining move points.
+
+    Every tile is settled once, with the most move points it can still
+    have left. Returns (reachable, came_from): the set of tiles a unit at
+    `start` can end its move on, and the predecessor tree for those tiles
+    (feed it to path_from_tree to get the actual route).
+    """
+    props = terrain.props
+    # TerrainGrid's per-tile props codes, read inline; other grids go through props()
+    codes = getattr(terrain, "codes", None)
+    table = PROPS_TABLE
+    width, height = terrain.width, terrain.height
+    best = {start: move_points}
+    came_from = {start: None}
+    reachable = set()
+    frontier = [(-move_points, start)]
+
+    while frontier:
+        neg_remaining, current = heapq.heappop(frontier)
+        remaining = -neg_remaining
+        if current in reachable or remaining < best[current]:
+            continue
+        reachable.add(current)
+
+        cur = props(*current)
+        cur_height = cur[1] if cur else 1
+        cq, cr = current
+        for dq, dr in AXIAL_DIRECTIONS:   # neighbors(), inlined: this is the hot loop
+            nq, nr = cq + dq, cr + dr
+            n = (nq, nr)
+            if n in reachable or n in blocked:
+                continue
+            if codes is None:
+                tile = props(nq, nr)
+            elif 0 <= nq < width and 0 <= nr < height:
+                tile = table[codes[nr * width + nq]]
+            else:
+                continue
+            if tile is None or not tile[3]:
+                continue
+            if abs(cur_height - tile[1]) > 1:
+                continue
+            new_remain = remaining - tile[2]
+            if new_remain < 0 or new_remain <= best.get(n, -1):
+                continue
+            best[n] = new_remain
+            came_from[n] = current
+            heapq.heappush(frontier, (-new_remain, n))
+
+    return reachable, came_from
+
+
+def path_from_tree(came_from, goal):
+    """Walk a predecessor tree back from goal. None if goal was never reached."""
+    if goal not in came_from:
+        return None
+    path = []
+    cur = goal
+    while cur is not None:
+        path.append(cur)
+        cur = came_from[cur]
+    path.reverse()
+    return path
+
+
+def find_path(terrain, start, goal, blocked, max_expansions=None, h_cache=None):
+    """
+    A* from start to goal, weighted by terrain move_cost.
+
+    Tiles must be passable, unblocked and within one height step of the
+    tile they are entered from. Returns the path including start and
+    goal, or None if the goal is unreachable or max_expansions tiles were
+    expanded without reaching it. h_cache (tile -> heuristic) may be
+    shared between searches towards the same goal.
+    """
+    if start == goal:
+        return [start]
+
+    props = terrain.props
+    codes = getattr(terrain, "codes", None)
+    table = PROPS_TABLE
+    width, height = terrain.width, terrain.height
+    goal_props = props(*goal)
+    if goal_props is None or not goal_props[3] or goal in blocked:
+        return None
+
+    if h_cache is None:
+        h_cache = {}
+    gq, gr = goal
+
+    g_cost = {start: 0}
+    came_from = {start: None}
+    closed = set()
+    frontier = [(0, 0, 0, start)]
+    expansions = 0
+
+    while frontier:
+        _f, _h, g, current = heapq.heappop(frontier)
+        if current == goal:
+            return path_from_tree(came_from, goal)
+        if current in closed or g > g_cost[current]:
+            continue
+        closed.add(current)
+
+        expansions += 1
+        if max_expansions is not None and expansions > max_expansions:
+            return None
+
+        cur_h = props(*current)[1]
+        cq, cr = current
+        for dq, dr in AXIAL_DIRECTIONS:
+            nq, nr = cq + dq, cr + dr
+            neighbor = (nq, nr)
+            if neighbor in closed or neighbor in blocked:
+                continue
+            if codes is None:
+                tile = props(nq, nr)
+            elif 0 <= nq < width and 0 <= nr < height:
+                tile = table[codes[nr * width + nq]]
+            else:
+                continue
+            if tile is None or not tile[3]:
+                continue
+            if abs(cur_h - tile[1]) > 1:
+                continue
+
+            new_g = g + tile[2]
+            if new_g >= g_cost.get(neighbor, new_g + 1):
+                continue
+            g_cost[neighbor] = new_g
+            came_from[neighbor] = current
+
+            h = h_cache.get(neighbor)
+            if h is None:
+                hq, hr = nq - gq, nr - gr
+                h = (abs(hq) + abs(hr) + abs(hq + hr)) // 2 * MIN_MOVE_COST
+                h_cache[neighbor] = h
+            # ties broken towards the goal (smaller h) to keep the corridor narrow
+            heapq.heappush(frontier, (new_g + h, h, new_g, neighbor))
+
+    return None
@@ -0,0 +1,95 @@
+# policies.py
+"""
+Computer players for GameState.
+
+A policy is any object with choose(state) -> Action, called with the
+state of the player to move. POLICIES maps the names used by the
+tournament runner to factories taking a random.Random and, optionally,
+one number ("mcts:0.5" is MCTS with half a second per turn).
+"""
+import random
+
+from combat import odds_for
+from game_state import ATTACK, END_TURN, MOVE
+from pathfinding import hex_distance
+
+
+class RandomPolicy:
+    """Uniformly random legal action."""
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+
+    def choose(self, state):
+        return self.rng.choice(state.legal_actions())
+
+
+class GreedyPolicy:
+    """
+    Attacks whatever it is most likely to kill (then does most damage to);
+    otherwise moves the unit that gets closest to an enemy, and ends the
+    turn once no move gets any closer. Deploys at random.
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+
+    def choose(self, state):
+        actions = state.legal_actions()
+        if state.phase == "setup":
+            return self.rng.choice(actions)
+
+        best, best_score = None, None
+        for action in actions:
+            if action.kind != ATTACK:
+                continue
+            attacker, defender = state.unit_at(action.src), state.unit_at(action.dst)
+            odds = odds_for(attacker, defender, state.choose_weapon(attacker, defender))
+            score = (odds.kill_chance, odds.expected_damage)
+            if best_score is None or score > best_score:
+                best, best_score = action, score
+        if best is not None:
+            return best
+
+        enemies = [(u.q, u.r) for u in state.units if u.owner != state.current_player]
+        if not enemies:
+            return next(a for a in actions if a.kind == END_TURN)
+
+        def closest(tile):
+            return min(hex_distance(tile, e) for e in enemies)
+
+        best, best_gain = None, 0
+        for action in actions:
+            if action.kind != MOVE:
+                continue
+            gain = closest(action.src) - closest(action.dst)
+            if gain > best_gain:
+                best, best_gain = action, gain
+        return best if best is not None else next(a for a in actions if a.kind == END_TURN)
+
+
+def _mcts(rng=None, budget=None):
+    from mcts import DEFAULT_BUDGET, MCTSPolicy   # mcts builds on this module
+    return MCTSPolicy(rng, DEFAULT_BUDGET if budget is None else budget)
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+    "mcts": _mcts,
+}
+
+
+def make_policy(spec, rng=None):
+    """Policy for "name" or "name:number" (see POLICIES)."""
+    name, _, arg = spec.partition(":")
+    try:
+        factory = POLICIES[name]
+    except KeyError:
+        raise ValueError(f"unknown policy {name!r} (choose from {', '.join(POLICIES)})") from None
+    if not arg:
+        return factory(rng)
+    try:
+        return factory(rng, float(arg))
+    except (TypeError, ValueError):
+        raise ValueError(f"bad argument for policy {name!r}: {arg!r}") from None
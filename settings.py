@@ -32,6 +32,11 @@ LOG_WIDTH = 500
 
 MAPS_DIR = "maps"
 
+# --- Large maps ---
+CHUNK_SIZE = 32                         # tiles per chunk side (a multiple of hexmap.LAYER_BLOCK)
+CHUNK_MEMORY_BUDGET = 32 * 1024 * 1024  # bytes of decoded chunks kept in memory
+CHUNKED_MAP_TILES = 4_000_000           # bigger .hexm maps are streamed in chunks
+
 # --- Final responsive window size ---
 WINDOW_WIDTH = int(
     MARGIN_LEFT +
@@ -84,6 +89,13 @@ FONT_COLOR = (255, 255, 255)
 # --- Gameplay ---
 NUM_PLAYERS = 2
 UNITS_PER_PLAYER = 2
+ROSTER_BUDGET = 200      # points each player drafts units with
+
+# --- Computer opponent ---
+AI_PLAYERS = ()          # players the computer plays in GameScreen by default: hot-seat
+AI_TURN_BUDGET = 2.0     # seconds of MCTS search per turn
+AI_WORKERS = 1           # search processes; more than 1 starts a process pool
+AI_ACTION_DELAY = 0.4    # seconds between the computer's actions, so they can be followed
 
 DEBUG = True
 
@@ -0,0 +1,247 @@
+# terrain_grid.py
+import sys
+from array import array
+from collections.abc import MutableMapping
+from typing import NamedTuple
+
+import numpy as np
+
+from settings import TERRAIN_TYPES, TERRAIN_LIST
+
+
+class TerrainType(NamedTuple):
+    """One terrain definition, shared by every tile of that type."""
+    id: int
+    name: str
+    color: tuple
+    move_cost: int
+    height: int
+    passable: bool
+
+
+# one immutable TerrainType per entry in TERRAIN_TYPES, indexed by id
+TERRAIN = tuple(
+    TerrainType(i, name, tuple(TERRAIN_TYPES[name]["color"]), TERRAIN_TYPES[name]["move_cost"],
+                TERRAIN_TYPES[name]["height"], bool(TERRAIN_TYPES[name]["passable"]))
+    for i, name in enumerate(TERRAIN_LIST)
+)
+TERRAIN_BY_NAME = {t.name: t for t in TERRAIN}
+
+# terrain name <-> compact id (index into TERRAIN_LIST)
+TERRAIN_IDS = {t.name: t.id for t in TERRAIN}
+MOVE_COSTS = tuple(t.move_cost for t in TERRAIN)
+
+# every distinct (type_id, height, move_cost, passable) a tile has had, indexed
+# by the props code TerrainGrid.codes stores (an unsigned short)
+PROPS_TABLE = []
+_PROPS_CODES = {}   # props tuple -> its index in PROPS_TABLE
+
+
+def props_code(type_id, height, move_cost, passable):
+    """The code of a props tuple, adding it to PROPS_TABLE the first time it is seen."""
+    key = (type_id, height, move_cost, passable)
+    code = _PROPS_CODES.get(key)
+    if code is None:
+        if len(PROPS_TABLE) > 0xFFFF:
+            raise ValueError("too many distinct tile properties for a props code")
+        code = _PROPS_CODES[key] = len(PROPS_TABLE)
+        PROPS_TABLE.append(key)
+    return code
+
+
+class TerrainGrid(MutableMapping):
+    """
+    Array-backed terrain storage for a width x height axial grid.
+
+    Each tile property lives in its own typed column, indexed row-major by
+    r * width + q:
+
+        type_ids    unsigned byte   index into TERRAIN (the shared TerrainType)
+        heights     signed byte
+        passable    unsigned byte   0 / 1
+
+    A tile's move cost comes from its TerrainType. The rare tile with a
+    different cost keeps it in the sparse cost_overrides dict (index -> cost).
+
+    For reading, the `codes` column (unsigned short) holds each tile's index
+    into PROPS_TABLE, the shared (type_id, height, move_cost, passable)
+    tuples, so a lookup is two indexings and the cost override is resolved
+    when the tile is written. That is 2 bytes a tile on top of the 3 above.
+
+    The grid still behaves like the old (q, r) -> dict mapping, so code that
+    does terrain[(q, r)]["type"] or terrain[(q, r)] = {...} keeps working.
+    Hot paths should use props(), or read `codes` directly (pathfinding
+    does), which skip building the dict.
+    """
+
+    def __init__(self, width, height, fill="plain"):
+        self.width = width
+        self.height = height
+
+        n = width * height
+        base = TERRAIN_BY_NAME[fill]
+        self.type_ids = array("B", [base.id]) * n
+        self.heights = array("b", [base.height]) * n
+        self.passable = array("B", [1 if base.passable else 0]) * n
+        self.cost_overrides = {}
+        self.codes = array("H", [props_code(base.id, base.height, base.move_cost, int(base.passable))]) * n
+
+    @classmethod
+    def from_tiles(cls, width, height, tiles):
+        """Build a grid from the JSON map layout: {"q,r": {type, height, ...}}."""
+        grid = cls(width, height)
+        for key, info in tiles.items():
+            q, r = map(int, key.split(","))
+            if grid.is_inside(q, r):
+                grid[(q, r)] = info
+        return grid
+
+    # -----------------------
+    # Fast accessors
+    # -----------------------
+    def is_inside(self, q, r):
+        return 0 <= q < self.width and 0 <= r < self.height
+
+    def index(self, q, r):
+        return r * self.width + q
+
+    def props(self, q, r):
+        """Return (type_id, height, move_cost, passable) or None if outside."""
+        if 0 <= q < self.width and 0 <= r < self.height:
+            return PROPS_TABLE[self.codes[r * self.width + q]]
+        return None
+
+    def terrain_type(self, q, r):
+        """The shared TerrainType of a tile."""
+        return TERRAIN[self.type_ids[r * self.width + q]]
+
+    def type_name(self, q, r):
+        return TERRAIN_LIST[self.type_ids[r * self.width + q]]
+
+    def set_tile(self, q, r, ttype, height=None, move_cost=None, passable=None):
+        """Write one tile; returns True if any of its properties changed."""
+        base = TERRAIN_BY_NAME[ttype]
+        i = r * self.width + q
+        old_cost = self.cost_overrides.get(i, MOVE_COSTS[self.type_ids[i]])
+        new = (
+            base.id,
+            base.height if height is None else height,
+            int(base.passable if passable is None else passable),
+        )
+        cost = base.move_cost if move_cost is None else move_cost
+        if new == (self.type_ids[i], self.heights[i], self.passable[i]) and cost == old_cost:
+            return False
+        self.type_ids[i], self.heights[i], self.passable[i] = new
+        if cost == base.move_cost:
+            self.cost_overrides.pop(i, None)
+        else:
+            self.cost_overrides[i] = cost
+        self.codes[i] = props_code(new[0], new[1], cost, new[2])
+        return True
+
+    def fill(self, ttype="plain"):
+        """Reset every tile to `ttype`; returns the (q, r) tiles that changed."""
+        base = TERRAIN_BY_NAME[ttype]
+        default = (base.id, base.height, int(base.passable))
+        changed = [
+            (i % self.width, i // self.width)
+            for i, props in enumerate(zip(self.type_ids, self.heights, self.passable))
+            if props != default or i in self.cost_overrides
+        ]
+
+        n = self.width * self.height
+        self.type_ids[:] = array("B", [default[0]]) * n
+        self.heights[:] = array("b", [default[1]]) * n
+        self.passable[:] = array("B", [default[2]]) * n
+        self.cost_overrides = {}
+        self.codes[:] = array("H", [props_code(*default[:2], base.move_cost, default[2])]) * n
+        return changed
+
+    def copy(self):
+        other = TerrainGrid.__new__(TerrainGrid)
+        other.width = self.width
+        other.height = self.height
+        other.type_ids = array("B", self.type_ids)
+        other.heights = array("b", self.heights)
+        other.passable = array("B", self.passable)
+        other.cost_overrides = dict(self.cost_overrides)
+        other.codes = array("H", self.codes)
+        return other
+
+    def rebuild_codes(self):
+        """Recompute `codes` from the columns, after writing them directly."""
+        type_ids = np.frombuffer(self.type_ids, dtype=np.uint8).astype(np.int32)
+        heights = np.frombuffer(self.heights, dtype=np.int8).astype(np.int32)
+        passable = np.frombuffer(self.passable, dtype=np.uint8).astype(np.int32)
+        keys = (type_ids << 16) | ((heights & 0xFF) << 8) | passable
+        lookup = np.zeros(int(keys.max(initial=0)) + 1, dtype=np.uint16)
+        for key in np.flatnonzero(np.bincount(keys)).tolist():
+            type_id = key >> 16
+            height = ((key >> 8 & 0xFF) ^ 0x80) - 0x80    # back to a signed byte
+            lookup[key] = props_code(type_id, height, MOVE_COSTS[type_id], key & 0xFF)
+        self.codes = array("H", lookup[keys].tobytes())
+        for i, cost in self.cost_overrides.items():
+            type_id, height, _cost, passable = PROPS_TABLE[self.codes[i]]
+            self.codes[i] = props_code(type_id, height, cost, passable)
+
+    def same_tiles(self, other):
+        """True if both grids hold exactly the same tiles."""
+        return (self.type_ids == other.type_ids and self.heights == other.heights
+                and self.passable == other.passable and self.cost_overrides == other.cost_overrides)
+
+    def memory_usage(self):
+        """Approximate bytes held by the grid and its columns."""
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(col)
+            for col in (self.type_ids, self.heights, self.passable, self.cost_overrides, self.codes)
+        )
+
+    # -----------------------
+    # Mapping view
+    # -----------------------
+    def _checked_index(self, key):
+        try:
+            q, r = key
+        except (TypeError, ValueError):
+            raise KeyError(key) from None
+        if not (0 <= q < self.width and 0 <= r < self.height):
+            raise KeyError(key)
+        return r * self.width + q
+
+    def __getitem__(self, key):
+        self._checked_index(key)
+        type_id, height, move_cost, passable = self.props(*key)
+        return {
+            "type": TERRAIN_LIST[type_id],
+            "move_cost": move_cost,
+            "height": height,
+            "passable": bool(passable),
+        }
+
+    def __setitem__(self, key, info):
+        q, r = key
+        self._checked_index(key)
+        self.set_tile(
+            q, r, info["type"],
+            height=info.get("height"),
+            move_cost=info.get("move_cost"),
+            passable=info.get("passable"),
+        )
+
+    def __delitem__(self, key):
+        raise TypeError("TerrainGrid tiles cannot be deleted")
+
+    def __contains__(self, key):
+        try:
+            q, r = key
+        except (TypeError, ValueError):
+            return False
+        return 0 <= q < self.width and 0 <= r < self.height
+
+    def __iter__(self):
+        for r in range(self.height):
+            for q in range(self.width):
+                yield (q, r)
+
+    def __len__(self):
+        return self.width * self.height
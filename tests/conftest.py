@@ -0,0 +1,31 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the game's modules live at the repository root, not in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings import TERRAIN_LIST
+from terrain_grid import TerrainGrid
+
+
+def make_random_grid(width, height, seed=0):
+    """A grid with every terrain type, mixed heights, cost overrides and passability flips."""
+    rng = random.Random(seed)
+    grid = TerrainGrid(width, height)
+    for r in range(height):
+        for q in range(width):
+            grid.set_tile(
+                q, r, rng.choice(TERRAIN_LIST),
+                height=rng.randint(-2, 3),
+                move_cost=rng.randint(1, 9) if rng.random() < 0.1 else None,
+                passable=(rng.random() < 0.7) if rng.random() < 0.1 else None,
+            )
+    return grid
+
+
+@pytest.fixture
+def random_grid():
+    return make_random_grid
@@ -0,0 +1,135 @@
+import pickle
+
+import pytest
+
+from chunked_terrain import ChunkedTerrainGrid
+from mapfile import load_map_file, save_map_file
+from terrain_grid import TerrainGrid
+
+CHUNK = 8
+BUDGET_CHUNKS = 3
+
+
+def all_props(grid):
+    return [grid.props(q, r) for r in range(grid.height) for q in range(grid.width)]
+
+
+@pytest.fixture
+def hexm_file(tmp_path, random_grid):
+    """(path, grid) of a 40x30 random map saved as .hexm: 5x4 chunks of 8."""
+    grid = random_grid(40, 30, seed=6)
+    path = str(tmp_path / "map.hexm")
+    save_map_file(path, grid)
+    return path, grid
+
+
+def open_chunked(path):
+    budget = BUDGET_CHUNKS * TerrainGrid(CHUNK, CHUNK).memory_usage()
+    return ChunkedTerrainGrid(path, chunk_size=CHUNK, max_bytes=budget)
+
+
+def test_reads_match_an_eager_load(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        assert chunked.chunk_count() == (5, 4)
+        assert all_props(chunked) == all_props(grid)
+        assert chunked.copy().same_tiles(grid)
+        assert chunked.props(-1, 0) is None and chunked.props(40, 0) is None
+
+
+def test_lru_eviction_keeps_within_budget(hexm_file):
+    path, _grid = hexm_file
+    with open_chunked(path) as chunked:
+        for cr in range(4):
+            for cq in range(5):
+                chunked.chunk(cq, cr)
+        chunked.chunk(2, 3)
+        assert chunked.loads == 20
+        assert len(chunked.chunks) == BUDGET_CHUNKS
+        assert chunked.resident_bytes() <= chunked.max_bytes
+        assert chunked.evictions == 20 - BUDGET_CHUNKS
+        # the most recently used chunks are the ones kept
+        assert list(chunked.chunks) == [(3, 3), (4, 3), (2, 3)]
+
+
+def test_pinned_and_dirty_chunks_are_not_evicted(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        assert chunked.stream([(0, 0, 9, 3)]) == {(0, 0), (1, 0)}
+        chunked.set_tile(35, 25, "water")
+        all_props(chunked)
+        assert {(0, 0), (1, 0), (4, 3)} <= set(chunked.chunks)
+        assert chunked.dirty_chunks == {(4, 3)}
+
+        grid.set_tile(35, 25, "water")
+        assert all_props(chunked) == all_props(grid)
+
+
+def test_save_writes_only_dirty_chunks(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        chunked.set_tile(3, 3, "mountain", move_cost=5)
+        chunked.set_tile(39, 29, "forest", height=2)
+        chunked.save()
+        assert not chunked.dirty_chunks
+    grid.set_tile(3, 3, "mountain", move_cost=5)
+    grid.set_tile(39, 29, "forest", height=2)
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_fill_then_save(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        assert set(chunked.fill("forest")) == set(grid.fill("forest"))
+        chunked.set_tile(20, 10, "water")
+        chunked.save()
+    grid.set_tile(20, 10, "water")
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_snapshot_saves_the_edits_at_snapshot_time(tmp_path, hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        chunked.set_tile(1, 1, "water")
+        chunked.set_tile(30, 20, "water")
+        snapshot = chunked.snapshot()
+        chunked.set_tile(30, 20, "mountain")    # edited again after the snapshot
+
+        other = str(tmp_path / "other.hexm")
+        snapshot.save(other)
+        expected = grid.copy()
+        expected.set_tile(1, 1, "water")
+        expected.set_tile(30, 20, "water")
+        assert load_map_file(other).same_tiles(expected)
+
+        snapshot.save(path)
+        chunked.mark_saved(snapshot, path)
+        assert chunked.dirty_chunks == {(3, 2)}
+        expected.set_tile(30, 20, "mountain")
+        assert chunked.copy().same_tiles(expected)
+
+
+def test_snapshot_of_a_fill(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        chunked.fill("forest")
+        chunked.set_tile(5, 5, "water")
+        snapshot = chunked.snapshot()
+        snapshot.save(path)
+        chunked.mark_saved(snapshot, path)
+        assert chunked._filled is None and not chunked.dirty_chunks
+    grid.fill("forest")
+    grid.set_tile(5, 5, "water")
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_readers_and_pickles_open_the_file_themselves(hexm_file):
+    path, grid = hexm_file
+    with open_chunked(path) as chunked:
+        for other in (chunked.reader(), pickle.loads(pickle.dumps(chunked))):
+            assert other.chunk_size == CHUNK and other.max_bytes == chunked.max_bytes
+            assert all_props(other) == all_props(grid)
+            other.close()
+        chunked.set_tile(0, 0, "water")
+        with pytest.raises(ValueError):
+            pickle.dumps(chunked)
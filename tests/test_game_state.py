@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from game_state import ATTACK, END_TURN, GameState
+from policies import GreedyPolicy, RandomPolicy
+from terrain_grid import TerrainGrid
+from zobrist import KEYS
+
+ROSTERS = {0: ["captain", "soldier", "marksman"], 1: ["soldier", "soldier", "marksman"]}
+
+
+def fingerprint(state):
+    """Everything make() may touch, as plain comparable values."""
+    turns = state.turns
+    occupancy = state.occupancy
+    return (
+        tuple((u.row, u.q, u.r, u.hp, u.action_points) for u in state.units),
+        tuple(tuple((u.row, u.hp, u.action_points) for u in units) for units in state.player_units),
+        sorted((tile, u.row) for tile, u in occupancy.by_hex.items()),
+        sorted((owner, sorted(tiles)) for owner, tiles in occupancy.by_owner.items() if tiles),
+        (turns.current_player, turns.phase, tuple(turns.units_placed)),
+        (state.turn, state.over, state.winner, state.hash),
+        state.table.in_use.tolist(), state.table.action_points.tolist(), state.table.hp.tolist(),
+    )
+
+
+def new_game(seed):
+    return GameState(TerrainGrid(13, 13), ROSTERS, max_turns=40, rng=random.Random(seed))
+
+
+def outcome_for(state, action, rng):
+    if action.kind != ATTACK:
+        return None
+    outcomes = state.chance_outcomes(action)
+    assert sum(p for _o, p in outcomes) == pytest.approx(1)
+    return rng.choice(outcomes)[0]
+
+
+def explore(state, rng, depth):
+    """make/unmake a few actions per level, depth levels deep, checking each level is restored."""
+    if depth == 0 or state.over:
+        return
+    before = fingerprint(state)
+    actions = state.legal_actions()
+    for action in rng.sample(actions, min(3, len(actions))):
+        undo = state.make(action, outcome_for(state, action, rng))
+        assert state.hash == KEYS.full(state)
+        explore(state, rng, depth - 1)
+        state.unmake(undo)
+        assert fingerprint(state) == before, action
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_nested_make_unmake_restores_state_and_hash(seed):
+    rng = random.Random(seed)
+    state = new_game(seed)
+    policies = [RandomPolicy(rng), GreedyPolicy(rng)]
+    while not state.over:
+        explore(state, rng, 3)
+        state.apply(policies[rng.random() < 0.5].choose(state))
+        assert state.hash == KEYS.full(state)
+
+
+def test_unmake_a_whole_game_in_reverse():
+    rng = random.Random(1)
+    state = new_game(1)
+    policy = RandomPolicy(rng)
+    history = []
+    while not state.over:
+        action = policy.choose(state)
+        history.append((fingerprint(state), state.make(action, outcome_for(state, action, rng))))
+
+    for before, undo in reversed(history):
+        state.unmake(undo)
+        assert fingerprint(state) == before
+    assert state.hash == KEYS.full(state) == new_game(1).hash
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_make_plays_like_apply(seed):
+    rng = random.Random(seed)
+    state = new_game(seed)
+    policy = GreedyPolicy(rng)
+    while not state.over:
+        action = policy.choose(state)
+        made = state.copy()
+        result = state.apply(action)
+        made.make(action, result.unsaved if action.kind == ATTACK else None)
+        assert fingerprint(made) == fingerprint(state)
+
+
+def test_end_turn_refill_is_undone():
+    rng = random.Random(3)
+    state = new_game(3)
+    policy = RandomPolicy(rng)
+    while state.turns.phase == "setup":
+        state.apply(policy.choose(state))
+    state.apply(policy.choose(state))   # spend some AP so the next turn change refills it
+
+    before = fingerprint(state)
+    undo = state.make(next(a for a in state.legal_actions() if a.kind == END_TURN))
+    undo2 = state.make(next(a for a in state.legal_actions() if a.kind == END_TURN))
+    assert undo2.refilled
+    state.unmake(undo2)
+    state.unmake(undo)
+    assert fingerprint(state) == before
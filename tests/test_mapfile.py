@@ -0,0 +1,224 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from mapfile import (
+    HEADER,
+    MAGIC,
+    VERSION,
+    MapFormatError,
+    MappedTerrainGrid,
+    convert,
+    decode_binary,
+    encode_binary,
+    grid_to_records,
+    load_map_file,
+    open_map,
+    save_map_file,
+)
+from settings import TERRAIN_LIST
+from terrain_grid import TERRAIN_IDS
+
+BASELINE_MAP = os.path.join(os.path.dirname(__file__), "..", "maps", "map_20251212_213613.json")
+
+
+def all_props(grid):
+    return [grid.props(q, r) for r in range(grid.height) for q in range(grid.width)]
+
+
+def hexm_bytes(grid, palette):
+    """A .hexm file for grid with its palette in the given order."""
+    header = bytearray(HEADER.pack(MAGIC, VERSION, len(palette), grid.width, grid.height))
+    for name in palette:
+        header.append(len(name))
+        header += name.encode("utf-8")
+    header += bytes(-len(header) % 8)
+    to_file = np.zeros(256, dtype=np.uint8)
+    to_file[[TERRAIN_IDS[name] for name in palette]] = np.arange(len(palette))
+    return bytes(header) + grid_to_records(grid, to_file).tobytes()
+
+
+# -------------------------------------------------------
+# Format round trips
+# -------------------------------------------------------
+def test_binary_round_trip(random_grid):
+    grid = random_grid(17, 11)
+    decoded = decode_binary(encode_binary(grid))
+    assert (decoded.width, decoded.height) == (17, 11)
+    assert decoded.same_tiles(grid)
+    assert all_props(decoded) == all_props(grid)
+
+
+@pytest.mark.parametrize("ext", [".hexm", ".json"])
+def test_save_and_load_by_extension(tmp_path, random_grid, ext):
+    grid = random_grid(9, 14, seed=1)
+    path = str(tmp_path / ("map" + ext))
+    save_map_file(path, grid)
+    loaded = load_map_file(path)
+    assert loaded.same_tiles(grid)
+    assert all_props(loaded) == all_props(grid)
+    assert [p.name for p in tmp_path.iterdir()] == ["map" + ext]   # no temporaries left
+
+
+def test_convert_json_to_binary_and_back(tmp_path, random_grid):
+    grid = random_grid(8, 8, seed=2)
+    save_map_file(str(tmp_path / "a.json"), grid)
+    convert(str(tmp_path / "a.json"), str(tmp_path / "b.hexm"))
+    convert(str(tmp_path / "b.hexm"), str(tmp_path / "c.json"))
+    assert (tmp_path / "a.json").read_text() == (tmp_path / "c.json").read_text()
+
+
+def test_json_keeps_the_editor_schema(tmp_path, random_grid):
+    grid = random_grid(5, 4, seed=3)
+    path = tmp_path / "map.json"
+    save_map_file(str(path), grid)
+    payload = json.loads(path.read_text())
+    assert (payload["width"], payload["height"]) == (5, 4)
+    tile = payload["tiles"]["2,3"]
+    assert list(tile) == ["type", "color", "move_cost", "height", "passable"]
+    assert tile["type"] == grid.type_name(2, 3)
+    assert (tile["height"], tile["move_cost"], tile["passable"]) == grid.props(2, 3)[1:]
+
+
+def test_baseline_json_map_loads_and_converts(tmp_path):
+    grid = load_map_file(BASELINE_MAP)
+    assert (grid.width, grid.height) == (13, 13)
+    convert(BASELINE_MAP, str(tmp_path / "map.hexm"))
+    assert load_map_file(str(tmp_path / "map.hexm")).same_tiles(grid)
+
+
+def test_palette_order_comes_from_the_file(random_grid):
+    grid = random_grid(6, 7, seed=4)
+    decoded = decode_binary(hexm_bytes(grid, list(reversed(TERRAIN_LIST))))
+    assert decoded.same_tiles(grid)
+
+
+# -------------------------------------------------------
+# Bad files
+# -------------------------------------------------------
+def test_bad_files_raise_map_format_error(random_grid):
+    data = encode_binary(random_grid(4, 4))
+    newer = HEADER.pack(MAGIC, VERSION + 1, *HEADER.unpack_from(data)[2:]) + data[HEADER.size:]
+    for bad in (b"", b"NOPE" + data[4:], data[:-1], newer):
+        with pytest.raises(MapFormatError):
+            decode_binary(bad)
+
+
+def test_unknown_terrain_raises_map_format_error(random_grid):
+    grid = random_grid(3, 3)
+    data = bytearray(hexm_bytes(grid, TERRAIN_LIST))
+    name = TERRAIN_LIST[0].encode("utf-8")
+    start = data.index(name, HEADER.size)
+    data[start:start + len(name)] = b"?" * len(name)
+    with pytest.raises(MapFormatError, match="unknown terrain"):
+        decode_binary(bytes(data))
+
+
+# -------------------------------------------------------
+# Memory-mapped grids
+# -------------------------------------------------------
+@pytest.fixture
+def hexm_file(tmp_path, random_grid):
+    """(path, grid) of a random map saved as .hexm."""
+    grid = random_grid(12, 10, seed=5)
+    path = str(tmp_path / "map.hexm")
+    save_map_file(path, grid)
+    return path, grid
+
+
+def test_open_map_maps_small_binary_maps(hexm_file):
+    path, grid = hexm_file
+    with open_map(path) as mapped:
+        assert isinstance(mapped, MappedTerrainGrid)
+        assert all_props(mapped) == all_props(grid)
+        assert [mapped.type_name(q, 3) for q in range(12)] == [grid.type_name(q, 3) for q in range(12)]
+        assert mapped.copy().same_tiles(grid)
+
+
+def test_can_map_needs_every_terrain_type(tmp_path, random_grid):
+    path = tmp_path / "partial.hexm"
+    path.write_bytes(hexm_bytes(random_grid(3, 3), list(reversed(TERRAIN_LIST))))
+    assert MappedTerrainGrid.can_map(str(path))
+    grid = random_grid(3, 3)
+    grid.fill(TERRAIN_LIST[0])
+    path.write_bytes(hexm_bytes(grid, TERRAIN_LIST[:1]))
+    assert not MappedTerrainGrid.can_map(str(path))
+    assert not isinstance(open_map(str(path)), MappedTerrainGrid)
+
+
+def test_edits_are_copy_on_write_until_saved(hexm_file):
+    path, grid = hexm_file
+    on_disk = open(path, "rb").read()
+    with MappedTerrainGrid(path) as mapped:
+        assert mapped.set_tile(4, 2, "water", height=-1)
+        assert not mapped.set_tile(4, 2, "water", height=-1)
+        assert mapped.dirty == {2 * 12 + 4}
+        assert open(path, "rb").read() == on_disk
+
+        mapped.save()
+        assert not mapped.dirty
+    grid.set_tile(4, 2, "water", height=-1)
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_save_elsewhere_leaves_the_source_alone(tmp_path, hexm_file):
+    path, grid = hexm_file
+    on_disk = open(path, "rb").read()
+    other = str(tmp_path / "other.hexm")
+    with MappedTerrainGrid(path) as mapped:
+        mapped.set_tile(0, 0, "mountain")
+        mapped.save(other)
+    assert open(path, "rb").read() == on_disk
+    grid.set_tile(0, 0, "mountain")
+    assert load_map_file(other).same_tiles(grid)
+
+
+def test_fill_rewrites_every_record(hexm_file):
+    path, grid = hexm_file
+    with MappedTerrainGrid(path) as mapped:
+        changed = mapped.fill("forest")
+        assert set(changed) == set(grid.fill("forest"))
+        mapped.save()
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_mark_saved_remaps_and_keeps_later_edits(hexm_file):
+    path, grid = hexm_file
+    mapped = MappedTerrainGrid(path)
+    mapped.set_tile(1, 1, "water")
+    snapshot = mapped.copy()
+    mapped.set_tile(2, 2, "mountain", move_cost=7)
+
+    save_map_file(path, snapshot)        # an atomic replace, as the background saver does
+    mapped.mark_saved(snapshot, path)
+    assert mapped.dirty == {2 * 12 + 2}
+    grid.set_tile(1, 1, "water")
+    assert load_map_file(path).same_tiles(grid)
+
+    grid.set_tile(2, 2, "mountain", move_cost=7)
+    assert mapped.copy().same_tiles(grid)
+    mapped.save()
+    mapped.close()
+    assert load_map_file(path).same_tiles(grid)
+
+
+def test_readers_and_pickles_map_the_file_themselves(hexm_file):
+    path, grid = hexm_file
+    with MappedTerrainGrid(path) as mapped:
+        for other in (mapped.reader(), pickle.loads(pickle.dumps(mapped))):
+            assert other._mm is not mapped._mm
+            assert all_props(other) == all_props(grid)
+            other.close()
+        mapped.set_tile(0, 0, "water")
+        with pytest.raises(ValueError):
+            mapped.reader()
+
+
+def test_close_releases_the_mapping(hexm_file):
+    path, _grid = hexm_file
+    mapped = MappedTerrainGrid(path)
+    mapped.close()
+    assert mapped._mm is None and mapped._file.closed
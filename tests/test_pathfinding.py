@@ -0,0 +1,144 @@
+import random
+
+import pytest
+
+from mapfile import MappedTerrainGrid, save_map_file
+from pathfinding import AXIAL_DIRECTIONS, find_path, hex_distance, path_from_tree, reachable_with_paths
+from terrain_grid import TerrainGrid
+
+WIDTH, HEIGHT = 15, 12
+
+
+def walkable_grid(seed):
+    """Mostly passable terrain with height steps, walls and cost overrides."""
+    rng = random.Random(seed)
+    grid = TerrainGrid(WIDTH, HEIGHT)
+    for r in range(HEIGHT):
+        for q in range(WIDTH):
+            roll = rng.random()
+            ttype = "water" if roll < 0.1 else "forest" if roll < 0.4 else "plain"
+            grid.set_tile(q, r, ttype, height=rng.choice((0, 1, 1, 1, 2, 3)),
+                          move_cost=rng.randint(1, 4) if rng.random() < 0.15 else None)
+    return grid
+
+
+def random_blocked(rng):
+    return {(rng.randrange(WIDTH), rng.randrange(HEIGHT)) for _ in range(8)}
+
+
+def reference_costs(grid, start, blocked):
+    """Cheapest cost from start to every tile, by relaxing every edge until nothing changes."""
+    costs = {start: 0}
+    changed = True
+    while changed:
+        changed = False
+        for (q, r), cost in list(costs.items()):
+            here = grid.props(q, r)
+            for dq, dr in AXIAL_DIRECTIONS:
+                n = (q + dq, r + dr)
+                tile = grid.props(*n)
+                if tile is None or not tile[3] or n in blocked or abs(here[1] - tile[1]) > 1:
+                    continue
+                if cost + tile[2] < costs.get(n, float("inf")):
+                    costs[n] = cost + tile[2]
+                    changed = True
+    return costs
+
+
+def path_cost(grid, path, blocked):
+    """Move cost of a path, checking every step is one a unit may take."""
+    total = 0
+    for (aq, ar), (bq, br) in zip(path, path[1:]):
+        assert (bq - aq, br - ar) in AXIAL_DIRECTIONS
+        tile = grid.props(bq, br)
+        assert tile[3] and (bq, br) not in blocked
+        assert abs(grid.props(aq, ar)[1] - tile[1]) <= 1
+        total += tile[2]
+    return total
+
+
+def starts(grid, rng, count):
+    passable = [(q, r) for r in range(HEIGHT) for q in range(WIDTH) if grid.props(q, r)[3]]
+    return rng.sample(passable, count)
+
+
+@pytest.fixture(params=["in-memory", "mapped"])
+def grids(request, tmp_path):
+    """Grids for several seeds, as TerrainGrids or memory-mapped (the props() path)."""
+    grids = [walkable_grid(seed) for seed in range(6)]
+    if request.param == "mapped":
+        mapped = []
+        for i, grid in enumerate(grids):
+            path = str(tmp_path / f"map{i}.hexm")
+            save_map_file(path, grid)
+            mapped.append(MappedTerrainGrid(path))
+        yield mapped
+        for grid in mapped:
+            grid.close()
+    else:
+        yield grids
+
+
+# -------------------------------------------------------
+# Dijkstra reachability
+# -------------------------------------------------------
+@pytest.mark.parametrize("move_points", [0, 1, 3, 6])
+def test_reachable_matches_reference(grids, move_points):
+    rng = random.Random(move_points)
+    for grid in grids:
+        for start in starts(grid, rng, 5):
+            blocked = random_blocked(rng) - {start}
+            reachable, came_from = reachable_with_paths(grid, start, move_points, blocked)
+
+            costs = reference_costs(grid, start, blocked)
+            assert reachable == {tile for tile, cost in costs.items() if cost <= move_points}
+            for tile in reachable:
+                path = path_from_tree(came_from, tile)
+                assert path[0] == start and path[-1] == tile
+                assert path_cost(grid, path, blocked) == costs[tile]
+
+
+def test_path_from_tree_of_an_unreached_tile():
+    assert path_from_tree({(0, 0): None}, (1, 0)) is None
+
+
+# -------------------------------------------------------
+# A* paths
+# -------------------------------------------------------
+def test_find_path_is_cheapest(grids):
+    rng = random.Random(7)
+    for grid in grids:
+        for start in starts(grid, rng, 4):
+            blocked = random_blocked(rng) - {start}
+            costs = reference_costs(grid, start, blocked)
+            h_cache = {}
+            for goal in starts(grid, rng, 10):
+                path = find_path(grid, start, goal, blocked)
+                if goal not in costs:
+                    assert path is None
+                    continue
+                assert path[0] == start and path[-1] == goal
+                assert path_cost(grid, path, blocked) == costs[goal]
+                # a heuristic cache shared by searches towards the same goal changes nothing
+                assert find_path(grid, start, goal, blocked, h_cache=h_cache) == path
+                h_cache.clear()
+
+
+def test_find_path_edge_cases():
+    grid = walkable_grid(0)
+    grid.fill("plain")
+    assert find_path(grid, (2, 2), (2, 2), set()) == [(2, 2)]
+    assert find_path(grid, (0, 0), (5, 0), {(5, 0)}) is None
+    assert find_path(grid, (0, 0), (WIDTH, 0), set()) is None
+    grid.set_tile(5, 0, "water")
+    assert find_path(grid, (0, 0), (5, 0), set()) is None
+
+
+def test_find_path_expansion_budget():
+    grid = walkable_grid(1)
+    grid.fill("plain")
+    start, goal = (0, 0), (WIDTH - 1, HEIGHT - 1)
+    path = find_path(grid, start, goal, set())
+    assert len(path) - 1 == hex_distance(start, goal)
+    assert find_path(grid, start, goal, set(), max_expansions=len(path)) == path
+    assert find_path(grid, start, goal, set(), max_expansions=3) is None
@@ -0,0 +1,216 @@
+# tournament.py
+"""
+Headless self-play tournaments for tuning UNIT_CATALOG.
+
+Plays matches between two policies (see policies.POLICIES) in parallel
+worker processes, on the maps in the maps directory, with random rosters
+drafted within ROSTER_BUDGET. One JSON line per match is written to the
+output file as results arrive, followed by a summary line.
+
+    python tournament.py [--games N] [--jobs N] [--p1 greedy] [--p2 mcts:0.2]
+                         [--max-turns 100] [--seed 0] [--out tournament.jsonl] [MAPS_DIR]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from game_state import ATTACK, GameState
+from mapfile import is_map_file, open_map
+from policies import make_policy
+from settings import GRID_HEIGHT, GRID_WIDTH, MAPS_DIR, NUM_PLAYERS, ROSTER_BUDGET
+from terrain_grid import TerrainGrid
+from unit_catalog import UNIT_CATALOG
+
+DEFAULT_MAX_TURNS = 100
+DEFAULT_MAP = "<default>"    # plain GRID_WIDTH x GRID_HEIGHT map, when there are none on disk
+
+
+class MatchJob(NamedTuple):
+    game: int
+    seed: int
+    map_path: str
+    policies: tuple          # policy spec per player, e.g. "greedy" or "mcts:0.2"
+    max_turns: int
+    budget: int
+
+
+def draft_roster(rng, budget=ROSTER_BUDGET):
+    """Random unit names whose total cost fits the budget, drafted until nothing else does."""
+    roster = []
+    while True:
+        affordable = [name for name, info in UNIT_CATALOG.items() if info["cost"] <= budget]
+        if not affordable:
+            return roster
+        name = rng.choice(affordable)
+        roster.append(name)
+        budget -= UNIT_CATALOG[name]["cost"]
+
+
+def list_maps(maps_dir=MAPS_DIR):
+    if not os.path.isdir(maps_dir):
+        return []
+    return [os.path.join(maps_dir, name) for name in sorted(os.listdir(maps_dir)) if is_map_file(name)]
+
+
+# -------------------------------------------------------
+# Worker side
+# -------------------------------------------------------
+_TERRAIN = {}   # map path -> grid, per worker process; games never change terrain
+
+
+def _terrain_for(path):
+    grid = _TERRAIN.get(path)
+    if grid is None:
+        if path == DEFAULT_MAP:
+            grid = TerrainGrid(GRID_WIDTH, GRID_HEIGHT)
+        else:
+            grid = open_map(path, (GRID_WIDTH, GRID_HEIGHT))
+        _TERRAIN[path] = grid
+    return grid
+
+
+def play_match(job):
+    """Play one match to the end; returns its JSON-ready record."""
+    start = time.perf_counter()
+    rng = random.Random(job.seed)
+    rosters = {player: draft_roster(rng, job.budget) for player in range(NUM_PLAYERS)}
+    state = GameState(_terrain_for(job.map_path), rosters, max_turns=job.max_turns,
+                      rng=random.Random(rng.random()))
+    players = [make_policy(name, random.Random(rng.random())) for name in job.policies]
+
+    kills = Counter()    # killer class -> kills
+    losses = Counter()   # victim class -> units lost
+    actions = 0
+    while not state.over:
+        action = players[state.current_player].choose(state)
+        if action.kind == ATTACK:
+            attacker, defender = state.unit_at(action.src), state.unit_at(action.dst)
+            result = state.apply(action)
+            if result.killed:
+                kills[attacker.unit_class] += 1
+                losses[defender.unit_class] += 1
+        else:
+            state.apply(action)
+        actions += 1
+
+    return {
+        "game": job.game,
+        "seed": job.seed,
+        "map": os.path.basename(job.map_path),
+        "policies": list(job.policies),
+        "rosters": [rosters[player] for player in range(NUM_PLAYERS)],
+        "winner": state.winner,
+        "turns": state.turn,
+        "actions": actions,
+        "kills": dict(kills),
+        "losses": dict(losses),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+# -------------------------------------------------------
+# Runner
+# -------------------------------------------------------
+def summarize(records):
+    """Win rates, game lengths and per-class kill statistics over match records."""
+    n = len(records)
+    wins = Counter(r["winner"] for r in records)
+    kills, losses, fielded = Counter(), Counter(), Counter()
+    for r in records:
+        kills.update(r["kills"])
+        losses.update(r["losses"])
+        for roster in r["rosters"]:
+            fielded.update(roster)
+
+    classes = sorted(set(fielded) | set(kills) | set(losses))
+    return {
+        "games": n,
+        "win_rate": {f"p{p + 1}": wins[p] / n if n else 0.0 for p in range(NUM_PLAYERS)},
+        "draw_rate": wins[None] / n if n else 0.0,
+        "mean_turns": sum(r["turns"] for r in records) / n if n else 0.0,
+        "mean_actions": sum(r["actions"] for r in records) / n if n else 0.0,
+        "units": {
+            name: {
+                "fielded": fielded[name],
+                "kills": kills[name],
+                "losses": losses[name],
+                "kills_per_unit": kills[name] / fielded[name] if fielded[name] else 0.0,
+                "survival": 1 - losses[name] / fielded[name] if fielded[name] else 0.0,
+            }
+            for name in classes
+        },
+    }
+
+
+def run_tournament(games, policies, out_path, maps_dir=MAPS_DIR, jobs=None, max_turns=DEFAULT_MAX_TURNS,
+                   seed=0, budget=ROSTER_BUDGET, report=print):
+    """
+    Play `games` matches across `jobs` worker processes (default: CPU
+    count), streaming one JSON line per match to out_path. Maps are used
+    in turn; match i is seeded with seed + i, so runs are reproducible.
+    Returns the summary.
+    """
+    maps = list_maps(maps_dir) or [DEFAULT_MAP]
+    todo = [MatchJob(i, seed + i, maps[i % len(maps)], tuple(policies), max_turns, budget)
+            for i in range(games)]
+    workers = jobs or os.cpu_count() or 1
+    # a few jobs per message keeps IPC overhead low without starving workers at the end
+    chunksize = max(1, min(16, games // (workers * 8)))
+
+    records = []
+    start = time.perf_counter()
+    with open(out_path, "w") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        for record in pool.map(play_match, todo, chunksize=chunksize):
+            records.append(record)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if len(records) % max(1, games // 10) == 0:
+                report(f"  {len(records)}/{games} games")
+        summary = summarize(records)
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["games_per_minute"] = round(games / elapsed * 60, 1) if elapsed else None
+        out.write(json.dumps({"summary": summary}) + "\n")
+
+    rates = ", ".join(f"{k} {v:.1%}" for k, v in summary["win_rate"].items())
+    report(f"{games} games in {elapsed:.1f} s on {workers} workers "
+           f"({summary['games_per_minute']} games/min): {rates}, draws {summary['draw_rate']:.1%}, "
+           f"mean {summary['mean_turns']:.1f} turns")
+    for name, stats in summary["units"].items():
+        report(f"  {name:<10} fielded {stats['fielded']:6d}   kills/unit {stats['kills_per_unit']:.2f}   "
+               f"survival {stats['survival']:.1%}")
+    return summary
+
+
+def policy_spec(spec):
+    """argparse type: a spec make_policy accepts."""
+    try:
+        make_policy(spec)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+    return spec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless matches between computer policies.")
+    parser.add_argument("maps_dir", nargs="?", default=MAPS_DIR)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--p1", default="greedy", type=policy_spec,
+                        help="random, greedy or mcts[:seconds per turn]")
+    parser.add_argument("--p2", default="random", type=policy_spec)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS, help="longer games are draws")
+    parser.add_argument("--budget", type=int, default=ROSTER_BUDGET, help="roster points per player")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="tournament.jsonl", help="JSON-lines results file")
+    args = parser.parse_args()
+    if args.games <= 0:
+        sys.exit("--games must be positive")
+    run_tournament(args.games, (args.p1, args.p2), args.out, args.maps_dir, args.jobs,
+                   args.max_turns, args.seed, args.budget)
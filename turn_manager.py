@@ -7,6 +7,13 @@ class TurnManager:
         self.phase = "setup"  # can be "setup" or "play"
         self.units_placed = [0] * len(units_per_player)
 
+    def copy(self):
+        other = TurnManager(self.num_players, list(self.units_per_player))
+        other.current_player = self.current_player
+        other.phase = self.phase
+        other.units_placed = list(self.units_placed)
+        return other
+
     def next_turn(self):
         """Advance to the next player's turn, switching phase if setup is complete."""
         self.current_player = (self.current_player + 1) % self.num_players
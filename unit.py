@@ -1,12 +1,22 @@
 # unit.py
+import numpy as np
 import pygame
-import random
-import hexmap
+from unit_table import UnitRow
+from assets import ASSETS
+from fonts import get_font, render_text
+from unit_sprites import SPRITES
 
-class Unit:
-    FONT = None  # lazy init
+
+class Unit(UnitRow):
+    """
+    A UnitRow that can draw itself: body sprite, tooltip and roster icon.
+    The rules live in UnitRow, so game_state never needs pygame.
+    """
+
+    __slots__ = ("icon", "color")
+
+    FONT = None  # loaded by init_fonts() once pygame is up
     TOOLTIP_FONT = None
-    
 
     CLASS_COLORS = {
         "captain": (255, 215, 0),     # gold
@@ -14,96 +24,80 @@ class Unit:
         "marksman": (100, 100, 255),  # blue
     }
 
-    def __init__(
-        self,
-        q,
-        r,
-        owner=0,
-        move_range=3,
-        hp=1,
-        save=3,
-        morale=8,
-        category="henchman",
-        unit_class="soldier",
-        melee=None,
-        ranged=None,
-        action_points=2,
-    ):
-        
-        self.cost = hasattr(self, "cost") and self.cost or 0
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self.icon = None
-        
-        # Position
-        self.q = q
-        self.r = r
-        self.owner = owner
-
-        # Core stats
-        self.move_range = move_range
-        self.hp = hp
-        self.save = save
-        self.morale = morale
-        self.category = category
-        self.unit_class = unit_class
-        self.max_action_points = action_points
-        self.action_points = action_points
-
-        # Weapons
-        self.melee = melee or {"attack": 1, "hit": 3, "damage": 1, "range": 1}
-        self.ranged = ranged or {"attack": 0, "hit": 0, "damage": 0, "range": 0}
 
         # Visual color by class
-        self.color = self.CLASS_COLORS.get(unit_class, (200, 200, 200))
+        self.color = self.CLASS_COLORS.get(self.unit_class, (200, 200, 200))
 
-        # lazy font init (safe if pygame wasn't set up earlier)
-        if Unit.FONT is None:
-            try:
-                if not pygame.get_init():
-                    pygame.init()
-                if not pygame.font.get_init():
-                    pygame.font.init()
-                Unit.FONT = pygame.font.Font(None, 18)
-                Unit.TOOLTIP_FONT = pygame.font.Font(None, 18)
-            except Exception:
-                # fallback: set to None and avoid any font rendering
-                Unit.FONT = None
-                Unit.TOOLTIP_FONT = None
+    @classmethod
+    def init_fonts(cls):
+        """Load the unit fonts; a no-op until pygame.font is initialised."""
+        if cls.FONT is None and pygame.font.get_init():
+            cls.FONT = get_font(None, 18)
+            cls.TOOLTIP_FONT = get_font(None, 18)
 
     # Drawing
-    def draw(self, surface, camera, hexmap, show_tooltip=False, mouse_pos=None):
+    def draw(self, surface, camera, hexmap, show_tooltip=False, mouse_pos=None, at=None):
+        """Draw the unit on its tile, or on `at` (e.g. partway along a move)."""
+        if Unit.FONT is None:
+            Unit.init_fonts()
+
         # compute pixel pos
-        x, y = hexmap.hex_to_pixel(self.q, self.r)
+        q, r = at if at is not None else (self.q, self.r)
+        x, y = hexmap.hex_to_pixel(q, r)
         sx_f, sy_f = camera.apply((x, y))
         sx, sy = int(sx_f), int(sy_f)
         radius = max(4, int(hexmap.size * 0.4))
 
-        # unit body
-        pygame.draw.circle(surface, self.color, (sx, sy), radius)
-
-        # outline by owner
-        outline_color = (255, 50, 50) if self.owner == 1 else (50, 255, 50)
-        pygame.draw.circle(surface, outline_color, (sx, sy), radius, 2)
-
-        # class symbol
-        self.draw_symbol(surface, sx, sy, radius)
-
-        # HP bar
-        bar_w = radius * 2
-        bar_h = 4
-        hp_ratio = max(0.0, min(1.0, self.hp / 2.0))
-        pygame.draw.rect(surface, (60, 60, 60), (sx - radius, sy + radius + 3, bar_w, bar_h))
-        if self.hp > 0:
-            pygame.draw.rect(surface, (0, 255, 0), (sx - radius, sy + radius + 3, int(bar_w * hp_ratio), bar_h))
-
-        # AP text (use FONT if available)
-        if Unit.FONT:
-            ap_text = Unit.FONT.render(str(self.action_points), True, (255, 255, 255))
-            surface.blit(ap_text, (sx - 5, sy - 10))
+        # body (outline, symbol), HP bar and AP number are pre-rendered pieces
+        surface.blits([(surf, (sx + ox, sy + oy)) for surf, ox, oy in SPRITES.pieces(self, radius, Unit.FONT)],
+                      False)
 
         # tooltip
         if show_tooltip and mouse_pos and Unit.TOOLTIP_FONT:
             self.draw_tooltip(surface, mouse_pos)
 
+    @classmethod
+    def draw_all(cls, surface, units, camera, hexmap, moving=None, at=None):
+        """
+        Draw `units` (rows of one UnitTable) like draw() does, in one
+        Surface.blits call: positions, owners, HP and AP are read from the
+        table's columns at once. The unit `moving` is drawn on `at` instead
+        of its tile. Units whose sprite would be entirely off the surface
+        are skipped.
+        """
+        if not units:
+            return
+        if cls.FONT is None:
+            cls.init_fonts()
+
+        table = units[0].table
+        rows = np.fromiter((u.row for u in units), dtype=np.intp, count=len(units))
+        qs, rs = table.q[rows].astype(float), table.r[rows].astype(float)
+        if at is not None:
+            for i, unit in enumerate(units):
+                if unit is moving:
+                    qs[i], rs[i] = at
+                    break
+        xs, ys = camera.apply(hexmap.hex_to_pixel(qs, rs))
+        xs, ys = xs.astype(int), ys.astype(int)   # truncated like int() in draw()
+        radius = max(4, int(hexmap.size * 0.4))
+
+        margin = max(radius, 6) + 20   # the body, HP bar and AP label around the centre
+        width, height = surface.get_size()
+        shown = np.flatnonzero((xs > -margin) & (xs < width + margin) & (ys > -margin) & (ys < height + margin))
+        rows = rows[shown]
+        surface.blits(SPRITES.blits(
+            [units[i] for i in shown.tolist()],
+            list(zip(xs[shown].tolist(), ys[shown].tolist())),
+            table.owner[rows].tolist(),
+            SPRITES.hp_pixels_array(table.hp[rows], radius).tolist(),
+            table.action_points[rows].tolist(),
+            radius, cls.FONT,
+        ), False)
+
     def draw_symbol(self, surface, sx, sy, radius):
         if self.unit_class == "captain":
             pygame.draw.polygon(surface, (255, 255, 255),
@@ -114,7 +108,7 @@ class Unit:
             pygame.draw.line(surface, (255, 255, 255), (sx - 6, sy), (sx + 6, sy), 2)
             pygame.draw.line(surface, (255, 255, 255), (sx, sy - 6), (sx, sy + 6), 2)
 
-    def draw_tooltip(self, surface, mouse_pos):
+    def draw_tooltip(self, surface, mouse_pos, extra_lines=()):
         lines = [
             f"{self.unit_class.capitalize()} ({'P1' if self.owner == 0 else 'P2'})",
             f"HP: {self.hp}",
@@ -122,8 +116,9 @@ class Unit:
             f"Morale: {self.morale}",
             f"Save: {self.save}+",
             f"Move: {self.move_range}",
+            *extra_lines,
         ]
-        text_surfaces = [Unit.TOOLTIP_FONT.render(line, True, (255, 255, 255)) for line in lines]
+        text_surfaces = [render_text(Unit.TOOLTIP_FONT, line, True, (255, 255, 255)) for line in lines]
         width = max(ts.get_width() for ts in text_surfaces) + 8
         height = sum(ts.get_height() for ts in text_surfaces) + 8
 
@@ -137,51 +132,9 @@ class Unit:
             surface.blit(ts, (tooltip_rect.left + 4, y_off))
             y_off += ts.get_height()
 
-    # Combat helpers
-    def perform_attack(self, target, weapon_type="melee"):
-        weapon = self.melee if weapon_type == "melee" else self.ranged
-        if weapon["attack"] <= 0:
-            return (0, 0, False)
-        hits = unsaved = 0
-        for _ in range(weapon["attack"]):
-            if random.randint(1, 6) <= weapon["hit"]:
-                hits += 1
-                if random.randint(1, 6) > target.save:
-                    unsaved += 1
-        damage = unsaved * weapon["damage"]
-        target.hp -= damage
-        killed = target.hp <= 0
-        # consume AP if available
-        if hasattr(self, "action_points") and self.action_points > 0:
-            self.action_points -= 1
-        return hits, unsaved, killed
-
-    def can_attack(self, target, weapon_type="melee"):
-        # approximate axial distance (cube distance)
-        dq = abs(self.q - target.q)
-        dr = abs(self.r - target.r)
-        # convert axial to cube difference and compute distance robustly
-        # using axial-to-cube conversion
-        ax = self.q
-        az = self.r
-        ay = -ax - az
-        bx = target.q
-        bz = target.r
-        by = -bx - bz
-        return (abs(ax - bx) + abs(ay - by) + abs(az - bz)) // 2 <= (self.melee["range"] if weapon_type=="melee" else self.ranged["range"])
-
-    def reset_actions(self):
-        self.action_points = self.max_action_points
-
-    def is_alive(self):
-        return self.hp > 0
-    
     def load_icon(self, path):
-        try:
-            img = pygame.image.load(path).convert_alpha()
-            self.icon = pygame.transform.scale(img, (48, 48))
-        except:
-            self.icon = None
+        # shared across units of the same class; None if the file is missing
+        self.icon = ASSETS.image(path, (48, 48))
 
 # ======================================================
 # ROSTER DEFINITIONS
@@ -0,0 +1,130 @@
+# unit_sprites.py
+import numpy as np
+import pygame
+
+from fonts import render_text
+
+HP_BAR_HEIGHT = 4
+HP_BAR_GAP = 3
+
+
+class UnitSpriteCache:
+    """
+    Pre-rendered pieces of unit sprites; a unit is drawn by blitting its
+    pieces over each other.
+
+    The static look (body, owner outline, class symbol) is rendered once per
+    (class, colour, owner, radius). The HP bar is its own piece per
+    (radius, filled pixels) and the AP number one per (font, AP). Each kind
+    is cached separately, so the caches grow with the sum of the variations
+    rather than their product, and every unit shares its pieces with all
+    units that look alike in that respect. Radius stands in for the zoom
+    bucket: it is derived from the hex size, so pieces for a new size are
+    built on first use.
+    """
+
+    def __init__(self):
+        self.bodies = {}   # (class, color, owner, radius) -> (Surface, ox, oy)
+        self.bars = {}     # (radius, hp_px) -> (Surface, ox, oy)
+        self.labels = {}   # (font, ap) -> (Surface, ox, oy)
+        self.misses = 0
+
+    @staticmethod
+    def hp_pixels(hp, radius):
+        """Filled width of the HP bar."""
+        return int(radius * 2 * max(0.0, min(1.0, hp / 2.0))) if hp > 0 else 0
+
+    @staticmethod
+    def hp_pixels_array(hp, radius):
+        """hp_pixels() for a NumPy array of HP values."""
+        filled = (radius * 2 * np.clip(hp / 2.0, 0.0, 1.0)).astype(int)
+        return np.where(hp > 0, filled, 0)
+
+    def pieces(self, unit, radius, font=None):
+        """
+        [(surface, ox, oy), ...] for `unit`, bottom first; blit each at the
+        unit's screen centre plus (ox, oy). The AP number is only drawn when
+        `font` is given.
+        """
+        owner = unit.owner
+        ap = unit.action_points if font is not None else None
+        return self.pieces_for(unit, owner, self.hp_pixels(unit.hp, radius), ap, radius, font)
+
+    def pieces_for(self, unit, owner, hp_px, ap, radius, font):
+        """pieces() with the unit's owner, HP bar width and AP already read."""
+        body = self.bodies.get((unit.unit_class, unit.color, owner, radius))
+        if body is None:
+            body = self._body(unit, owner, radius)
+        bar = self.bars.get((radius, hp_px))
+        if bar is None:
+            bar = self._bar(radius, hp_px)
+        if ap is None:
+            return body, bar
+        label = self.labels.get((font, ap))
+        if label is None:
+            label = self._label(font, ap)
+        return body, bar, label
+
+    def blits(self, units, centres, owners, hp_px, aps, radius, font=None):
+        """
+        The (surface, position) pairs that draw `units` at screen `centres`,
+        for Surface.blits. owners, hp_px and aps are per-unit sequences
+        (aps is ignored without a font).
+        """
+        seq = []
+        append = seq.append
+        for i, unit in enumerate(units):
+            sx, sy = centres[i]
+            ap = aps[i] if font is not None else None
+            for surf, ox, oy in self.pieces_for(unit, owners[i], hp_px[i], ap, radius, font):
+                append((surf, (sx + ox, sy + oy)))
+        return seq
+
+    def clear(self):
+        self.bodies.clear()
+        self.bars.clear()
+        self.labels.clear()
+        self.misses = 0
+
+    def stats(self):
+        return {"bodies": len(self.bodies), "bars": len(self.bars), "labels": len(self.labels),
+                "misses": self.misses}
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    @staticmethod
+    def _finish(surf):
+        return surf.convert_alpha() if pygame.display.get_surface() is not None else surf
+
+    def _body(self, unit, owner, radius):
+        self.misses += 1
+        # room for the circle and the fixed-size class symbols
+        half = max(radius, 6) + 1
+        surf = pygame.Surface((half * 2 + 1, half * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(surf, unit.color, (half, half), radius)
+        outline_color = (255, 50, 50) if owner == 1 else (50, 255, 50)
+        pygame.draw.circle(surf, outline_color, (half, half), radius, 2)
+        unit.draw_symbol(surf, half, half, radius)
+        entry = self.bodies[(unit.unit_class, unit.color, owner, radius)] = (self._finish(surf), -half, -half)
+        return entry
+
+    def _bar(self, radius, hp_px):
+        self.misses += 1
+        surf = pygame.Surface((radius * 2, HP_BAR_HEIGHT))
+        surf.fill((60, 60, 60))
+        if hp_px:
+            surf.fill((0, 255, 0), (0, 0, hp_px, HP_BAR_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        entry = self.bars[(radius, hp_px)] = (surf, -radius, radius + HP_BAR_GAP)
+        return entry
+
+    def _label(self, font, ap):
+        self.misses += 1
+        entry = self.labels[(font, ap)] = (render_text(font, str(ap), True, (255, 255, 255)), -5, -10)
+        return entry
+
+
+# shared by all units
+SPRITES = UnitSpriteCache()
@@ -0,0 +1,250 @@
+# unit_table.py
+import random
+
+import numpy as np
+
+WEAPON_FIELDS = ("attack", "hit", "damage", "range")
+
+
+class UnitTable:
+    """
+    Struct-of-arrays storage for unit stats.
+
+    One NumPy column per stat, one row per unit. Unit objects are thin views
+    onto a row, so per-unit code keeps working while bulk operations (e.g.
+    resetting AP for a whole side) run as single vectorized updates.
+    Rows of released units are recycled.
+    """
+
+    COLUMNS = {
+        "q": np.int32,
+        "r": np.int32,
+        "owner": np.int8,
+        "hp": np.int16,
+        "save": np.int8,
+        "morale": np.int8,
+        "move_range": np.int16,
+        "action_points": np.int8,
+        "max_action_points": np.int8,
+        "melee_attack": np.int16,
+        "melee_hit": np.int8,
+        "melee_damage": np.int16,
+        "melee_range": np.int16,
+        "ranged_attack": np.int16,
+        "ranged_hit": np.int8,
+        "ranged_damage": np.int16,
+        "ranged_range": np.int16,
+        "in_use": np.bool_,
+    }
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return int(self.in_use.sum())
+
+    def _grow(self):
+        old = self.capacity
+        self.capacity = old * 2
+        for name in self.COLUMNS:
+            col = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=col.dtype)
+            grown[:old] = col
+            setattr(self, name, grown)
+        self.free_rows.extend(range(self.capacity - 1, old - 1, -1))
+
+    def add(self, **values):
+        """Claim a row, fill it from keyword values (column names) and return its index."""
+        if not self.free_rows:
+            self._grow()
+        row = self.free_rows.pop()
+        for name in self.COLUMNS:
+            getattr(self, name)[row] = values.get(name, 0)
+        self.in_use[row] = True
+        return row
+
+    def copy(self):
+        """An independent table with the same rows (for searching on a copy of a game)."""
+        other = UnitTable.__new__(UnitTable)
+        other.capacity = self.capacity
+        for name in self.COLUMNS:
+            setattr(other, name, getattr(self, name).copy())
+        other.free_rows = list(self.free_rows)
+        return other
+
+    def release(self, row):
+        if self.in_use[row]:
+            self.in_use[row] = False
+            self.free_rows.append(row)
+
+    def restore(self, row):
+        """Take a just-released row back, stats intact (undoing a kill)."""
+        if not self.in_use[row]:
+            self.free_rows.remove(row)
+            self.in_use[row] = True
+
+    # -----------------------
+    # Weapons
+    # -----------------------
+    def weapon(self, row, kind):
+        return {f: int(getattr(self, f"{kind}_{f}")[row]) for f in WEAPON_FIELDS}
+
+    def set_weapon(self, row, kind, weapon):
+        for f in WEAPON_FIELDS:
+            getattr(self, f"{kind}_{f}")[row] = weapon.get(f, 0)
+
+    # -----------------------
+    # Bulk operations
+    # -----------------------
+    def mask_of(self, owner):
+        return self.in_use & (self.owner == owner)
+
+    def rows_of(self, owner):
+        return np.flatnonzero(self.mask_of(owner))
+
+    def reset_actions(self, owner):
+        """Refill action points for every live unit of `owner`."""
+        mask = self.mask_of(owner)
+        self.action_points[mask] = self.max_action_points[mask]
+
+
+# -------------------------------------------------------
+# Row views
+# -------------------------------------------------------
+def _column(name):
+    """Property that reads/writes one UnitTable column at this unit's row."""
+    def fget(self):
+        return int(getattr(self.table, name)[self.row])
+
+    def fset(self, value):
+        getattr(self.table, name)[self.row] = value
+
+    return property(fget, fset)
+
+
+def _weapon(kind):
+    def fget(self):
+        return self.table.weapon(self.row, kind)
+
+    def fset(self, value):
+        self.table.set_weapon(self.row, kind, value)
+
+    return property(fget, fset)
+
+
+class UnitRow:
+    """
+    A lightweight view onto one row of a UnitTable, with the unit's rules
+    (attacking, range checks, AP). No pygame: unit.Unit adds drawing.
+
+    Numeric stats live in the table's columns; only the few non-numeric
+    attributes are stored on the object itself.
+    """
+
+    __slots__ = ("table", "row", "unit_class", "category", "cost")
+
+    TABLE = UnitTable()  # shared default table for units created without one
+
+    q = _column("q")
+    r = _column("r")
+    owner = _column("owner")
+    move_range = _column("move_range")
+    hp = _column("hp")
+    save = _column("save")
+    morale = _column("morale")
+    action_points = _column("action_points")
+    max_action_points = _column("max_action_points")
+    melee = _weapon("melee")
+    ranged = _weapon("ranged")
+
+    def __init__(
+        self,
+        q,
+        r,
+        owner=0,
+        move_range=3,
+        hp=1,
+        save=3,
+        morale=8,
+        category="henchman",
+        unit_class="soldier",
+        melee=None,
+        ranged=None,
+        action_points=2,
+        table=None,
+    ):
+        self.cost = 0
+
+        # Position and core stats live in the table
+        self.table = table if table is not None else UnitRow.TABLE
+        self.row = self.table.add(
+            q=q,
+            r=r,
+            owner=owner,
+            move_range=move_range,
+            hp=hp,
+            save=save,
+            morale=morale,
+            max_action_points=action_points,
+            action_points=action_points,
+        )
+        self.category = category
+        self.unit_class = unit_class
+
+        # Weapons
+        self.melee = melee or {"attack": 1, "hit": 3, "damage": 1, "range": 1}
+        self.ranged = ranged or {"attack": 0, "hit": 0, "damage": 0, "range": 0}
+
+    def copy_to(self, table):
+        """A plain UnitRow view of this unit's row in `table` (a UnitTable.copy())."""
+        other = UnitRow.__new__(UnitRow)
+        other.table = table
+        other.row = self.row
+        other.unit_class = self.unit_class
+        other.category = self.category
+        other.cost = self.cost
+        return other
+
+    def release(self):
+        """Give the unit's table row back (e.g. once it has been destroyed)."""
+        self.table.release(self.row)
+
+    # Combat helpers
+    def perform_attack(self, target, weapon_type="melee", rng=random):
+        weapon = self.melee if weapon_type == "melee" else self.ranged
+        if weapon["attack"] <= 0:
+            return (0, 0, False)
+        hits = unsaved = 0
+        for _ in range(weapon["attack"]):
+            if rng.randint(1, 6) <= weapon["hit"]:
+                hits += 1
+                if rng.randint(1, 6) > target.save:
+                    unsaved += 1
+        damage = unsaved * weapon["damage"]
+        target.hp -= damage
+        killed = target.hp <= 0
+        # consume AP if available
+        if self.action_points > 0:
+            self.action_points -= 1
+        return hits, unsaved, killed
+
+    def can_attack(self, target, weapon_type="melee"):
+        # cube distance between the two axial positions
+        ax = self.q
+        az = self.r
+        ay = -ax - az
+        bx = target.q
+        bz = target.r
+        by = -bx - bz
+        # read the range column directly instead of building the weapon dict
+        reach = self.table.melee_range if weapon_type == "melee" else self.table.ranged_range
+        return (abs(ax - bx) + abs(ay - by) + abs(az - bz)) // 2 <= reach[self.row]
+
+    def reset_actions(self):
+        self.action_points = self.max_action_points
+
+    def is_alive(self):
+        return self.hp > 0
@@ -0,0 +1,176 @@
+# zobrist.py
+"""
+Zobrist hashing of game states, and a bounded transposition table.
+
+A state's hash is the XOR of one 64-bit key per feature: every unit on
+the map's tile, hp and AP, whose turn it is, the phase, and how many
+units each player has deployed. GameState keeps its hash current as
+actions are played; a move, an attack or a kill XORs a handful of keys,
+and only the AP refill at the start of a turn touches every unit of the
+side to move. The turn counter is not hashed, so positions reached on
+different turns share a hash.
+
+Keys are derived from the feature itself (a splitmix64 mix of its
+packed fields) rather than drawn from a table, so every process agrees
+on them without sharing one. Units are told apart by their UnitTable
+row, which is only meaningful within one game.
+"""
+from typing import NamedTuple
+
+MASK = (1 << 64) - 1
+
+# feature kinds
+_POS, _HP, _AP, _PLAYER, _PHASE, _PLACED = range(6)
+_PHASES = {"setup": 0, "play": 1}
+
+
+def _mix(x):
+    """splitmix64 finalizer: a well-spread 64-bit value for any 64-bit input."""
+    x = (x + 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+class ZobristKeys:
+    """The key of every hashed feature, memoized."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self._cache = {}
+
+    def _key(self, kind, a=0, b=0, c=0):
+        feature = (kind, a, b, c)
+        key = self._cache.get(feature)
+        if key is None:
+            # 4 + 16 + 20 + 20 bits; q and r wrap at a million tiles, far beyond any map
+            code = (((kind << 16 | (a & 0xFFFF)) << 20 | (b & 0xFFFFF)) << 20) | (c & 0xFFFFF)
+            key = self._cache[feature] = _mix(code ^ _mix(self.seed))
+        return key
+
+    def position(self, row, q, r):
+        return self._key(_POS, row, q, r)
+
+    def hp(self, row, hp):
+        return self._key(_HP, row, hp)
+
+    def ap(self, row, ap):
+        return self._key(_AP, row, ap)
+
+    def player(self, player):
+        return self._key(_PLAYER, player)
+
+    def phase(self, phase):
+        return self._key(_PHASE, _PHASES[phase])
+
+    def placed(self, player, count):
+        return self._key(_PLACED, player, count)
+
+    def unit(self, u):
+        """Everything hashed about one unit on the map."""
+        row = u.row
+        return self.position(row, u.q, u.r) ^ self.hp(row, u.hp) ^ self.ap(row, u.action_points)
+
+    def full(self, state):
+        """Hash of a state from scratch (what GameState.hash is kept equal to)."""
+        h = self.player(state.current_player) ^ self.phase(state.phase)
+        for player, count in enumerate(state.turns.units_placed):
+            h ^= self.placed(player, count)
+        for u in state.units:
+            h ^= self.unit(u)
+        return h
+
+
+KEYS = ZobristKeys()
+
+
+# -------------------------------------------------------
+# Transposition table
+# -------------------------------------------------------
+class TTEntry(NamedTuple):
+    key: int
+    depth: int       # how much work the value stands for; "depth" replacement keeps the larger
+    value: object
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table from state hash to a value, indexed by
+    key % size. Full keys are stored, so index collisions are told apart
+    and just miss. Replacement policies when a slot is taken:
+
+        always    the new entry wins
+        depth     the entry with the larger depth stays
+        two_tier  two slots per index: a depth-preferred one, and an
+                  always-replaced one that also takes what it evicts
+
+    probes, hits, stores and the replacements/rejections counters are
+    kept for reporting; hit_rate is the share of probes answered.
+    """
+
+    POLICIES = ("always", "depth", "two_tier")
+
+    def __init__(self, size=1 << 16, policy="two_tier"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown replacement policy {policy!r} (choose from {', '.join(self.POLICIES)})")
+        self.size = size
+        self.policy = policy
+        self.ways = 2 if policy == "two_tier" else 1
+        self.slots = [None] * (size * self.ways)
+        self.probes = self.hits = self.stores = 0
+        self.replacements = 0     # stores that evicted another state
+        self.rejections = 0       # stores dropped to keep a deeper entry
+
+    def __len__(self):
+        return sum(1 for entry in self.slots if entry is not None)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self):
+        self.slots = [None] * (self.size * self.ways)
+        self.probes = self.hits = self.stores = self.replacements = self.rejections = 0
+
+    def get(self, key, default=None):
+        self.probes += 1
+        base = (key % self.size) * self.ways
+        for entry in self.slots[base:base + self.ways]:
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry.value
+        return default
+
+    def put(self, key, value, depth=0):
+        self.stores += 1
+        base = (key % self.size) * self.ways
+        slots = self.slots
+        new = TTEntry(key, depth, value)
+        if self.policy == "two_tier":
+            first, second = slots[base], slots[base + 1]
+            if first is not None and first.key == key:
+                if depth >= first.depth:
+                    slots[base] = new
+                return
+            if second is not None and second.key == key:
+                slots[base + 1] = new
+                return
+            if first is None:
+                slots[base] = new
+                return
+            if depth >= first.depth:
+                # the deep slot's old entry gets a second life in the shallow one
+                slots[base], slots[base + 1] = new, first
+            else:
+                slots[base + 1] = new
+            if second is not None:
+                self.replacements += 1
+            return
+
+        old = slots[base]
+        if old is not None and old.key != key:
+            if self.policy == "depth" and depth < old.depth:
+                self.rejections += 1
+                return
+            self.replacements += 1
+        slots[base] = new